@@ -0,0 +1,72 @@
+# -*- coding:utf-8 -*-
+
+"""
+Asset object.
+"""
+
+import json
+
+from aioquant.utils import tools
+
+
+class Asset:
+    """Asset object.
+
+    Attributes:
+        platform: Exchange platform name, e.g. `binance` / `okex`.
+        account: Trading account name, e.g. `test@gmail.com`.
+        assets: Asset details. e.g. `{"BTC": {"free": 1.1, "locked": 2.2, "total": 3.3}, ... }`
+        timestamp: Update timestamp(millisecond).
+
+    NOTE:
+        Asset object is a snapshot, it's never modified after created, `update` returns a new one, so it can be
+        shared without copy, DO NOT modify it.
+    """
+
+    def __init__(self, platform=None, account=None, assets=None, timestamp=None):
+        self.platform = platform
+        self.account = account
+        self.assets = assets if assets else {}
+        self.timestamp = timestamp if timestamp else tools.get_cur_timestamp_ms()
+
+    def update(self, balances, timestamp=None):
+        """Create a new Asset object with some currencies updated.
+
+        Args:
+            balances: Updated currencies. e.g. `{"BTC": {"free": 1.1, "locked": 2.2, "total": 3.3}, ... }`
+            timestamp: Update timestamp(millisecond).
+
+        Returns:
+            asset: New Asset object.
+        """
+        assets = dict(self.assets)
+        assets.update(balances)
+        return Asset(self.platform, self.account, assets, timestamp)
+
+    def get(self, currency):
+        """Get asset details of a currency. e.g. `{"free": 1.1, "locked": 2.2, "total": 3.3}`, None if not exist."""
+        return self.assets.get(currency)
+
+    @property
+    def data(self):
+        d = {
+            "platform": self.platform,
+            "account": self.account,
+            "assets": self.assets,
+            "timestamp": self.timestamp
+        }
+        return d
+
+    def __str__(self):
+        info = json.dumps(self.data)
+        return info
+
+    def __repr__(self):
+        return str(self)
+
+
+def make_balance(free, locked):
+    """Make asset details of a currency. e.g. `{"free": 1.1, "locked": 2.2, "total": 3.3}`"""
+    free = float(free)
+    locked = float(locked)
+    return {"free": free, "locked": locked, "total": free + locked}
@@ -25,6 +25,15 @@ class Configure:
             MARKETS: Market Server config list, default is {}.
             HEARTBEAT: Server heartbeat config, default is {}.
             PROXY: HTTP proxy config, default is None.
+            HTTP: HTTP connection pool config per host, default is {}.
+            JOURNAL: Binary event journal config, default is None.
+            SHUTDOWN: Graceful shutdown config, default is {}.
+            LOOP: Event loop implementation, `asyncio` or `uvloop`, default is `asyncio`.
+            RUNNER: Multi-process sharded runner config, default is {}.
+            MONITOR: Event loop lag and slow callback monitor config, default is None.
+            TASKS: Task supervisor config, e.g. `{"group_limits": {"publish": 100}}`, default is {}.
+            SHARD: Shard of current worker process, set by sharded runner, e.g. `{"index": 0, "count": 4}`,
+                default is None.
     """
 
     def __init__(self):
@@ -35,15 +44,25 @@ class Configure:
         self.markets = {}
         self.heartbeat = {}
         self.proxy = None
+        self.http = {}
+        self.journal = None
+        self.shutdown = {}
+        self.loop = "asyncio"
+        self.runner = {}
+        self.shard = None
+        self.monitor = None
+        self.tasks = {}
 
     def loads(self, config_file=None) -> None:
         """Load config file.
 
         Args:
-            config_file: config json file.
+            config_file: config json file, or a dict of configures.
         """
         configures = {}
-        if config_file:
+        if isinstance(config_file, dict):
+            configures = config_file
+        elif config_file:
             try:
                 with open(config_file) as f:
                     data = f.read()
@@ -69,6 +88,14 @@ class Configure:
         self.markets = update_fields.get("MARKETS", [])
         self.heartbeat = update_fields.get("HEARTBEAT", {})
         self.proxy = update_fields.get("PROXY", None)
+        self.http = update_fields.get("HTTP", {})
+        self.journal = update_fields.get("JOURNAL", None)
+        self.shutdown = update_fields.get("SHUTDOWN", {})
+        self.loop = update_fields.get("LOOP", "asyncio")
+        self.runner = update_fields.get("RUNNER", {})
+        self.shard = update_fields.get("SHARD", None)
+        self.monitor = update_fields.get("MONITOR", None)
+        self.tasks = update_fields.get("TASKS", {})
 
         for k, v in update_fields.items():
             setattr(self, k, v)
@@ -17,6 +17,7 @@ import aioamqp
 from aioquant.utils import logger
 from aioquant.configure import config
 from aioquant.tasks import LoopRunTask, SingleTask
+from aioquant.utils.journal import journal
 from aioquant.market import Orderbook, Trade, Kline
 from aioquant.utils.decorator import async_method_locker
 
@@ -45,6 +46,7 @@ class Event:
         self._pre_fetch_count = pre_fetch_count
         self._data = data
         self._callback = None  # Asynchronous callback function.
+        self._market = None  # Market object(Orderbook / Trade / Kline) to be recorded in journal while publishing.
 
     @property
     def name(self):
@@ -103,7 +105,9 @@ class Event:
     def publish(self):
         """Publish a event."""
         from aioquant import quant
-        SingleTask.run(quant.event_center.publish, self)
+        if self._market is not None:
+            journal.market(self._market)
+        SingleTask.run_in_group("publish", quant.event_center.publish, self)
 
     async def callback(self, channel, body, envelope, properties):
         self._exchange = envelope.exchange_name
@@ -139,6 +143,7 @@ class EventKline(Event):
         routing_key = "{p}.{s}".format(p=kline.platform, s=kline.symbol)
         queue = "{sid}.{ex}.{rk}".format(sid=config.server_id, ex=exchange, rk=routing_key)
         super(EventKline, self).__init__(name, exchange, queue, routing_key, data=kline.smart)
+        self._market = kline
 
     def parse(self):
         kline = Kline().load_smart(self.data)
@@ -163,6 +168,7 @@ class EventOrderbook(Event):
         routing_key = "{p}.{s}".format(p=orderbook.platform, s=orderbook.symbol)
         queue = "{sid}.{ex}.{rk}".format(sid=config.server_id, ex=exchange, rk=routing_key)
         super(EventOrderbook, self).__init__(name, exchange, queue, routing_key, data=orderbook.smart)
+        self._market = orderbook
 
     def parse(self):
         orderbook = Orderbook().load_smart(self.data)
@@ -187,6 +193,7 @@ class EventTrade(Event):
         routing_key = "{p}.{s}".format(p=trade.platform, s=trade.symbol)
         queue = "{sid}.{ex}.{rk}".format(sid=config.server_id, ex=exchange, rk=routing_key)
         super(EventTrade, self).__init__(name, exchange, queue, routing_key, data=trade.smart)
+        self._market = trade
 
     def parse(self):
         trade = Trade().load_smart(self.data)
@@ -205,6 +212,8 @@ class EventCenter:
         self._protocol = None
         self._channel = None  # Connection channel.
         self._connected = False  # If connect success.
+        self._consuming = True  # If dispatch consumed events to callbacks, stopped while shutting down.
+        self._closed = False  # If closed, do not re-connect any more.
         self._subscribers = []  # e.g. `[(event, callback, multi), ...]`
         self._event_handler = {}  # e.g. `{"exchange:routing_key": [callback_function, ...]}`
 
@@ -239,6 +248,18 @@ class EventCenter:
         data = event.dumps()
         await self._channel.basic_publish(payload=data, exchange_name=event.exchange, routing_key=event.routing_key)
 
+    def stop_consuming(self):
+        """Stop dispatching consumed events to callbacks, the messages will still be acked."""
+        self._consuming = False
+
+    async def close(self):
+        """Close RabbitMQ connection, it will not be re-connected."""
+        self._closed = True
+        self._consuming = False
+        if self._connected and self._protocol:
+            self._connected = False
+            await self._protocol.close()
+
     async def connect(self, reconnect=False):
         """Connect to RabbitMQ server and create default exchange.
 
@@ -246,7 +267,7 @@ class EventCenter:
             reconnect: If this invoke is a re-connection ?
         """
         logger.info("host:", self._host, "port:", self._port, caller=self)
-        if self._connected:
+        if self._connected or self._closed:
             return
 
         # Create a connection.
@@ -304,6 +325,8 @@ class EventCenter:
 
     async def _on_consume_event_msg(self, channel, body, envelope, properties):
         try:
+            if not self._consuming:
+                return
             key = "{exchange}:{routing_key}".format(exchange=envelope.exchange_name, routing_key=envelope.routing_key)
             funcs = self._event_handler[key]
             for func in funcs:
@@ -323,6 +346,8 @@ class EventCenter:
         logger.debug("event handlers:", self._event_handler.keys(), caller=self)
 
     async def _check_connection(self, *args, **kwargs):
+        if self._closed:
+            return
         if self._connected and self._channel and self._channel.is_open:
             return
         logger.error("CONNECTION LOSE! START RECONNECT RIGHT NOW!", caller=self)
@@ -8,17 +8,24 @@ Date:   2018/04/26
 Email:  huangtao@ifclover.com
 """
 
+import heapq
 import asyncio
+import itertools
 
 from aioquant.utils import tools
 from aioquant.utils import logger
 from aioquant.configure import config
+from aioquant.utils.stats import RollingWindow
 
 __all__ = ("heartbeat", )
 
 
 class HeartBeat(object):
-    """Server heartbeat.
+    """Server heartbeat, and the scheduler of loop run tasks.
+
+    Every task has an absolute deadline in a heap, the nearest one is waited by a single timer, so the intervals
+    could be float(e.g. 0.05s) and will not drift. If a task is still running when its next deadline comes, this
+    run will be skipped and counted as an overrun.
     """
 
     def __init__(self):
@@ -26,53 +33,77 @@ class HeartBeat(object):
         self._interval = 1  # Heartbeat interval(second).
         self._print_interval = config.heartbeat.get("interval", 0)  # Printf heartbeat information interval(second).
         self._tasks = {}  # Loop run tasks with heartbeat service. `{task_id: {...}}`
+        self._heap = []  # Deadlines of tasks. `[(deadline, seq, task_id), ...]`
+        self._seq = itertools.count()
+        self._timer = None  # Timer handle to wake up at the nearest deadline.
+        self._started = False
+        self._heartbeat_task_id = None  # Task id of heartbeat counter.
 
     @property
     def count(self):
         return self._count
 
     def ticker(self):
-        """Loop run ticker per self._interval.
+        """Start heartbeat and scheduling all registered tasks.
         """
+        if self._started:
+            return
+        self._heartbeat_task_id = self.register(self._beat, self._interval)
+        self._started = True
+        now = asyncio.get_event_loop().time()
+        for task_id, task in self._tasks.items():
+            self._push(task_id, task, now + task["interval"])
+
+    def stop(self):
+        """Stop scheduling tasks, the registered tasks will be kept."""
+        if not self._started:
+            return
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._heap = []
+        self.unregister(self._heartbeat_task_id)
+        self._started = False
+
+    async def _beat(self, *args, **kwargs):
         self._count += 1
-
         if self._print_interval > 0:
             if self._count % self._print_interval == 0:
-                logger.info("do server heartbeat, count:", self._count, caller=self)
-
-        # Later call next ticker.
-        asyncio.get_event_loop().call_later(self._interval, self.ticker)
-
-        # Exec tasks.
-        for task_id, task in self._tasks.items():
-            interval = task["interval"]
-            if self._count % interval != 0:
-                continue
-            func = task["func"]
-            args = task["args"]
-            kwargs = task["kwargs"]
-            kwargs["task_id"] = task_id
-            kwargs["heart_beat_count"] = self._count
-            asyncio.get_event_loop().create_task(func(*args, **kwargs))
+                from aioquant.utils.monitor import monitor
+                if monitor.enabled:
+                    logger.info("do server heartbeat, count:", self._count, "loop lag(ms):", monitor.stats()["lag"],
+                                caller=self)
+                else:
+                    logger.info("do server heartbeat, count:", self._count, caller=self)
 
     def register(self, func, interval=1, *args, **kwargs):
         """Register an asynchronous callback function.
 
         Args:
             func: Asynchronous callback function.
-            interval: Loop callback interval(second), default is `1s`.
+            interval: Loop callback interval(second), default is `1s`, float is supported, e.g. `0.05`.
 
         Returns:
             task_id: Task id.
         """
         t = {
             "func": func,
+            "name": getattr(func, "__qualname__", None) or str(func),
             "interval": interval,
             "args": args,
-            "kwargs": kwargs
+            "kwargs": kwargs,
+            "seq": None,  # Sequence of the valid heap entry.
+            "running": None,  # Running asyncio task.
+            "runs": 0,  # Run count.
+            "overruns": 0,  # Skipped run count, since the last run was not finished.
+            "failures": 0,  # Run count raised exception.
+            "runtime": RollingWindow(100),  # Runtime(seconds) of recent runs.
+            "lag": RollingWindow(100)  # Delay(seconds) from deadline to run of recent runs.
         }
         task_id = tools.get_uuid1()
         self._tasks[task_id] = t
+        if self._started:
+            self._push(task_id, t, asyncio.get_event_loop().time() + interval)
         return task_id
 
     def unregister(self, task_id):
@@ -84,5 +115,81 @@ class HeartBeat(object):
         if task_id in self._tasks:
             self._tasks.pop(task_id)
 
+    def stats(self):
+        """Stats of all tasks.
+
+        Returns:
+            stats: e.g. `{task_id: {"func": "Websocket._check_connection", "interval": 10, "runs": 10,
+                "overruns": 0, "failures": 0, "runtime": {"count": 10, "avg": 0.1, ...}, "lag": {...}}, ... }`,
+                `runtime` and `lag` are in milliseconds.
+        """
+        result = {}
+        for task_id, task in self._tasks.items():
+            result[task_id] = {
+                "func": task["name"],
+                "interval": task["interval"],
+                "runs": task["runs"],
+                "overruns": task["overruns"],
+                "failures": task["failures"],
+                "runtime": task["runtime"].summary(scale=1000),
+                "lag": task["lag"].summary(scale=1000)
+            }
+        return result
+
+    def _push(self, task_id, task, deadline):
+        seq = next(self._seq)
+        task["seq"] = seq
+        heapq.heappush(self._heap, (deadline, seq, task_id))
+        if self._heap[0][1] == seq:
+            self._schedule()
+
+    def _schedule(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._heap:
+            self._timer = asyncio.get_event_loop().call_at(self._heap[0][0], self._wakeup)
+
+    def _wakeup(self):
+        """Run all the tasks whose deadline is due, and push their next deadlines."""
+        from aioquant.tasks import supervisor  # Import here, since tasks module depends on heartbeat.
+        self._timer = None
+        now = asyncio.get_event_loop().time()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, seq, task_id = heapq.heappop(self._heap)
+            task = self._tasks.get(task_id)
+            if not task or task["seq"] != seq:  # Unregistered.
+                continue
+            running = task["running"]
+            if running and not running.done():
+                task["overruns"] += 1
+            else:
+                task["lag"].add(now - deadline)
+                kwargs = dict(task["kwargs"], task_id=task_id, heart_beat_count=self._count)
+                task["running"] = supervisor.spawn(self._run, (task, kwargs), name=task["name"])
+
+            # Next deadline is based on the last deadline rather than now, so that it will not drift. If some
+            # deadlines have been missed(e.g. the event loop was blocked), skip them.
+            interval = task["interval"]
+            deadline += interval
+            if deadline <= now:
+                deadline += ((now - deadline) // interval + 1) * interval
+            seq = next(self._seq)
+            task["seq"] = seq
+            heapq.heappush(self._heap, (deadline, seq, task_id))
+        self._schedule()
+
+    async def _run(self, task, kwargs):
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        task["runs"] += 1
+        try:
+            await task["func"](*task["args"], **kwargs)
+        except Exception:
+            task["failures"] += 1
+            logger.exception("loop run task error, func:", task["name"], caller=self)
+        finally:
+            task["runtime"].add(loop.time() - start)
+
 
 heartbeat = HeartBeat()
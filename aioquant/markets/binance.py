@@ -5,10 +5,15 @@ Binance Market Server.
 https://github.com/binance-exchange/binance-official-api-docs/blob/master/web-socket-streams.md
 """
 
+import functools
+
 from aioquant import const
 from aioquant.utils import tools
 from aioquant.utils import logger
+from aioquant.configure import config
+from aioquant.tasks import LoopRunTask
 from aioquant.utils.web import Websocket
+from aioquant.utils.dedup import FirstArrival
 from aioquant.order import ORDER_ACTION_BUY, ORDER_ACTION_SELL
 from aioquant.event import EventTrade, EventKline, EventOrderbook
 from aioquant.market import Orderbook, Trade, Kline
@@ -23,6 +28,10 @@ class Binance:
             symbols: Symbol list.
             channels: Channel list, only `orderbook` / `trade` / `kline` to be enabled.
             orderbook_length: The length of orderbook's data to be published via OrderbookEvent, default is 10.
+            redundancy: How many parallel Websocket connections subscribe the same streams, only the first arrived
+                copy of a message will be processed, default is 1.
+            proxies: HTTP proxy list for redundant connections, connection `i` will use `proxies[i % len(proxies)]`,
+                default is `[PROXY]` in config file.
     """
 
     def __init__(self, **kwargs):
@@ -32,12 +41,28 @@ class Binance:
         self._channels = kwargs.get("channels")
         self._orderbook_length = kwargs.get("orderbook_length", 10)
 
+        self._redundancy = kwargs.get("redundancy", 1)
+        self._proxies = kwargs.get("proxies") or [config.proxy]
+
         self._c_to_s = {}
         self._tickers = {}
+        self._dedup = FirstArrival(self._redundancy)
 
         url = self._make_url()
-        self._ws = Websocket(url, process_callback=self.process)
-        # self._ws.initialize()
+        self._ws_list = []
+        for i in range(self._redundancy):
+            proxy = self._proxies[i % len(self._proxies)]
+            ws = Websocket(url, process_callback=functools.partial(self.process, conn_index=i), proxy=proxy)
+            self._ws_list.append(ws)
+        if self._redundancy > 1:
+            LoopRunTask.register(self._print_feed_stats, 60)
+
+    @property
+    def feed_stats(self):
+        return self._dedup.stats
+
+    async def _print_feed_stats(self, *args, **kwargs):
+        logger.info("redundant feed stats:", self._dedup.stats, caller=self)
 
     def _make_url(self):
         """Generate request url.
@@ -61,11 +86,12 @@ class Binance:
         url = self._wss + "/stream?streams=" + "/".join(cc)
         return url
 
-    async def process(self, msg):
+    async def process(self, msg, conn_index=0):
         """Process message that received from Websocket connection.
 
         Args:
             msg: Message received from Websocket connection.
+            conn_index: Index of the redundant connection which received this message.
         """
         # logger.debug("msg:", msg, caller=self)
         if not isinstance(msg, dict):
@@ -80,6 +106,9 @@ class Binance:
         data = msg.get("data")
         e = data.get("e")
 
+        if self._redundancy > 1 and not self._dedup.first(self._message_key(channel, data), conn_index):
+            return
+
         if e == "kline":
             await self.process_kline(symbol, data)
         elif channel.endswith("depth20"):
@@ -101,7 +130,7 @@ class Binance:
             kline_type = const.MARKET_TYPE_KLINE
         )
         EventKline(kline).publish()
-        logger.info("symbol:", symbol, "kline:", kline, caller=self)
+        logger.debug("symbol:", symbol, "kline:", kline, caller=self)
 
     async def process_orderbook(self, symbol, data):
         """Process orderbook data and publish OrderbookEvent."""
@@ -119,7 +148,7 @@ class Binance:
             timestamp = tools.get_cur_timestamp_ms()
         )
         EventOrderbook(orderbook).publish()
-        logger.info("symbol:", symbol, "orderbook:", orderbook, caller=self)
+        logger.debug("symbol:", symbol, "orderbook:", orderbook, caller=self)
 
     async def process_trade(self, symbol, data):
         """Process trade data and publish TradeEvent."""
@@ -132,7 +161,15 @@ class Binance:
             timestamp = data.get("T")
         )
         EventTrade(trade).publish()
-        logger.info("symbol:", symbol, "trade:", trade, caller=self)
+        logger.debug("symbol:", symbol, "trade:", trade, caller=self)
+
+    def _message_key(self, channel, data):
+        """Unique message key in stream, trade id for trade, last update id for orderbook, event time for kline."""
+        if "t" in data:
+            return channel, data["t"]
+        if "lastUpdateId" in data:
+            return channel, data["lastUpdateId"]
+        return channel, data.get("E")
 
     def _symbol_to_channel(self, symbol, channel_type="ticker"):
         channel = "{x}@{y}".format(x=symbol.replace("/", "").lower(), y=channel_type)
@@ -8,12 +8,15 @@ https://www.okex.com/docs/zh
 import zlib
 import json
 import copy
+import functools
 
 from aioquant import const
 from aioquant.utils import tools
 from aioquant.utils import logger
+from aioquant.configure import config
 from aioquant.tasks import LoopRunTask
 from aioquant.utils.web import Websocket
+from aioquant.utils.dedup import FirstArrival
 from aioquant.order import ORDER_ACTION_BUY, ORDER_ACTION_SELL
 from aioquant.event import EventOrderbook, EventTrade, EventKline
 from aioquant.market import Orderbook, Trade, Kline
@@ -29,6 +32,10 @@ class OKEx:
             symbols: symbol list, OKEx Future instrument_id list.
             channels: channel list, only `orderbook`, `kline` and `trade` to be enabled.
             orderbook_length: The length of orderbook's data to be published via OrderbookEvent, default is 10.
+            redundancy: How many parallel Websocket connections subscribe the same streams, only the first arrived
+                copy of a message will be processed, default is 1.
+            proxies: HTTP proxy list for redundant connections, connection `i` will use `proxies[i % len(proxies)]`,
+                default is `[PROXY]` in config file.
     """
 
     def __init__(self, **kwargs):
@@ -38,16 +45,33 @@ class OKEx:
         self._channels = kwargs.get("channels")
         self._orderbook_length = kwargs.get("orderbook_length", 10)
 
+        self._redundancy = kwargs.get("redundancy", 1)
+        self._proxies = kwargs.get("proxies") or [config.proxy]
+
         self._orderbooks = {}  # 订单薄数据 {"symbol": {"bids": {"price": quantity, ...}, "asks": {...}}}
+        self._dedup = FirstArrival(self._redundancy)
 
         url = self._wss + "/ws/v3"
-        self._ws = Websocket(url, connected_callback=self.connected_callback,
-                             process_binary_callback=self.process_binary)
-        # self._ws.initialize()
+        subscriptions = self._make_subscriptions()
+        self._ws_list = []
+        for i in range(self._redundancy):
+            proxy = self._proxies[i % len(self._proxies)]
+            ws = Websocket(url, process_binary_callback=functools.partial(self.process_binary, conn_index=i),
+                           reconnected_callback=self.reconnected_callback, subscriptions=subscriptions, proxy=proxy)
+            self._ws_list.append(ws)
         LoopRunTask.register(self.send_heartbeat_msg, 5)
+        if self._redundancy > 1:
+            LoopRunTask.register(self._print_feed_stats, 60)
+
+    @property
+    def feed_stats(self):
+        return self._dedup.stats
 
-    async def connected_callback(self):
-        """After create Websocket connection successfully, we will subscribing orderbook/trade/kline."""
+    async def _print_feed_stats(self, *args, **kwargs):
+        logger.info("redundant feed stats:", self._dedup.stats, caller=self)
+
+    def _make_subscriptions(self):
+        """Generate subscription messages for orderbook/trade/kline, they will be replayed after every connection."""
         ches = []
         for ch in self._channels:
             if ch == "orderbook":
@@ -64,26 +88,40 @@ class OKEx:
                     ches.append(ch)
             else:
                 logger.error("channel error! channel:", ch, caller=self)
-        if ches:
-            msg = {
-                "op": "subscribe",
-                "args": ches
-            }
-            await self._ws.send(msg)
-            logger.info("subscribe orderbook/trade/kline success.", caller=self)
+        if not ches:
+            return []
+        msg = {
+            "op": "subscribe",
+            "args": ches
+        }
+        return [msg]
+
+    async def reconnected_callback(self):
+        """After re-connected to Websocket server, drop all local orderbooks and wait for the new partial data.
+
+        NOTE:
+            If there are redundant connections, the orderbooks are kept up to date by other connections, and a newer
+            partial data from the re-connected connection will replace them.
+        """
+        if self._redundancy > 1:
+            return
+        logger.info("re-connected, resync orderbooks.", caller=self)
+        self._orderbooks = {}
 
     async def send_heartbeat_msg(self, *args, **kwargs):
         data = "ping"
-        if not self._ws:
-            logger.error("Websocket connection not yeah!", caller=self)
-            return
-        await self._ws.send(data)
+        for ws in self._ws_list:
+            if not ws.connected:
+                logger.error("Websocket connection not yeah!", caller=self)
+                continue
+            await ws.send(data)
 
-    async def process_binary(self, raw):
+    async def process_binary(self, raw, conn_index=0):
         """ Process binary message that received from Websocket connection.
 
         Args:
             raw: Raw message that received from Websocket connection.
+            conn_index: Index of the redundant connection which received this message.
         """
         decompress = zlib.decompressobj(-zlib.MAX_WBITS)
         msg = decompress.decompress(raw)
@@ -101,14 +139,23 @@ class OKEx:
                     await self.process_orderbook_partial(d)
             elif msg.get("action") == "update":
                 for d in msg["data"]:
+                    if self._redundancy > 1 and not self._dedup.first(
+                            (table, d.get("instrument_id"), d.get("timestamp"), d.get("checksum")), conn_index):
+                        continue
                     await self.deal_orderbook_update(d)
             else:
                 logger.warn("unhandle msg:", msg, caller=self)
         elif table == "spot/trade":
             for d in msg["data"]:
+                if self._redundancy > 1 and not self._dedup.first(
+                        (table, d.get("instrument_id"), d.get("trade_id")), conn_index):
+                    continue
                 await self.process_trade(d)
         elif table == "spot/candle60s":
             for d in msg["data"]:
+                if self._redundancy > 1 and not self._dedup.first(
+                        (table, d.get("instrument_id"), tuple(d.get("candle", []))), conn_index):
+                    continue
                 await self.process_kline(d)
 
     async def process_orderbook_partial(self, data):
@@ -118,6 +165,9 @@ class OKEx:
             return
         asks = data.get("asks")
         bids = data.get("bids")
+        timestamp = tools.utctime_str_to_ms(data.get("timestamp"))
+        if symbol in self._orderbooks and self._orderbooks[symbol]["timestamp"] > timestamp:
+            return  # Partial data from a lagging redundant connection.
         self._orderbooks[symbol] = {"asks": {}, "bids": {}, "timestamp": 0}
         for ask in asks:
             price = float(ask[0])
@@ -127,7 +177,6 @@ class OKEx:
             price = float(bid[0])
             quantity = float(bid[1])
             self._orderbooks[symbol]["bids"][price] = quantity
-        timestamp = tools.utctime_str_to_mts(data.get("timestamp"))
         self._orderbooks[symbol]["timestamp"] = timestamp
 
     async def deal_orderbook_update(self, data):
@@ -135,7 +184,7 @@ class OKEx:
         symbol = data.get("instrument_id").replace("-", "/")
         asks = data.get("asks")
         bids = data.get("bids")
-        timestamp = tools.utctime_str_to_mts(data.get("timestamp"))
+        timestamp = tools.utctime_str_to_ms(data.get("timestamp"))
 
         if symbol not in self._orderbooks:
             return
@@ -202,7 +251,7 @@ class OKEx:
         action = ORDER_ACTION_BUY if data["side"] == "buy" else ORDER_ACTION_SELL
         price = "%.8f" % float(data["price"])
         quantity = "%.8f" % float(data["size"])
-        timestamp = tools.utctime_str_to_mts(data["timestamp"])
+        timestamp = tools.utctime_str_to_ms(data["timestamp"])
 
         trade = Trade(
             platform = self._platform,
@@ -220,7 +269,7 @@ class OKEx:
         symbol = data["instrument_id"].replace("-", "/")
         if symbol not in self._symbols:
             return
-        timestamp = tools.utctime_str_to_mts(data["candle"][0])
+        timestamp = tools.utctime_str_to_ms(data["candle"][0])
         _open = "%.8f" % float(data["candle"][1])
         high = "%.8f" % float(data["candle"][2])
         low = "%.8f" % float(data["candle"][3])
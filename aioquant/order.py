@@ -8,7 +8,10 @@ Date:   2018/05/14
 Email:  huangtao@ifclover.com
 """
 
+import copy
 import json
+from types import MappingProxyType
+from collections import OrderedDict
 
 from aioquant.utils import tools
 
@@ -110,3 +113,155 @@ class Order:
 
     def __repr__(self):
         return str(self)
+
+
+# Terminal order status, the order will never be updated again.
+ORDER_STATUS_TERMINAL = (ORDER_STATUS_FILLED, ORDER_STATUS_CANCELED, ORDER_STATUS_FAILED)
+
+
+class OrderStore:
+    """Local order store, indexed by order id, client order id, status and action.
+
+    Orders in store are snapshots, an order is never modified in place, but replaced by a new snapshot when it's
+    updated (copy-on-write). So the order passed to callback or returned by query can be shared without copy, and
+    DO NOT modify it.
+
+    Attributes:
+        retention: How many terminal orders(filled, canceled or failed) to be retained, the oldest terminal order will
+            be removed if exceeded, default is 100. If it's 0, terminal orders are removed immediately, so `get` and
+            `by_status` never return a filled, canceled or failed order.
+
+    NOTE:
+        All views(`open_orders`, `by_status`, `by_action`) are read-only and live, they are created once, so query
+        them costs no allocation.
+        A pending order(created locally but not acknowledged by exchange, `order_id` is None) is keyed by its client
+        order id until it's acknowledged.
+    """
+
+    def __init__(self, retention=100):
+        """Initialize."""
+        self._retention = retention
+        self._open_orders = {}  # Open orders. e.g. {order_id: order, ... }
+        self._terminal_orders = OrderedDict()  # Retained terminal orders, oldest first. e.g. {order_id: order, ... }
+        self._client_orders = {}  # Orders indexed by client order id. e.g. {client_order_id: order, ... }
+        self._status_orders = {}  # Orders indexed by status. e.g. {status: {order_id: order, ... }, ... }
+        self._action_orders = {}  # Open orders indexed by action. e.g. {action: {order_id: order, ... }, ... }
+        for status in (ORDER_STATUS_NONE, ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED) + ORDER_STATUS_TERMINAL:
+            self._status_orders[status] = {}
+        for action in (ORDER_ACTION_BUY, ORDER_ACTION_SELL):
+            self._action_orders[action] = {}
+
+        self._open_orders_view = MappingProxyType(self._open_orders)
+        self._status_views = {k: MappingProxyType(v) for k, v in self._status_orders.items()}
+        self._action_views = {k: MappingProxyType(v) for k, v in self._action_orders.items()}
+
+    @property
+    def retention(self):
+        return self._retention
+
+    @property
+    def open_orders(self):
+        """Read-only view of open orders. e.g. `{order_id: order, ... }`"""
+        return self._open_orders_view
+
+    def __len__(self):
+        return len(self._open_orders)
+
+    def __contains__(self, order_id):
+        return order_id in self._open_orders or order_id in self._terminal_orders
+
+    def get(self, order_id, default=None):
+        """Get an order by order id(or client order id for pending order), open or retained terminal order."""
+        order = self._open_orders.get(order_id)
+        if order is None:
+            order = self._terminal_orders.get(order_id, default)
+        return order
+
+    def get_by_client_order_id(self, client_order_id, default=None):
+        """Get an order by client order id."""
+        return self._client_orders.get(client_order_id, default)
+
+    def by_status(self, status):
+        """Read-only view of orders with the given status. e.g. `{order_id: order, ... }`"""
+        return self._status_views[status]
+
+    def by_action(self, action):
+        """Read-only view of open orders with the given action. e.g. `{order_id: order, ... }`"""
+        return self._action_views[action]
+
+    def update(self, order, **kwargs):
+        """Update an order and save the new snapshot into store.
+
+        Args:
+            order: Order object. If an order with the same order id(or client order id for pending order) is in store,
+                the new snapshot is copied from the stored one, otherwise it's copied from this object. The object
+                passed in is never modified.
+            kwargs: Attributes to be updated. e.g. `status="FILLED", remain=0`
+
+        Returns:
+            order: The new order snapshot.
+        """
+        old = self.get(self._key(order))
+        snapshot = copy.copy(old if old is not None else order)
+        for key, value in kwargs.items():
+            setattr(snapshot, key, value)
+        if old is not None:
+            self._unindex(old)
+        self._index(snapshot)
+        return snapshot
+
+    def remove(self, order_id):
+        """Remove an order from store.
+
+        Args:
+            order_id: Order id.
+
+        Returns:
+            order: The order removed, or None if not exist.
+        """
+        order = self.get(order_id)
+        if order is not None:
+            self._unindex(order)
+        return order
+
+    def clear(self):
+        """Remove all orders."""
+        for order in list(self._open_orders.values()) + list(self._terminal_orders.values()):
+            self._unindex(order)
+
+    @staticmethod
+    def _key(order):
+        return order.order_id if order.order_id is not None else order.client_order_id
+
+    def _index(self, order):
+        order_id = self._key(order)
+        if order.status in ORDER_STATUS_TERMINAL:
+            if self._retention <= 0:
+                return
+            self._terminal_orders[order_id] = order
+            while len(self._terminal_orders) > self._retention:
+                _, oldest = self._terminal_orders.popitem(last=False)
+                self._unindex(oldest)
+        else:
+            self._open_orders[order_id] = order
+            action_orders = self._action_orders.get(order.action)
+            if action_orders is not None:
+                action_orders[order_id] = order
+        self._status_orders.setdefault(order.status, {})[order_id] = order
+        if order.client_order_id:
+            self._client_orders[order.client_order_id] = order
+
+    def _unindex(self, order):
+        order_id = self._key(order)
+        if self._open_orders.get(order_id) is order:
+            del self._open_orders[order_id]
+        if self._terminal_orders.get(order_id) is order:
+            del self._terminal_orders[order_id]
+        action_orders = self._action_orders.get(order.action)
+        if action_orders and action_orders.get(order_id) is order:
+            del action_orders[order_id]
+        status_orders = self._status_orders.get(order.status)
+        if status_orders and status_orders.get(order_id) is order:
+            del status_orders[order_id]
+        if order.client_order_id and self._client_orders.get(order.client_order_id) is order:
+            del self._client_orders[order.client_order_id]
@@ -10,18 +10,22 @@ Email:  huangtao@ifclover.com
 """
 
 import json
-import copy
-import hmac
-import hashlib
+import time
+import asyncio
 from urllib.parse import urljoin
 
+from aioquant import const
 from aioquant.error import Error
 from aioquant.utils import tools
 from aioquant.utils import logger
-from aioquant.order import Order
+from aioquant.order import Order, OrderStore
+from aioquant.asset import Asset, make_balance
 from aioquant.tasks import SingleTask, LoopRunTask
-from aioquant.utils.decorator import async_method_locker
-from aioquant.utils.web import Websocket, AsyncHttpRequests
+from aioquant.utils.decorator import async_method_locker, async_single_flight
+from aioquant.utils.web import Websocket, AsyncHttpRequests, HttpServerError
+from aioquant.utils.signer import HmacSigner, make_query
+from aioquant.utils.clock import get_server_clock
+from aioquant.utils.ratelimit import get_rate_limiter, PRIORITY_CANCEL, PRIORITY_ORDER, PRIORITY_QUERY
 from aioquant.order import ORDER_ACTION_SELL, ORDER_ACTION_BUY, ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET
 from aioquant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED, \
     ORDER_STATUS_CANCELED, ORDER_STATUS_FAILED
@@ -30,6 +34,26 @@ from aioquant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED,
 __all__ = ("BinanceRestAPI", "BinanceTrade", )
 
 
+def _error_code(error):
+    """Get error code from error information, e.g. `{"code": -2013, "msg": "Order does not exist."}`, return None
+    if no error code."""
+    if isinstance(error, str):
+        try:
+            error = json.loads(error)
+        except ValueError:
+            return None
+    if isinstance(error, dict):
+        return error.get("code")
+    return None
+
+
+def _is_ambiguous_error(error):
+    """If the request result is ambiguous, the request may be executed or not, e.g. network error, request timeout,
+    HTTP 5xx, or Binance's `Timeout waiting for response from backend server. Send status unknown; execution status
+    unknown.`(-1007) and `An unexpected response was received from the message bus. Execution status unknown.`(-1006)"""
+    return isinstance(error, Exception) or _error_code(error) in (-1006, -1007)
+
+
 class BinanceRestAPI:
     """Binance REST API client.
 
@@ -37,14 +61,58 @@ class BinanceRestAPI:
         host: HTTP request host.
         access_key: Account's ACCESS KEY.
         secret_key: Account's SECRET KEY.
+        rate_limits: Rate limit settings, default is `RATE_LIMITS`.
+
+    NOTE:
+        All the REST API clients with the same ACCESS KEY share one rate limiter.
     """
 
-    def __init__(self, host, access_key, secret_key):
+    # Rate limits, see `rateLimits` in exchange information. `{bucket_name: (capacity, interval seconds)}`
+    RATE_LIMITS = {
+        "weight": (1200, 60),  # REQUEST_WEIGHT, 1200 per minute.
+        "orders": (10, 1),  # ORDERS, 10 per second.
+        "orders_day": (100000, 86400)  # ORDERS, 100000 per day.
+    }
+
+    # Used weight and order count in response headers. `{header_name: bucket_name}`
+    RATE_LIMIT_HEADERS = {
+        "X-MBX-USED-WEIGHT-1M": "weight",
+        "X-MBX-USED-WEIGHT": "weight",
+        "X-MBX-ORDER-COUNT-1S": "orders",
+        "X-MBX-ORDER-COUNT-1D": "orders_day"
+    }
+
+    def __init__(self, host, access_key, secret_key, rate_limits=None):
         """Initialize REST API client."""
         self._host = host
         self._access_key = access_key
         self._secret_key = secret_key
+        self._clock = get_server_clock(const.BINANCE, host, self._fetch_server_time)
+        self._signer = HmacSigner(secret_key, time_func=self._clock.time)
+        self._rate_limiter = get_rate_limiter(const.BINANCE, access_key, rate_limits or self.RATE_LIMITS)
+
+    @property
+    def access_key(self):
+        return self._access_key
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    @property
+    def signer(self):
+        return self._signer
 
+    @property
+    def clock(self):
+        return self._clock
+
+    @property
+    def single_flight_id(self):
+        """Concurrent identical reads are shared by all the REST API clients with the same host and ACCESS KEY."""
+        return "{}:{}".format(self._host, self._access_key)
+
+    @async_single_flight()
     async def get_user_account(self):
         """Get user account information.
 
@@ -57,7 +125,7 @@ class BinanceRestAPI:
         params = {
             "timestamp": str(ts)
         }
-        success, error = await self.request("GET", uri, params, auth=True)
+        success, error = await self.request("GET", uri, params, auth=True, weight=5)
         return success, error
 
     async def get_server_time(self):
@@ -71,6 +139,22 @@ class BinanceRestAPI:
         success, error = await self.request("GET", uri)
         return success, error
 
+    async def _fetch_server_time(self):
+        """Fetch server timestamp(seconds) for clock synchronization, return None if failed.
+
+        NOTE:
+            The request is sent directly instead of waiting in rate limiter queue, otherwise the queueing time will
+            be measured as round trip time and bias the offset, the used weight is still corrected by response
+            headers.
+        """
+        url = urljoin(self._host, "/api/v1/time")
+        _, success, error = await AsyncHttpRequests.fetch("GET", url, timeout=5, verify_ssl=False,
+                                                          response_hook=self._on_response)
+        if error:
+            return None
+        return success["serverTime"] / 1000
+
+    @async_single_flight(ttl=10)
     async def get_exchange_info(self):
         """Get exchange information.
 
@@ -99,6 +183,7 @@ class BinanceRestAPI:
         success, error = await self.request("GET", uri, params=params)
         return success, error
 
+    @async_single_flight()
     async def get_orderbook(self, symbol, limit=10):
         """Get orderbook.
 
@@ -115,10 +200,18 @@ class BinanceRestAPI:
             "symbol": symbol,
             "limit": limit
         }
-        success, error = await self.request("GET", uri, params=params)
+        if limit <= 100:
+            weight = 1
+        elif limit <= 500:
+            weight = 5
+        elif limit <= 1000:
+            weight = 10
+        else:
+            weight = 50
+        success, error = await self.request("GET", uri, params=params, weight=weight)
         return success, error
 
-    async def create_order(self, action, symbol, price, quantity, client_order_id=None):
+    async def create_order(self, action, symbol, price, quantity, client_order_id=None, timeout=10):
         """Create an order.
         Args:
             action: Trade direction, `BUY` or `SELL`.
@@ -126,6 +219,7 @@ class BinanceRestAPI:
             price: Price of each contract.
             quantity: The buying or selling quantity.
             client_order_id: Client order id.
+            timeout: HTTP request timeout(seconds).
 
         Returns:
             success: Success results, otherwise it's None.
@@ -145,7 +239,8 @@ class BinanceRestAPI:
         }
         if client_order_id:
             data["newClientOrderId"] = client_order_id
-        success, error = await self.request("POST", uri, body=data, auth=True)
+        success, error = await self.request("POST", uri, body=data, auth=True, orders=1, priority=PRIORITY_ORDER,
+                                            timeout=timeout)
         return success, error
 
     async def revoke_order(self, symbol, order_id, client_order_id=None):
@@ -167,16 +262,35 @@ class BinanceRestAPI:
         }
         if client_order_id:
             params["origClientOrderId"] = client_order_id
-        success, error = await self.request("DELETE", uri, params=params, auth=True)
+        success, error = await self.request("DELETE", uri, params=params, auth=True, priority=PRIORITY_CANCEL)
+        return success, error
+
+    async def revoke_open_orders(self, symbol):
+        """Cancelling all open orders on a symbol, including OCO orders.
+
+        Args:
+            symbol: Symbol name, e.g. `BTCUSDT`.
+
+        Returns:
+            success: Success results, otherwise it's None.
+            error: Error information, otherwise it's None.
+        """
+        uri = "/api/v3/openOrders"
+        params = {
+            "symbol": symbol,
+            "timestamp": tools.get_cur_timestamp_ms()
+        }
+        success, error = await self.request("DELETE", uri, params=params, auth=True, priority=PRIORITY_CANCEL)
         return success, error
 
-    async def get_order_status(self, symbol, order_id, client_order_id):
+    async def get_order_status(self, symbol, order_id, client_order_id, timeout=10):
         """Get order details by order id.
 
         Args:
             symbol: Symbol name, e.g. `BTCUSDT`.
             order_id: Order id.
             client_order_id: Client order id.
+            timeout: HTTP request timeout(seconds).
 
         Returns:
             success: Success results, otherwise it's None.
@@ -185,11 +299,13 @@ class BinanceRestAPI:
         uri = "/api/v3/order"
         params = {
             "symbol": symbol,
-            "orderId": str(order_id),
-            "origClientOrderId": client_order_id,
             "timestamp": tools.get_cur_timestamp_ms()
         }
-        success, error = await self.request("GET", uri, params=params, auth=True)
+        if order_id:
+            params["orderId"] = str(order_id)
+        if client_order_id:
+            params["origClientOrderId"] = client_order_id
+        success, error = await self.request("GET", uri, params=params, auth=True, timeout=timeout)
         return success, error
 
     async def get_all_orders(self, symbol):
@@ -206,9 +322,10 @@ class BinanceRestAPI:
             "symbol": symbol,
             "timestamp": tools.get_cur_timestamp_ms()
         }
-        success, error = await self.request("GET", uri, params=params, auth=True)
+        success, error = await self.request("GET", uri, params=params, auth=True, weight=5)
         return success, error
 
+    @async_single_flight()
     async def get_open_orders(self, symbol):
         """Get all open order information.
         Args:
@@ -271,7 +388,8 @@ class BinanceRestAPI:
         success, error = await self.request("DELETE", uri, params=params)
         return success, error
 
-    async def request(self, method, uri, params=None, body=None, headers=None, auth=False):
+    async def request(self, method, uri, params=None, body=None, headers=None, auth=False, weight=1, orders=0,
+                      priority=PRIORITY_QUERY, timeout=10):
         """Do HTTP request.
 
         Args:
@@ -281,34 +399,214 @@ class BinanceRestAPI:
             body:   HTTP request body.
             headers: HTTP request headers.
             auth: If this request requires authentication.
+            weight: Request weight.
+            orders: Order count, `1` for creating an order.
+            priority: Request priority in rate limiter queue, cancel order requests will be sent first.
+            timeout: HTTP request timeout(seconds).
 
         Returns:
             success: Success results, otherwise it's None.
-            error: Error information, otherwise it's None.
+            error: Error information, otherwise it's None. `HttpServerError` if HTTP 5xx responded.
         """
+        # Waiting in rate limiter queue before signing, so that the timestamp will not be expired.
+        await self._rate_limiter.acquire({"weight": weight, "orders": orders, "orders_day": orders}, priority)
+
         url = urljoin(self._host, uri)
         data = {}
         if params:
             data.update(params)
         if body:
             data.update(body)
+        if "timestamp" in data:
+            data["timestamp"] = self._signer.timestamp_ms()
 
         if data:
-            query = "&".join(["=".join([str(k), str(v)]) for k, v in data.items()])
-        else:
-            query = ""
-        if auth and query:
-            signature = hmac.new(self._secret_key.encode(), query.encode(), hashlib.sha256).hexdigest()
-            query += "&signature={s}".format(s=signature)
-        if query:
-            url += ("?" + query)
+            query = make_query(data)
+            if auth:
+                query += "&signature=" + self._signer.sign(query)
+            url += "?" + query
 
         if not headers:
             headers = {}
         headers["X-MBX-APIKEY"] = self._access_key
-        _, success, error = await AsyncHttpRequests.fetch(method, url, headers=headers, timeout=10, verify_ssl=False)
+        code, success, error = await AsyncHttpRequests.fetch(method, url, headers=headers, timeout=timeout,
+                                                             verify_ssl=False, response_hook=self._on_response)
+        if code is not None and code >= 500:
+            error = HttpServerError(code, error)
         return success, error
 
+    def _on_response(self, response):
+        """Correct rate limiter with used weight and order count in response headers."""
+        for header, bucket_name in self.RATE_LIMIT_HEADERS.items():
+            used = response.headers.get(header)
+            if used is not None:
+                self._rate_limiter.update(bucket_name, int(used))
+        if response.status in (418, 429):  # 429: rate limit exceeded, 418: IP banned.
+            retry_after = response.headers.get("Retry-After")
+            self._rate_limiter.pause(int(retry_after) if retry_after else 60)
+
+
+class BinanceUserStream:
+    """Binance user data stream, all Trade objects with the same ACCESS KEY share one listen key and one Websocket
+    connection, and order updates are routed to Trade objects by symbol.
+
+    Attributes:
+        wss: Websocket address.
+        rest_api: REST API client, used to get and reset listen key.
+    """
+
+    _STREAMS = {}  # User data streams. e.g. {"wss:access_key": BinanceUserStream, ... }
+
+    def __init__(self, wss, rest_api, account):
+        """Initialize."""
+        self._wss = wss
+        self._rest_api = rest_api
+        self._listen_key = None  # Listen key for Websocket authentication.
+        self._ws = None
+        self._init_error = None  # Error of the last failed initialization, replayed to Trade objects registered later.
+        self._init_retry_delay = 1  # Delay(seconds) before retrying initialization, doubled on every failure.
+        self._trades = {}  # Trade objects indexed by raw symbol. e.g. {"BTCUSDT": [trade, ...], ... }
+        self._asset = Asset(const.BINANCE, account)  # Asset snapshot of this account, updated by user data stream.
+        self._balance_ts = 0  # Timestamp(millisecond) of the latest balances applied, to drop stale updates.
+
+        # Create a loop run task to reset listen key every 30 minutes.
+        LoopRunTask.register(self._reset_listen_key, 60 * 30)
+
+        # Create a coroutine to initialize Websocket connection.
+        SingleTask.run(self._init_websocket)
+
+        LoopRunTask.register(self._send_heartbeat_msg, 10)
+
+    @classmethod
+    def register(cls, trade):
+        """Register a Trade object into the user data stream of its account, if the stream not exist, create a new.
+
+        Args:
+            trade: BinanceTrade object.
+
+        Returns:
+            stream: User data stream.
+        """
+        key = "{}:{}".format(trade.wss, trade.rest_api.access_key)
+        stream = cls._STREAMS.get(key)
+        if not stream:
+            stream = cls(trade.wss, trade.rest_api, trade.account)
+            cls._STREAMS[key] = stream
+        stream._trades.setdefault(trade.raw_symbol, []).append(trade)
+        if stream._ws and stream._ws.connected:
+            SingleTask.run(trade.connected_callback)
+        elif stream._init_error:
+            trade.stream_error_callback(stream._init_error)
+        return stream
+
+    @property
+    def trades(self):
+        return [trade for trades in self._trades.values() for trade in trades]
+
+    @property
+    def asset(self):
+        return self._asset
+
+    async def _send_heartbeat_msg(self, *args, **kwargs):
+        if self._ws:
+            await self._ws.ping()
+
+    async def _init_websocket(self, *args, **kwargs):
+        """Initialize Websocket connection, if failed, notify all Trade objects and retry later with backoff.
+        """
+        # Get listen key first.
+        success, error = await self._rest_api.get_listen_key()
+        if error:
+            e = Error("get listen key failed: {}".format(error))
+            delay = self._init_retry_delay
+            self._init_retry_delay = min(delay * 2, 60)
+            self._init_error = e
+            logger.error(e, "retry after:", "%ss" % delay, caller=self)
+            for trade in self.trades:
+                trade.stream_error_callback(e)
+            SingleTask.call_later(self._init_websocket, delay)
+            return
+        self._init_error = None
+        self._init_retry_delay = 1
+        self._listen_key = success["listenKey"]
+        uri = "/ws/" + self._listen_key
+        url = urljoin(self._wss, uri)
+        self._ws = Websocket(url, self.connected_callback, process_callback=self.process)
+
+    async def _reset_listen_key(self, *args, **kwargs):
+        """Reset listen key."""
+        if not self._listen_key:
+            logger.error("listen key not initialized!", caller=self)
+            return
+        await self._rest_api.put_listen_key(self._listen_key)
+        logger.info("reset listen key success!", caller=self)
+
+    async def connected_callback(self):
+        """After websocket connection created successfully, notify all Trade objects, and pull back asset
+        information, since asset updates may be lost while the connection was broken."""
+        for trade in self.trades:
+            SingleTask.run(trade.connected_callback)
+        SingleTask.run(self._init_asset)
+
+    async def _init_asset(self):
+        """Pull back asset information by REST API."""
+        success, error = await self._rest_api.get_user_account()
+        if error:
+            e = Error("get user account error: {}".format(error))
+            logger.error(e, caller=self)
+            return
+        # The snapshot may be older than the balances pushed by user data stream while requesting.
+        update_ts = success.get("updateTime") or 0
+        if update_ts < self._balance_ts:
+            logger.info("drop stale asset snapshot, update time:", update_ts, "latest:", self._balance_ts,
+                        caller=self)
+            return
+        balances = {}
+        for item in success["balances"]:
+            balance = make_balance(item["free"], item["locked"])
+            if balance["total"] > 0:
+                balances[item["asset"]] = balance
+        self._update_asset(balances, update_ts or None, replace=True)
+
+    def _update_asset(self, balances, timestamp=None, replace=False):
+        """Update asset snapshot and notify all Trade objects."""
+        if timestamp:
+            self._balance_ts = max(self._balance_ts, timestamp)
+        if replace:
+            self._asset = Asset(self._asset.platform, self._asset.account, balances, timestamp)
+        else:
+            self._asset = self._asset.update(balances, timestamp)
+        for trade in self.trades:
+            trade.stream_asset_callback(self._asset)
+
+    async def process(self, msg):
+        """Process message that received from Websocket connection, order updates are routed by symbol, asset
+        updates are handled by stream self, and other messages are sent to all Trade objects.
+
+        Args:
+            msg: message received from Websocket connection.
+        """
+        e = msg.get("e")
+        if e == "executionReport":
+            for trade in self._trades.get(msg["s"], ()):
+                await trade.process(msg)
+        elif e == "outboundAccountPosition":  # Balances of the assets changed.
+            balances = {}
+            for item in msg["B"]:
+                balances[item["a"]] = make_balance(item["f"], item["l"])
+            self._update_asset(balances, msg["E"])
+        elif e == "balanceUpdate":  # Deposits, withdrawals or transfers, `d` is balance delta of free.
+            # `outboundAccountPosition` with absolute balances is pushed for the same change too, if it has arrived
+            # already, the delta has been included.
+            if msg["E"] <= self._balance_ts:
+                return
+            old = self._asset.get(msg["a"]) or make_balance(0, 0)
+            balance = make_balance(old["free"] + float(msg["d"]), old["locked"])
+            self._update_asset({msg["a"]: balance}, msg["E"])
+        else:
+            for trade in self.trades:
+                await trade.process(msg)
+
 
 class BinanceTrade:
     """Binance Trade module. You can initialize trade object with some attributes in kwargs.
@@ -330,6 +628,8 @@ class BinanceTrade:
         error_callback: You can use this param to specify a async callback function when you initializing Trade
             module. `error_callback` is like `async def on_error_callback(error: Error, **kwargs): pass`
             and this callback function will be executed asynchronous when some error occur while trade module is running.
+        create_retry_deadline: If creating an order gets an ambiguous result(e.g. request timeout), query it by
+            client order id until found or this deadline(seconds) exceeded, default is 10, 0 to disable.
     """
 
     def __init__(self, **kwargs):
@@ -363,63 +663,65 @@ class BinanceTrade:
         self._access_key = kwargs["access_key"]
         self._secret_key = kwargs["secret_key"]
         self._order_update_callback = kwargs.get("order_update_callback")
+        self._asset_update_callback = kwargs.get("asset_update_callback")
         self._init_callback = kwargs.get("init_callback")
         self._error_callback = kwargs.get("error_callback")
 
+        self._create_retry_deadline = kwargs.get("create_retry_deadline", 10)
+
         self._raw_symbol = self._symbol.replace("/", "")  # Row symbol name, same as Binance Exchange.
-        self._listen_key = None  # Listen key for Websocket authentication.
-        self._assets = {}  # Asset data. e.g. {"BTC": {"free": "1.1", "locked": "2.2", "total": "3.3"}, ... }
-        self._orders = {}  # Order data. e.g. {order_no: order, ... }
+        self._orders = OrderStore(kwargs.get("order_retention", 100))  # Order store, indexed by order id, etc.
 
         # Initialize our REST API client.
         self._rest_api = BinanceRestAPI(self._host, self._access_key, self._secret_key)
 
-        # Create a loop run task to reset listen key every 30 minutes.
-        LoopRunTask.register(self._reset_listen_key, 60 * 30)
+        # Pre-warm HTTP connections, so that the first order will not pay for TCP + TLS setup.
+        SingleTask.run(AsyncHttpRequests.prewarm, urljoin(self._host, "/api/v3/ping"))
 
-        # Create a coroutine to initialize Websocket connection.
-        SingleTask.run(self._init_websocket)
+        # Subscribe user data stream, which is shared by all Trade objects with the same account.
+        self._stream = BinanceUserStream.register(self)
 
-        LoopRunTask.register(self._send_heartbeat_msg, 10)
+    @property
+    def account(self):
+        return self._account
 
-    async def _send_heartbeat_msg(self, *args, **kwargs):
-        await self._ws.ping()
+    @property
+    def raw_symbol(self):
+        return self._raw_symbol
+
+    @property
+    def wss(self):
+        return self._wss
 
     @property
     def assets(self):
-        return copy.copy(self._assets)
+        return self._stream.asset.assets
+
+    @property
+    def asset(self):
+        return self._stream.asset
 
     @property
     def orders(self):
-        return copy.copy(self._orders)
+        return self._orders.open_orders
+
+    @property
+    def order_store(self):
+        return self._orders
 
     @property
     def rest_api(self):
         return self._rest_api
 
-    async def _init_websocket(self):
-        """Initialize Websocket connection.
-        """
-        # Get listen key first.
-        success, error = await self._rest_api.get_listen_key()
-        if error:
-            e = Error("get listen key failed: {}".format(error))
-            logger.error(e, caller=self)
-            SingleTask.run(self._error_callback, e)
-            SingleTask.run(self._init_callback, False)
-            return
-        self._listen_key = success["listenKey"]
-        uri = "/ws/" + self._listen_key
-        url = urljoin(self._wss, uri)
-        self._ws = Websocket(url, self.connected_callback, process_callback=self.process)
+    def stream_error_callback(self, error):
+        """User data stream initialized failed."""
+        SingleTask.run(self._error_callback, error)
+        SingleTask.run(self._init_callback, False)
 
-    async def _reset_listen_key(self, *args, **kwargs):
-        """Reset listen key."""
-        if not self._listen_key:
-            logger.error("listen key not initialized!", caller=self)
-            return
-        await self._rest_api.put_listen_key(self._listen_key)
-        logger.info("reset listen key success!", caller=self)
+    def stream_asset_callback(self, asset):
+        """Asset updated by user data stream."""
+        if self._asset_update_callback:
+            SingleTask.run(self._asset_update_callback, asset)
 
     async def connected_callback(self):
         """After websocket connection created successfully, pull back all open order information."""
@@ -465,9 +767,8 @@ class BinanceTrade:
                 "ctime": order_info["time"],
                 "utime": order_info["updateTime"]
             }
-            order = Order(**info)
-            self._orders[order_id] = order
-            SingleTask.run(self._order_update_callback, copy.copy(order))
+            order = self._orders.update(Order(**info), remain=info["remain"], status=status, utime=info["utime"])
+            SingleTask.run(self._order_update_callback, order)
 
         SingleTask.run(self._init_callback, True)
 
@@ -478,19 +779,113 @@ class BinanceTrade:
             action: Trade direction, `BUY` or `SELL`.
             price: Price of each order.
             quantity: The buying or selling quantity.
+            kwargs:
+                order_type: Order type, only `LIMIT` is supported, default is `LIMIT`.
+                client_order_id: Client order id.
+                wait_ack: If wait for the order acknowledged by exchange, default is `True`. If `False`, a pending
+                    order will be saved into order store and sent in background, and `client_order_id` returned.
 
         Returns:
             order_id: Order id if created successfully, otherwise it's None.
             error: Error information, otherwise it's None.
+
+        NOTE:
+            Only `LIMIT` order is supported, other order types are rejected.
         """
+        if kwargs.get("order_type", ORDER_TYPE_LIMIT) != ORDER_TYPE_LIMIT:
+            error = "order type error! only LIMIT order is supported."
+            SingleTask.run(self._error_callback, error)
+            return None, error
         client_order_id = kwargs["client_order_id"]
-        result, error = await self._rest_api.create_order(action, self._raw_symbol, price, quantity, client_order_id)
+        if not kwargs.get("wait_ack", True):
+            info = {
+                "platform": self._platform,
+                "account": self._account,
+                "strategy": self._strategy,
+                "client_order_id": client_order_id,
+                "action": action,
+                "order_type": ORDER_TYPE_LIMIT,
+                "symbol": self._symbol,
+                "price": price,
+                "quantity": quantity
+            }
+            self._orders.update(Order(**info))
+            SingleTask.run(self._send_pending_order, action, price, quantity, client_order_id)
+            return client_order_id, None
+        order_id, error = await self._send_order(action, price, quantity, client_order_id)
         if error:
             SingleTask.run(self._error_callback, error)
             return None, error
-        order_id = str(result["orderId"])
         return order_id, None
 
+    async def _send_order(self, action, price, quantity, client_order_id):
+        """Send an order. If the result is ambiguous(e.g. request timeout, HTTP 5xx), the order may be created or
+        not, query it by client order id until it's found or `create_retry_deadline` exceeded, every query is bounded
+        by the remaining time.
+
+        Returns:
+            order_id: Order id if created successfully, otherwise it's None.
+            error: Error information, otherwise it's None.
+
+        NOTE:
+            The order is never resent. Binance only rejects a duplicate client order id among open orders, the origin
+            order may still be in flight while it's not found, or it may have been filled, so a resent order could
+            be executed twice.
+        """
+        result, error = await self._rest_api.create_order(action, self._raw_symbol, price, quantity, client_order_id)
+        if not error:
+            return str(result["orderId"]), None
+        if not _is_ambiguous_error(error) or not client_order_id:
+            return None, error
+        deadline = time.monotonic() + self._create_retry_deadline
+        while True:
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                return None, error
+            try:
+                order_info, e = await asyncio.wait_for(
+                    self._rest_api.get_order_status(self._raw_symbol, None, client_order_id, timeout=remain), remain)
+            except asyncio.TimeoutError:
+                return None, error
+            if not e:
+                logger.info("order found after ambiguous result. client_order_id:", client_order_id,
+                            "error:", error, caller=self)
+                return str(order_info["orderId"]), None
+            await asyncio.sleep(max(0, min(0.5, deadline - time.monotonic())))
+
+    async def _send_pending_order(self, action, price, quantity, client_order_id):
+        """Send a pending order, and reconcile it with REST API response if Websocket order update not arrived yet."""
+        order_id, error = await self._send_order(action, price, quantity, client_order_id)
+        order = self._orders.get_by_client_order_id(client_order_id)
+        if error:
+            SingleTask.run(self._error_callback, error)
+            if order and order.order_id is None:
+                order = self._orders.update(order, status=ORDER_STATUS_FAILED, utime=tools.get_cur_timestamp_ms())
+                SingleTask.run(self._order_update_callback, order)
+            return
+        if order and order.order_id is None:
+            order = self._orders.update(order, order_id=order_id, status=ORDER_STATUS_SUBMITTED,
+                                        utime=tools.get_cur_timestamp_ms())
+            SingleTask.run(self._order_update_callback, order)
+
+    async def create_orders(self, orders, *args, **kwargs):
+        """Create multiple orders concurrently, Binance has no batch orders API for spot trading.
+
+        Args:
+            orders: Order list, e.g. `[{"action": "BUY", "price": "1.1", "quantity": "2", "client_order_id": "abc"},
+                ...]`, `client_order_id` is required, `order_type` is optional and only `LIMIT` is supported.
+
+        Returns:
+            results: Result list in the same order of `orders`, e.g. `[(order_id, error), ...]`.
+        """
+        coros = []
+        for o in orders:
+            coros.append(self.create_order(o["action"], o["price"], o["quantity"],
+                                           order_type=o.get("order_type", ORDER_TYPE_LIMIT),
+                                           client_order_id=o["client_order_id"]))
+        results = await asyncio.gather(*coros)
+        return list(results)
+
     async def revoke_order(self, *order_ids):
         """Revoke (an) order(s).
 
@@ -500,20 +895,30 @@ class BinanceTrade:
                 If you set multiple param, you can cancel multiple orders. Do not set param length more than 100.
 
         Returns:
-            Success or error, see bellow.
+            Success or error, see bellow. If cancel all orders or multiple orders, `success` is the order id list
+            revoked successfully, and `error` is the error list, e.g. `[(order_id, error), ...]`. If cancel all
+            orders and the request failed, `success` is None and `error` is the error information.
         """
         # If len(order_nos) == 0, you will cancel all orders for this symbol(initialized in Trade object).
         if len(order_ids) == 0:
-            order_infos, error = await self._rest_api.get_open_orders(self._raw_symbol)
+            result, error = await self._rest_api.revoke_open_orders(self._raw_symbol)
             if error:
+                # Binance returns `Unknown order sent.` if there is no open order.
+                if _error_code(error) == -2011:
+                    return [], []
                 SingleTask.run(self._error_callback, error)
-                return False, error
-            for order_info in order_infos:
-                _, error = await self._rest_api.revoke_order(self._raw_symbol, order_info["orderId"])
-                if error:
-                    SingleTask.run(self._error_callback, error)
-                    return False, error
-            return True, None
+                return None, error
+            success, error = [], []
+            for item in result:
+                # An OCO order list is returned with all its orders in `orderReports`.
+                for order_info in item.get("orderReports", [item]):
+                    order_id = str(order_info["orderId"])
+                    if order_info.get("status") == "CANCELED":
+                        success.append(order_id)
+                    else:
+                        SingleTask.run(self._error_callback, order_info)
+                        error.append((order_id, order_info))
+            return success, error
 
         # If len(order_nos) == 1, you will cancel an order.
         if len(order_ids) == 1:
@@ -524,11 +929,12 @@ class BinanceTrade:
             else:
                 return order_ids[0], None
 
-        # If len(order_nos) > 1, you will cancel multiple orders.
+        # If len(order_nos) > 1, you will cancel multiple orders concurrently.
         if len(order_ids) > 1:
+            results = await asyncio.gather(*[self._rest_api.revoke_order(self._raw_symbol, order_id)
+                                             for order_id in order_ids])
             success, error = [], []
-            for order_id in order_ids:
-                _, e = await self._rest_api.revoke_order(self._raw_symbol, order_id)
+            for order_id, (_, e) in zip(order_ids, results):
                 if e:
                     SingleTask.run(self._error_callback, e)
                     error.append((order_id, e))
@@ -557,7 +963,7 @@ class BinanceTrade:
         Args:
             msg: message received from Websocket connection.
         """
-        logger.debug("msg:", json.dumps(msg), caller=self)
+        logger.debug("msg:", msg, caller=self)
         e = msg.get("e")
         if e == "executionReport":  # Order update.
             if msg["s"] != self._raw_symbol:
@@ -579,7 +985,7 @@ class BinanceTrade:
                 logger.warn("unknown status:", msg, caller=self)
                 SingleTask.run(self._error_callback, "order status error.")
                 return
-            order = self._orders.get(order_id)
+            order = self._orders.get(order_id) or self._orders.get_by_client_order_id(msg["c"])
             if not order:
                 info = {
                     "platform": self._platform,
@@ -595,11 +1001,6 @@ class BinanceTrade:
                     "ctime": msg["O"]
                 }
                 order = Order(**info)
-                self._orders[order_id] = order
-            order.remain = float(msg["q"]) - float(msg["z"])
-            order.status = status
-            order.utime = msg["T"]
-            SingleTask.run(self._order_update_callback, copy.copy(order))
-
-            if status in [ORDER_STATUS_FAILED, ORDER_STATUS_CANCELED, ORDER_STATUS_FILLED]:
-                self._orders.pop(order_id)
+            order = self._orders.update(order, order_id=order_id, remain=float(msg["q"]) - float(msg["z"]),
+                                        status=status, utime=msg["T"])
+            SingleTask.run(self._order_update_callback, order)
@@ -9,21 +9,24 @@ Date:   2019/01/19
 Email:  huangtao@ifclover.com
 """
 
-import time
 import json
-import copy
-import hmac
+import time
+import asyncio
 import zlib
-import base64
 from urllib.parse import urljoin
 
+from aioquant import const
 from aioquant.error import Error
 from aioquant.utils import tools
 from aioquant.utils import logger
-from aioquant.order import Order
+from aioquant.order import Order, OrderStore
+from aioquant.asset import Asset, make_balance
 from aioquant.tasks import SingleTask, LoopRunTask
-from aioquant.utils.decorator import async_method_locker
-from aioquant.utils.web import Websocket, AsyncHttpRequests
+from aioquant.utils.decorator import async_method_locker, async_single_flight
+from aioquant.utils.web import Websocket, AsyncHttpRequests, HttpServerError
+from aioquant.utils.signer import HmacSigner, make_query
+from aioquant.utils.clock import get_server_clock
+from aioquant.utils.ratelimit import get_rate_limiter, PRIORITY_CANCEL, PRIORITY_ORDER, PRIORITY_QUERY
 from aioquant.order import ORDER_ACTION_BUY, ORDER_ACTION_SELL
 from aioquant.order import ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET
 from aioquant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED, \
@@ -33,6 +36,40 @@ from aioquant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED,
 __all__ = ("OKExRestAPI", "OKExTrade", )
 
 
+def _error_code(error):
+    """Get error code from error information, e.g. `{"code": 33014, "message": "Order does not exist"}`, return None
+    if no error code."""
+    if isinstance(error, str):
+        try:
+            error = json.loads(error)
+        except ValueError:
+            return None
+    if isinstance(error, dict):
+        code = error.get("code") or error.get("error_code")
+        return str(code) if code is not None else None
+    return None
+
+
+def _is_ambiguous_error(error):
+    """If the request result is ambiguous, the request may be executed or not, e.g. network error, request timeout,
+    HTTP 5xx, or OKEx's `Endpoint request failed. Please try again.`(30030)"""
+    return isinstance(error, Exception) or _error_code(error) == "30030"
+
+
+def _is_duplicate_error(error):
+    """If an order is rejected because the client order id is used already, OKEx does not document a dedicated
+    error code for it, so it's recognized by the error message, e.g. `Duplicated client_oid`."""
+    if isinstance(error, str):
+        try:
+            error = json.loads(error)
+        except ValueError:
+            return False
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get("message") or error.get("error_message") or "").lower()
+    return "duplicat" in message or "client_oid" in message
+
+
 class OKExRestAPI:
     """ OKEx REST API client.
 
@@ -41,15 +78,81 @@ class OKExRestAPI:
         access_key: Account's ACCESS KEY.
         secret_key: Account's SECRET KEY.
         passphrase: API KEY Passphrase.
+        rate_limits: Rate limit settings, default is `RATE_LIMITS`.
+
+    NOTE:
+        All the REST API clients with the same ACCESS KEY share one rate limiter.
     """
 
-    def __init__(self, host, access_key, secret_key, passphrase):
+    # Rate limits per endpoint class. `{bucket_name: (capacity, interval seconds)}`
+    RATE_LIMITS = {
+        "order": (100, 2),  # Create order, 100 requests per 2 seconds.
+        "batch_order": (50, 2),  # Create or cancel multiple orders, 50 requests per 2 seconds.
+        "cancel": (100, 2),  # Cancel order, 100 requests per 2 seconds.
+        "query": (20, 2),  # Query orders or accounts, 20 requests per 2 seconds.
+    }
+
+    def __init__(self, host, access_key, secret_key, passphrase, rate_limits=None):
         """Initialize."""
         self._host = host
         self._access_key = access_key
         self._secret_key = secret_key
         self._passphrase = passphrase
+        self._clock = get_server_clock(const.OKEX, host, self._fetch_server_time)
+        self._signer = HmacSigner(secret_key, output="base64", time_func=self._clock.time)
+        self._rate_limiter = get_rate_limiter(const.OKEX, access_key, rate_limits or self.RATE_LIMITS)
+
+    @property
+    def access_key(self):
+        return self._access_key
+
+    @property
+    def passphrase(self):
+        return self._passphrase
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    @property
+    def signer(self):
+        return self._signer
+
+    @property
+    def clock(self):
+        return self._clock
+
+    @property
+    def single_flight_id(self):
+        """Concurrent identical reads are shared by all the REST API clients with the same host and ACCESS KEY."""
+        return "{}:{}".format(self._host, self._access_key)
+
+    async def get_server_time(self):
+        """Get server time.
+
+        Returns:
+            success: Success results, otherwise it's None. e.g. `{"iso": "2015-01-07T23:47:25.201Z",
+                "epoch": "1420674445.201"}`
+            error: Error information, otherwise it's None.
+        """
+        uri = "/api/general/v3/time"
+        success, error = await self.request("GET", uri)
+        return success, error
+
+    async def _fetch_server_time(self):
+        """Fetch server timestamp(seconds) for clock synchronization, return None if failed.
+
+        NOTE:
+            The request is sent directly instead of waiting in rate limiter queue, otherwise the queueing time will
+            be measured as round trip time and bias the offset.
+        """
+        url = urljoin(self._host, "/api/general/v3/time")
+        _, success, error = await AsyncHttpRequests.fetch("GET", url, timeout=5, response_hook=self._on_response)
+        if error:
+            return None
+        return float(success["epoch"])
 
+    @async_single_flight()
     async def get_user_account(self):
         """Get account asset information.
 
@@ -61,7 +164,8 @@ class OKExRestAPI:
         result, error = await self.request("GET", uri, auth=True)
         return result, error
 
-    async def create_order(self, action, symbol, price, quantity, order_type=ORDER_TYPE_LIMIT, client_oid=None):
+    async def create_order(self, action, symbol, price, quantity, order_type=ORDER_TYPE_LIMIT, client_oid=None,
+                           timeout=10):
         """Create an order.
         Args:
             action: Action type, `BUY` or `SELL`.
@@ -70,12 +174,49 @@ class OKExRestAPI:
             quantity: Order quantity.
             order_type: Order type, `MARKET` or `LIMIT`.
             client_oid: Client order id, default is `None`.
+            timeout: HTTP request timeout(seconds).
 
         Returns:
             success: Success results, otherwise it's None.
             error: Error information, otherwise it's None.
         """
         uri = "/api/spot/v3/orders"
+        data = self._make_order_data(action, symbol, price, quantity, order_type, client_oid)
+        if not data:
+            return None, "order type error!"
+        result, error = await self.request("POST", uri, body=data, auth=True, limit="order", priority=PRIORITY_ORDER,
+                                           timeout=timeout)
+        return result, error
+
+    async def create_orders(self, symbol, orders):
+        """Create multiple orders in one request, maximum 10 orders can be placed at a time for each trading pair.
+
+        Args:
+            symbol: Trading pair, e.g. `BTC-USDT`.
+            orders: Order list, e.g. `[{"action": "BUY", "price": "1.1", "quantity": "2", "order_type": "LIMIT",
+                "client_oid": "abc"}, ...]`
+
+        Returns:
+            success: Success results, otherwise it's None. e.g. `{"btc_usdt": [{"client_oid": "abc",
+                "order_id": "123", "result": true, "error_code": "", "error_message": ""}, ...]}`
+            error: Error information, otherwise it's None.
+        """
+        uri = "/api/spot/v3/batch_orders"
+        if len(orders) > 10:
+            logger.warn("only create 10 orders per request!", caller=self)
+        body = []
+        for o in orders[:10]:
+            data = self._make_order_data(o["action"], symbol, o["price"], o["quantity"],
+                                         o.get("order_type", ORDER_TYPE_LIMIT), o.get("client_oid"))
+            if not data:
+                return None, "order type error!"
+            body.append(data)
+        result, error = await self.request("POST", uri, body=body, auth=True, limit="batch_order",
+                                           priority=PRIORITY_ORDER)
+        return result, error
+
+    def _make_order_data(self, action, symbol, price, quantity, order_type=ORDER_TYPE_LIMIT, client_oid=None):
+        """Make request data for creating an order, if order type error, return None."""
         data = {
             "side": "buy" if action == ORDER_ACTION_BUY else "sell",
             "instrument_id": symbol,
@@ -93,11 +234,10 @@ class OKExRestAPI:
                 data["size"] = quantity  # sell quantity.
         else:
             logger.error("order_type error! order_type:", order_type, caller=self)
-            return None, "order type error!"
+            return None
         if client_oid:
             data["client_oid"] = client_oid
-        result, error = await self.request("POST", uri, body=data, auth=True)
-        return result, error
+        return data
 
     async def revoke_order(self, symbol, order_id=None, client_oid=None):
         """Cancelling an unfilled order.
@@ -122,7 +262,8 @@ class OKExRestAPI:
         data = {
             "instrument_id": symbol
         }
-        result, error = await self.request("POST", uri, body=data, auth=True)
+        result, error = await self.request("POST", uri, body=data, auth=True, limit="cancel",
+                                           priority=PRIORITY_CANCEL)
         if error:
             return order_id, error
         if result["result"]:
@@ -166,9 +307,11 @@ class OKExRestAPI:
             ]
         else:
             return None, "order id list error!"
-        result, error = await self.request("POST", uri, body=body, auth=True)
+        result, error = await self.request("POST", uri, body=body, auth=True, limit="batch_order",
+                                           priority=PRIORITY_CANCEL)
         return result, error
 
+    @async_single_flight()
     async def get_open_orders(self, symbol, limit=100):
         """Get order details by order id.
 
@@ -188,12 +331,13 @@ class OKExRestAPI:
         result, error = await self.request("GET", uri, params=params, auth=True)
         return result, error
 
-    async def get_order_status(self, symbol, order_id=None, client_oid=None):
+    async def get_order_status(self, symbol, order_id=None, client_oid=None, timeout=10):
         """Get order status.
         Args:
             symbol: Trading pair, e.g. `BTC-USDT`.
             order_id: Order id.
             client_oid: Client order id, default is `None`.
+            timeout: HTTP request timeout(seconds).
 
         Returns:
             success: Success results, otherwise it's None.
@@ -211,10 +355,11 @@ class OKExRestAPI:
         params = {
             "instrument_id": symbol
         }
-        result, error = await self.request("GET", uri, params=params, auth=True)
+        result, error = await self.request("GET", uri, params=params, auth=True, timeout=timeout)
         return result, error
 
-    async def request(self, method, uri, params=None, body=None, headers=None, auth=False):
+    async def request(self, method, uri, params=None, body=None, headers=None, auth=False, limit="query",
+                      priority=PRIORITY_QUERY, timeout=10):
         """Do HTTP request.
 
         Args:
@@ -224,38 +369,236 @@ class OKExRestAPI:
             body: HTTP request body.
             headers: HTTP request headers.
             auth: If this request requires authentication.
+            limit: Endpoint class in rate limiter, `order` / `batch_order` / `cancel` / `query`.
+            priority: Request priority in rate limiter queue, cancel order requests will be sent first.
+            timeout: HTTP request timeout(seconds).
 
         Returns:
             success: Success results, otherwise it's None.
-            error: Error information, otherwise it's None.
+            error: Error information, otherwise it's None. `HttpServerError` if HTTP 5xx responded.
         """
+        # Waiting in rate limiter queue before signing, so that the timestamp will not be expired.
+        await self._rate_limiter.acquire({limit: 1}, priority)
+
         if params:
-            query = "&".join(["{}={}".format(k, params[k]) for k in sorted(params.keys())])
-            uri += "?" + query
+            uri += "?" + make_query(params, sort=True)
         url = urljoin(self._host, uri)
 
         if auth:
-            timestamp = str(time.time()).split(".")[0] + "." + str(time.time()).split(".")[1][:3]
+            timestamp = self._signer.timestamp_str()
             if body:
                 body = json.dumps(body)
             else:
                 body = ""
-            message = str(timestamp) + str.upper(method) + uri + str(body)
-            mac = hmac.new(bytes(self._secret_key, encoding="utf8"), bytes(message, encoding="utf-8"),
-                           digestmod="sha256")
-            d = mac.digest()
-            sign = base64.b64encode(d)
+            sign = self._signer.sign(timestamp + method.upper() + uri + body)
 
             if not headers:
                 headers = {}
             headers["Content-Type"] = "application/json"
-            headers["OK-ACCESS-KEY"] = self._access_key.encode().decode()
-            headers["OK-ACCESS-SIGN"] = sign.decode()
-            headers["OK-ACCESS-TIMESTAMP"] = str(timestamp)
+            headers["OK-ACCESS-KEY"] = self._access_key
+            headers["OK-ACCESS-SIGN"] = sign
+            headers["OK-ACCESS-TIMESTAMP"] = timestamp
             headers["OK-ACCESS-PASSPHRASE"] = self._passphrase
-        _, success, error = await AsyncHttpRequests.fetch(method, url, body=body, headers=headers, timeout=10)
+        code, success, error = await AsyncHttpRequests.fetch(method, url, body=body, headers=headers, timeout=timeout,
+                                                             response_hook=self._on_response)
+        if code is not None and code >= 500:
+            error = HttpServerError(code, error)
         return success, error
 
+    def _on_response(self, response):
+        """Pause all requests if rate limit exceeded."""
+        if response.status == 429:
+            retry_after = response.headers.get("Retry-After")
+            self._rate_limiter.pause(int(retry_after) if retry_after else 2)
+
+
+class OKExUserStream:
+    """OKEx login Websocket connection, all Trade objects with the same ACCESS KEY share one connection, and order
+    updates are routed to Trade objects by symbol.
+
+    Attributes:
+        wss: Websocket address.
+        rest_api: REST API client, its ACCESS KEY, passphrase and signer are used to login.
+    """
+
+    _STREAMS = {}  # Login Websocket connections. e.g. {"wss:access_key": OKExUserStream, ... }
+
+    def __init__(self, wss, rest_api, account):
+        """Initialize."""
+        self._rest_api = rest_api
+        self._authorized = False
+        self._login_error = None  # Error of the last failed login, replayed to Trade objects registered later.
+        self._trades = {}  # Trade objects indexed by raw symbol. e.g. {"BTC-USDT": [trade, ...], ... }
+        self._currencies = set()  # Currencies subscribed in account channel. e.g. {"BTC", "USDT"}
+        self._asset = Asset(const.OKEX, account)  # Asset snapshot of this account, updated by account channel.
+
+        url = wss + "/ws/v3"
+        self._ws = Websocket(url, self.connected_callback, process_binary_callback=self.process_binary)
+
+        # Create a loop run task to send ping message to server per 5 seconds.
+        LoopRunTask.register(self._send_heartbeat_msg, 5)
+
+    @classmethod
+    def register(cls, trade):
+        """Register a Trade object into the login Websocket connection of its account, if the connection not exist,
+        create a new.
+
+        Args:
+            trade: OKExTrade object.
+
+        Returns:
+            stream: Login Websocket connection.
+        """
+        key = "{}:{}".format(trade.wss, trade.rest_api.access_key)
+        stream = cls._STREAMS.get(key)
+        if not stream:
+            stream = cls(trade.wss, trade.rest_api, trade.account)
+            cls._STREAMS[key] = stream
+        stream._trades.setdefault(trade.raw_symbol, []).append(trade)
+        if stream._authorized:
+            SingleTask.run(trade.authorized_callback)
+            SingleTask.run(stream._subscribe_account)
+        elif stream._login_error:
+            trade.stream_error_callback(stream._login_error)
+        return stream
+
+    @property
+    def trades(self):
+        return [trade for trades in self._trades.values() for trade in trades]
+
+    @property
+    def asset(self):
+        return self._asset
+
+    async def connected_callback(self):
+        """After websocket connection created successfully, we will send a message to server for authentication."""
+        self._authorized = False
+        self._currencies = set()
+        signer = self._rest_api.signer
+        timestamp = signer.timestamp_str()
+        signature = signer.sign(timestamp + "GET/users/self/verify")
+        data = {
+            "op": "login",
+            "args": [self._rest_api.access_key, self._rest_api.passphrase, timestamp, signature]
+        }
+        await self._ws.send(data)
+
+    async def subscribe(self, channel):
+        """Subscribe a channel.
+
+        Args:
+            channel: Channel name, e.g. `spot/order:BTC-USDT`.
+        """
+        data = {
+            "op": "subscribe",
+            "args": [channel]
+        }
+        await self._ws.send(data)
+
+    async def _send_heartbeat_msg(self, *args, **kwargs):
+        """Send ping to server."""
+        hb = "ping"
+        await self._ws.send(hb)
+
+    async def _init_asset(self):
+        """Pull back asset information by REST API."""
+        success, error = await self._rest_api.get_user_account()
+        if error:
+            e = Error("get user account error: {}".format(error))
+            logger.error(e, caller=self)
+            return
+        balances = {}
+        for item in success:
+            balances[item["currency"]] = make_balance(item["available"], item["hold"])
+        self._update_asset(balances, replace=True)
+
+    async def _subscribe_account(self):
+        """Subscribe account channel for the currencies of all Trade objects' symbols."""
+        channels = []
+        for raw_symbol in list(self._trades.keys()):
+            for currency in raw_symbol.split("-"):
+                if currency not in self._currencies:
+                    self._currencies.add(currency)
+                    channels.append("spot/account:{currency}".format(currency=currency))
+        if channels:
+            data = {
+                "op": "subscribe",
+                "args": channels
+            }
+            await self._ws.send(data)
+
+    def _update_asset(self, balances, timestamp=None, replace=False):
+        """Update asset snapshot and notify all Trade objects."""
+        if replace:
+            self._asset = Asset(self._asset.platform, self._asset.account, balances, timestamp)
+        else:
+            self._asset = self._asset.update(balances, timestamp)
+        for trade in self.trades:
+            trade.stream_asset_callback(self._asset)
+
+    @async_method_locker("OKExUserStream.process_binary.locker")
+    async def process_binary(self, raw):
+        """Process binary message that received from websocket.
+
+        Args:
+            raw: Binary message received from websocket.
+
+        Returns:
+            None.
+        """
+        decompress = zlib.decompressobj(-zlib.MAX_WBITS)
+        msg = decompress.decompress(raw)
+        msg += decompress.flush()
+        msg = msg.decode()
+        if msg == "pong":
+            return
+        logger.debug("msg:", msg, caller=self)
+        msg = json.loads(msg)
+
+        # Authorization message received.
+        if msg.get("event") == "login":
+            if not msg.get("success"):
+                e = Error("Websocket connection authorized failed: {}".format(msg))
+                logger.error(e, caller=self)
+                self._login_error = e
+                for trade in self.trades:
+                    trade.stream_error_callback(e)
+                return
+            logger.info("Websocket connection authorized successfully.", caller=self)
+            self._authorized = True
+            self._login_error = None
+            for trade in self.trades:
+                SingleTask.run(trade.authorized_callback)
+            # Pull back asset by REST API in background, DO NOT block the messages processing with the locker held.
+            SingleTask.run(self._init_asset)
+            await self._subscribe_account()
+            return
+
+        # Subscribe response message received, route by channel.
+        if msg.get("event") == "subscribe":
+            for trade in self.trades:
+                if trade.order_channel == msg.get("channel"):
+                    await trade.process(msg)
+            return
+
+        # Asset update message received.
+        if msg.get("table") == "spot/account":
+            balances = {}
+            for data in msg["data"]:
+                balances[data["currency"]] = make_balance(data["available"], data["hold"])
+            self._update_asset(balances)
+            return
+
+        # Order update message received, route by symbol.
+        if msg.get("table") == "spot/order":
+            for data in msg["data"]:
+                for trade in self._trades.get(data["instrument_id"], ()):
+                    await trade.process({"table": msg["table"], "data": [data]})
+            return
+
+        for trade in self.trades:
+            await trade.process(msg)
+
 
 class OKExTrade:
     """OKEx Trade module. You can initialize trade object with some attributes in kwargs.
@@ -278,6 +621,9 @@ class OKExTrade:
         error_callback: You can use this param to specify a async callback function when you initializing Trade
             module. `error_callback` is like `async def on_error_callback(error: Error, **kwargs): pass`
             and this callback function will be executed asynchronous when some error occur while trade module is running.
+        create_retry_deadline: If creating an order gets an ambiguous result(e.g. request timeout), query it by client
+            order id and resend it only after confirmed not exist, until resolved or this deadline(seconds) exceeded,
+            default is 10, 0 to disable.
     """
 
     def __init__(self, **kwargs):
@@ -315,105 +661,98 @@ class OKExTrade:
         self._secret_key = kwargs["secret_key"]
         self._passphrase = kwargs["passphrase"]
         self._order_update_callback = kwargs.get("order_update_callback")
+        self._asset_update_callback = kwargs.get("asset_update_callback")
         self._init_callback = kwargs.get("init_callback")
         self._error_callback = kwargs.get("error_callback")
 
+        self._create_retry_deadline = kwargs.get("create_retry_deadline", 10)
+
         self._raw_symbol = self._symbol.replace("/", "-")
         self._order_channel = "spot/order:{symbol}".format(symbol=self._raw_symbol)
 
-        url = self._wss + "/ws/v3"
-        self._ws = Websocket(url, self.connected_callback, process_binary_callback=self.process_binary)
-
-        self._assets = {}  # Asset object. e.g. {"BTC": {"free": "1.1", "locked": "2.2", "total": "3.3"}, ... }
-        self._orders = {}  # Order objects. e.g. {"order_id": Order, ... }
+        self._orders = OrderStore(kwargs.get("order_retention", 100))  # Order store, indexed by order id, etc.
 
         # Initializing our REST API client.
         self._rest_api = OKExRestAPI(self._host, self._access_key, self._secret_key, self._passphrase)
 
-        # Create a loop run task to send ping message to server per 5 seconds.
-        LoopRunTask.register(self._send_heartbeat_msg, 5)
+        # Pre-warm HTTP connections, so that the first order will not pay for TCP + TLS setup.
+        SingleTask.run(AsyncHttpRequests.prewarm, urljoin(self._host, "/api/general/v3/time"))
+
+        # Subscribe order channel by the login Websocket connection, which is shared by all Trade objects with the
+        # same account.
+        self._stream = OKExUserStream.register(self)
+
+    @property
+    def account(self):
+        return self._account
+
+    @property
+    def raw_symbol(self):
+        return self._raw_symbol
+
+    @property
+    def order_channel(self):
+        return self._order_channel
+
+    @property
+    def wss(self):
+        return self._wss
 
     @property
     def assets(self):
-        return copy.copy(self._assets)
+        return self._stream.asset.assets
+
+    @property
+    def asset(self):
+        return self._stream.asset
 
     @property
     def orders(self):
-        return copy.copy(self._orders)
+        return self._orders.open_orders
+
+    @property
+    def order_store(self):
+        return self._orders
 
     @property
     def rest_api(self):
         return self._rest_api
 
-    async def connected_callback(self):
-        """After websocket connection created successfully, we will send a message to server for authentication."""
-        timestamp = str(time.time()).split(".")[0] + "." + str(time.time()).split(".")[1][:3]
-        message = str(timestamp) + "GET" + "/users/self/verify"
-        mac = hmac.new(bytes(self._secret_key, encoding="utf8"), bytes(message, encoding="utf8"), digestmod="sha256")
-        d = mac.digest()
-        signature = base64.b64encode(d).decode()
-        data = {
-            "op": "login",
-            "args": [self._access_key, self._passphrase, timestamp, signature]
-        }
-        await self._ws.send(data)
+    def stream_error_callback(self, error):
+        """Login Websocket connection authorized failed."""
+        SingleTask.run(self._error_callback, error)
+        SingleTask.run(self._init_callback, False)
+
+    def stream_asset_callback(self, asset):
+        """Asset updated by account channel."""
+        if self._asset_update_callback:
+            SingleTask.run(self._asset_update_callback, asset)
+
+    async def authorized_callback(self):
+        """After login Websocket connection authorized successfully, pull back all open order information and
+        subscribe order channel."""
+        # Fetch orders from server. (open + partially filled)
+        order_infos, error = await self._rest_api.get_open_orders(self._raw_symbol)
+        if error:
+            e = Error("get open orders error: {}".format(error))
+            SingleTask.run(self._error_callback, e)
+            SingleTask.run(self._init_callback, False)
+            return
+        if len(order_infos) > 100:
+            logger.warn("order length too long! (more than 100)", caller=self)
+        for order_info in order_infos:
+            info = dict(order_info, ctime=order_info["created_at"], utime=order_info["timestamp"])
+            self._update_order(info)
 
-    async def _send_heartbeat_msg(self, *args, **kwargs):
-        """Send ping to server."""
-        hb = "ping"
-        await self._ws.send(hb)
+        # Subscribe order channel.
+        await self._stream.subscribe(self._order_channel)
 
-    @async_method_locker("OKExTrade.process_binary.locker")
-    async def process_binary(self, raw):
-        """Process binary message that received from websocket.
+    async def process(self, msg):
+        """Process message that routed from login Websocket connection.
 
         Args:
-            raw: Binary message received from websocket.
-
-        Returns:
-            None.
+            msg: Message received from Websocket connection.
         """
-        decompress = zlib.decompressobj(-zlib.MAX_WBITS)
-        msg = decompress.decompress(raw)
-        msg += decompress.flush()
-        msg = msg.decode()
-        if msg == "pong":
-            return
-        logger.debug("msg:", msg, caller=self)
-        msg = json.loads(msg)
-
-        # Authorization message received.
-        if msg.get("event") == "login":
-            if not msg.get("success"):
-                e = Error("Websocket connection authorized failed: {}".format(msg))
-                logger.error(e, caller=self)
-                SingleTask.run(self._error_callback, e)
-                SingleTask.run(self._init_callback, False)
-                return
-            logger.info("Websocket connection authorized successfully.", caller=self)
-
-            # Fetch orders from server. (open + partially filled)
-            order_infos, error = await self._rest_api.get_open_orders(self._raw_symbol)
-            if error:
-                e = Error("get open orders error: {}".format(msg))
-                SingleTask.run(self._error_callback, e)
-                SingleTask.run(self._init_callback, False)
-                return
-            if len(order_infos) > 100:
-                logger.warn("order length too long! (more than 100)", caller=self)
-            for order_info in order_infos:
-                order_info["ctime"] = order_info["created_at"]
-                order_info["utime"] = order_info["timestamp"]
-                self._update_order(order_info)
-
-            # Subscribe order channel.
-            data = {
-                "op": "subscribe",
-                "args": [self._order_channel]
-            }
-            await self._ws.send(data)
-            return
-
         # Subscribe response message received.
         if msg.get("event") == "subscribe":
             if msg.get("channel") == self._order_channel:
@@ -438,6 +777,11 @@ class OKExTrade:
             action: Trade direction, `BUY` or `SELL`.
             price: Price of each order.
             quantity: The buying or selling quantity.
+            kwargs:
+                order_type: Order type, `LIMIT` or `MARKET`, default is `LIMIT`.
+                client_order_id: Client order id.
+                wait_ack: If wait for the order acknowledged by exchange, default is `True`. If `False`, a pending
+                    order will be saved into order store and sent in background, and `client_order_id` returned.
 
         Returns:
             order_id: Order id if created successfully, otherwise it's None.
@@ -445,15 +789,170 @@ class OKExTrade:
         """
         order_type = kwargs.get("order_type", ORDER_TYPE_LIMIT)
         client_order_id = kwargs.get("client_order_id")
-        result, error = await self._rest_api.create_order(action, self._raw_symbol, price, quantity, order_type,
-                                                          client_order_id)
+        if not kwargs.get("wait_ack", True):
+            info = {
+                "platform": self._platform,
+                "account": self._account,
+                "strategy": self._strategy,
+                "client_order_id": client_order_id,
+                "action": action,
+                "order_type": order_type,
+                "symbol": self._symbol,
+                "price": price,
+                "quantity": quantity
+            }
+            self._orders.update(Order(**info))
+            SingleTask.run(self._send_pending_order, action, price, quantity, order_type, client_order_id)
+            return client_order_id, None
+        order_id, error = await self._send_order(action, price, quantity, order_type, client_order_id)
         if error:
             SingleTask.run(self._error_callback, error)
             return None, error
+        return order_id, None
+
+    async def _send_order(self, action, price, quantity, order_type, client_order_id):
+        """Send an order. If the result is ambiguous(e.g. request timeout, HTTP 5xx), the order may be created or
+        not, query it by client order id, and resend it with the same client order id only after the query confirms
+        it does not exist(33014), until it's resolved or `create_retry_deadline` exceeded, every request is bounded
+        by the remaining time.
+
+        Returns:
+            order_id: Order id if created successfully, otherwise it's None.
+            error: Error information, otherwise it's None.
+
+        NOTE:
+            The origin order may be created but not visible yet when queried. If the resent order is rejected as a
+            duplicate client order id, the origin order exists, it's queried until found or the deadline exceeded.
+            If it's rejected for other reasons, the rejection is returned once the origin order is confirmed not
+            exist again.
+        """
+        result, error = await self._create_order(action, price, quantity, order_type, client_order_id)
+        if not error:
+            return result, None
+        if not _is_ambiguous_error(error) or not client_order_id:
+            return None, error
+        deadline = time.monotonic() + self._create_retry_deadline
+        resend = True  # Resend is allowed until the resent order is rejected.
+        duplicate = False  # If the resent order is rejected as a duplicate client order id.
+        while True:
+            remain = deadline - time.monotonic()
+            if remain <= 0:
+                return None, error
+            try:
+                order_info, e = await asyncio.wait_for(
+                    self._rest_api.get_order_status(self._raw_symbol, client_oid=client_order_id, timeout=remain),
+                    remain)
+            except asyncio.TimeoutError:
+                return None, error
+            if not e:
+                logger.info("order found after ambiguous result. client_order_id:", client_order_id,
+                            "error:", error, caller=self)
+                return str(order_info["order_id"]), None
+            if _error_code(e) == "33014" and not duplicate:  # Order does not exist.
+                if not resend:  # The resent order was rejected not because of duplication.
+                    return None, error
+                remain = deadline - time.monotonic()
+                if remain <= 0:
+                    return None, error
+                try:
+                    order_id, e2 = await asyncio.wait_for(
+                        self._create_order(action, price, quantity, order_type, client_order_id, timeout=remain),
+                        remain)
+                except asyncio.TimeoutError:
+                    return None, error
+                if not e2:
+                    logger.info("order resent after ambiguous result. client_order_id:", client_order_id,
+                                "error:", error, caller=self)
+                    return order_id, None
+                if not _is_ambiguous_error(e2):
+                    resend = False
+                    error = e2
+                    duplicate = _is_duplicate_error(e2)
+                    if duplicate:  # The origin order exists, query it until visible.
+                        logger.warn("resent order rejected as duplicate, query the origin order. client_order_id:",
+                                    client_order_id, "error:", e2, caller=self)
+                    else:
+                        logger.warn("resent order rejected, confirm the origin order not exist. client_order_id:",
+                                    client_order_id, "error:", e2, caller=self)
+            await asyncio.sleep(max(0, min(0.5, deadline - time.monotonic())))
+
+    async def _create_order(self, action, price, quantity, order_type, client_order_id, timeout=10):
+        """Create an order by REST API, a result with `result=false` is returned as error."""
+        result, error = await self._rest_api.create_order(action, self._raw_symbol, price, quantity, order_type,
+                                                          client_order_id, timeout=timeout)
+        if error:
+            return None, error
         if not result["result"]:
-            SingleTask.run(self._error_callback, result)
             return None, result
-        return result["order_id"], None
+        return str(result["order_id"]), None
+
+    async def _send_pending_order(self, action, price, quantity, order_type, client_order_id):
+        """Send a pending order, and reconcile it with REST API response if Websocket order update not arrived yet."""
+        order_id, error = await self._send_order(action, price, quantity, order_type, client_order_id)
+        order = self._orders.get_by_client_order_id(client_order_id)
+        if error:
+            SingleTask.run(self._error_callback, error)
+            if order and order.order_id is None:
+                order = self._orders.update(order, status=ORDER_STATUS_FAILED, utime=tools.get_cur_timestamp_ms())
+                SingleTask.run(self._order_update_callback, order)
+            return
+        if order and order.order_id is None:
+            order = self._orders.update(order, order_id=order_id, status=ORDER_STATUS_SUBMITTED,
+                                        utime=tools.get_cur_timestamp_ms())
+            SingleTask.run(self._order_update_callback, order)
+
+    async def create_orders(self, orders, *args, **kwargs):
+        """Create multiple orders, using batch orders API, 10 orders per request, and all requests are sent
+        concurrently.
+
+        Args:
+            orders: Order list, e.g. `[{"action": "BUY", "price": "1.1", "quantity": "2", "order_type": "LIMIT",
+                "client_order_id": "abc"}, ...]`, `client_order_id` is required.
+
+        Returns:
+            results: Result list in the same order of `orders`, e.g. `[(order_id, error), ...]`.
+        """
+        chunks = [orders[i:i + 10] for i in range(0, len(orders), 10)]
+        responses = await asyncio.gather(*[self._create_orders_chunk(chunk) for chunk in chunks])
+        results = []
+        for chunk_results in responses:
+            results.extend(chunk_results)
+        return results
+
+    async def _create_orders_chunk(self, orders):
+        """Create at most 10 orders in one request.
+
+        Returns:
+            results: Result list in the same order of `orders`, e.g. `[(order_id, error), ...]`.
+        """
+        data = []
+        for o in orders:
+            data.append({
+                "action": o["action"],
+                "price": o["price"],
+                "quantity": o["quantity"],
+                "order_type": o.get("order_type", ORDER_TYPE_LIMIT),
+                "client_oid": o["client_order_id"]
+            })
+        result, error = await self._rest_api.create_orders(self._raw_symbol, data)
+        if error:
+            SingleTask.run(self._error_callback, error)
+            return [(None, error)] * len(orders)
+        items = result.get(self._raw_symbol.lower().replace("-", "_")) or result.get(self._raw_symbol.lower()) or []
+        items = {item.get("client_oid"): item for item in items}
+        results = []
+        for o in orders:
+            item = items.get(o["client_order_id"])
+            if not item:
+                e = Error("create order failed, no result: {}".format(o))
+                SingleTask.run(self._error_callback, e)
+                results.append((None, e))
+            elif not item.get("result"):
+                SingleTask.run(self._error_callback, item)
+                results.append((None, item))
+            else:
+                results.append((str(item["order_id"]), None))
+        return results
 
     async def revoke_order(self, *order_ids):
         """Revoke (an) order(s).
@@ -464,26 +963,25 @@ class OKExTrade:
                 If you set multiple param, you can cancel multiple orders. Do not set param length more than 100.
 
         Returns:
-            Success or error, see bellow.
+            Success or error, see bellow. If cancel all orders or multiple orders, `success` is the order id list
+            revoked successfully, and `error` is the error list, e.g. `[(order_id, error), ...]`. If cancel all
+            orders and open orders can't be fetched, `success` is None and `error` is the error information.
 
         NOTEs:
-            DO NOT INPUT MORE THAT 10 ORDER IDs, you can invoke many times.
+            Multiple orders will be revoked by batch cancel API, 10 orders per request and all requests are sent
+            concurrently.
         """
         # If len(order_ids) == 0, you will cancel all orders for this symbol(initialized in Trade object).
         if len(order_ids) == 0:
-            order_infos, error = await self._rest_api.get_open_orders(self._raw_symbol)
+            # Orders may be created just now, do not share the in-flight request.
+            order_infos, error = await self._rest_api.get_open_orders(self._raw_symbol, single_flight=False)
             if error:
                 SingleTask.run(self._error_callback, error)
-                return False, error
+                return None, error
             if len(order_infos) > 100:
                 logger.warn("order length too long! (more than 100)", caller=self)
-            for order_info in order_infos:
-                order_id = order_info["order_id"]
-                _, error = await self._rest_api.revoke_order(self._raw_symbol, order_id)
-                if error:
-                    SingleTask.run(self._error_callback, error)
-                    return False, error
-            return True, None
+            success, error = await self._revoke_orders([order_info["order_id"] for order_info in order_infos])
+            return success, error
 
         # If len(order_ids) == 1, you will cancel an order.
         if len(order_ids) == 1:
@@ -496,15 +994,43 @@ class OKExTrade:
 
         # If len(order_ids) > 1, you will cancel multiple orders.
         if len(order_ids) > 1:
-            success, error = [], []
-            for order_id in order_ids:
-                _, e = await self._rest_api.revoke_order(self._raw_symbol, order_id)
-                if e:
+            success, error = await self._revoke_orders(list(order_ids))
+            return success, error
+
+    async def _revoke_orders(self, order_ids):
+        """Revoke multiple orders, using batch cancel API, 10 orders per request, and all requests are sent
+        concurrently.
+
+        Args:
+            order_ids: Order id list.
+
+        Returns:
+            success: Order id list revoked successfully.
+            error: Error list, e.g. `[(order_id, error), ...]`.
+        """
+        chunks = [order_ids[i:i + 10] for i in range(0, len(order_ids), 10)]
+        responses = await asyncio.gather(*[self._rest_api.revoke_orders(self._raw_symbol, chunk)
+                                           for chunk in chunks])
+        success, error = [], []
+        for chunk, (result, e) in zip(chunks, responses):
+            if e:
+                SingleTask.run(self._error_callback, e)
+                error.extend([(order_id, e) for order_id in chunk])
+                continue
+            items = {}
+            for values in result.values():
+                if isinstance(values, list):
+                    for item in values:
+                        items[str(item.get("order_id"))] = item
+            for order_id in chunk:
+                item = items.get(str(order_id))
+                if item and item.get("result"):
+                    success.append(order_id)
+                else:
+                    e = item or Error("revoke order failed, no result: {}".format(order_id))
                     SingleTask.run(self._error_callback, e)
                     error.append((order_id, e))
-                else:
-                    success.append(order_id)
-            return success, error
+        return success, error
 
     async def get_open_order_ids(self):
         """Get open order id list.
@@ -558,7 +1084,7 @@ class OKExTrade:
             SingleTask.run(self._error_callback, "order status error.")
             return None
 
-        order = self._orders.get(order_id)
+        order = self._orders.get(order_id) or self._orders.get_by_client_order_id(order_info["client_oid"])
         if not order:
             info = {
                 "platform": self._platform,
@@ -572,13 +1098,6 @@ class OKExTrade:
                 "quantity": order_info["size"]
             }
             order = Order(**info)
-            self._orders[order_id] = order
-        order.remain = remain
-        order.status = status
-        order.ctime = ctime
-        order.utime = utime
-
-        SingleTask.run(self._order_update_callback, copy.copy(order))
+        order = self._orders.update(order, order_id=order_id, remain=remain, status=status, ctime=ctime, utime=utime)
 
-        if status in [ORDER_STATUS_FAILED, ORDER_STATUS_CANCELED, ORDER_STATUS_FILLED]:
-            self._orders.pop(order_id)
+        SingleTask.run(self._order_update_callback, order)
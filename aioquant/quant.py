@@ -11,9 +11,24 @@ Email:  huangtao@ifclover.com
 import signal
 import asyncio
 import inspect
+import threading
 
 from aioquant.utils import logger
 from aioquant.configure import config
+from aioquant.utils.journal import journal
+
+# Shutdown phases, executed in order:
+#   market: stop dispatching market events to strategies;
+#   orders: cancel open orders of all Trade objects, only if `SHUTDOWN.cancel_orders` is true;
+#   publish: wait for in-flight event publishes;
+#   connections: close Websocket connections, RabbitMQ connection and HTTP sessions;
+#   tasks: stop heartbeat and cancel all running tasks;
+#   flush: flush logger and journal, always executed even if timeout, bounded by `SHUTDOWN.flush_timeout`.
+SHUTDOWN_PHASES = ("market", "orders", "publish", "connections", "tasks", "flush")
+
+# Default concurrency limits of task groups, can be overridden by `TASKS.group_limits`.
+#   publish: event publishes to RabbitMQ.
+DEFAULT_GROUP_LIMITS = {"publish": 100}
 
 
 class AIOQuant:
@@ -23,24 +38,25 @@ class AIOQuant:
     def __init__(self) -> None:
         self.loop = None
         self.event_center = None
+        self._shutdown_hooks = {phase: [] for phase in SHUTDOWN_PHASES}  # `{phase: [func, ...]}`
+        self._shutdown_task = None
 
     def _initialize(self, config_file):
         """Initialize."""
-        self._get_event_loop()
         self._load_settings(config_file)
         self._init_logger()
+        self._get_event_loop()
+        self._init_journal()
+        self._init_tasks()
         self._init_event_center()
         self._do_heartbeat()
+        self._init_monitor()
         return self
 
     def start(self, config_file=None, entrance_func=None) -> None:
         """Start the event loop."""
-        def keyboard_interrupt(s, f):
-            print("KeyboardInterrupt (ID: {}) has been caught. Cleaning up...".format(s))
-            self.stop()
-        signal.signal(signal.SIGINT, keyboard_interrupt)
-
         self._initialize(config_file)
+        self._init_signal()
         if entrance_func:
             if inspect.iscoroutinefunction(entrance_func):
                 self.loop.create_task(entrance_func())
@@ -51,22 +67,179 @@ class AIOQuant:
         self.loop.run_forever()
 
     def stop(self) -> None:
-        """Stop the event loop."""
-        logger.info("stop io loop.", caller=self)
-        # TODO: clean up running coroutine
+        """Shutdown gracefully and stop the event loop, stop immediately if invoked again while shutting down."""
+        if not self.loop or not self.loop.is_running():
+            logger.info("stop io loop.", caller=self)
+            logger.flush()
+            journal.flush()
+            if self.loop:
+                self.loop.stop()
+            return
+        if self._shutdown_task:
+            logger.warn("stop io loop immediately.", caller=self)
+            logger.flush()
+            journal.flush()
+            self.loop.stop()
+            return
+        self._shutdown_task = self.loop.create_task(self.shutdown())
+
+    def add_shutdown_hook(self, func, phase="market") -> None:
+        """Add a hook to be executed at the beginning of a shutdown phase.
+
+        Args:
+            func: Hook function, asynchronous or not, without any param.
+            phase: Shutdown phase, see `SHUTDOWN_PHASES`, default is `market`.
+        """
+        if phase not in self._shutdown_hooks:
+            raise ValueError("shutdown phase error: {}".format(phase))
+        self._shutdown_hooks[phase].append(func)
+
+    async def shutdown(self) -> None:
+        """Execute shutdown phases in order and stop the event loop, the phases not finished before
+        `SHUTDOWN.timeout` will be abandoned, except `flush`, which is bounded by `SHUTDOWN.flush_timeout` separately.
+        """
+        timeout = config.shutdown.get("timeout", 10)
+        flush_timeout = config.shutdown.get("flush_timeout", 2)
+        start = self.loop.time()
+        deadline = start + timeout
+        flush_deadline = None
+        logger.info("shutdown start, timeout:", timeout, caller=self)
+        for phase in SHUTDOWN_PHASES:
+            t0 = self.loop.time()
+            if phase != "flush" and t0 >= deadline:
+                logger.warn("shutdown phase:", phase, "skipped, timeout!", caller=self)
+                continue
+            try:
+                if phase == "flush":
+                    flush_deadline = t0 + flush_timeout
+                    await asyncio.wait_for(self._do_shutdown_phase(phase), flush_timeout)
+                else:
+                    await asyncio.wait_for(self._do_shutdown_phase(phase), deadline - t0)
+            except asyncio.TimeoutError:
+                logger.warn("shutdown phase:", phase, "timeout!", caller=self)
+            except Exception:
+                logger.exception("shutdown phase:", phase, "error!", caller=self)
+            logger.info("shutdown phase:", phase, "cost:", "%.3fs" % (self.loop.time() - t0), caller=self)
+        logger.info("stop io loop. shutdown cost:", "%.3fs" % (self.loop.time() - start), caller=self)
+        # Flush the logs above within the rest of flush timeout.
+        remain = flush_deadline - self.loop.time()
+        if remain > 0:
+            try:
+                await asyncio.wait_for(self._flush_in_thread(logger.flush, remain), remain)
+            except asyncio.TimeoutError:
+                pass
         self.loop.stop()
 
+    def _flush_in_thread(self, func, *args):
+        """Run a blocking flush function in a daemon thread, so that the event loop is not blocked, and the process
+        will not wait for it while exiting if it's timeout.
+
+        Returns:
+            future: Future object, done after the function returned.
+        """
+        future = self.loop.create_future()
+
+        def done():
+            if not future.done():
+                future.set_result(None)
+
+        def run():
+            try:
+                func(*args)
+            except Exception:
+                logger.exception("flush error:", func, caller=self)
+            finally:
+                try:
+                    self.loop.call_soon_threadsafe(done)
+                except RuntimeError:  # Event loop closed.
+                    pass
+
+        threading.Thread(target=run, name="ShutdownFlush", daemon=True).start()
+        return future
+
+    async def _do_shutdown_phase(self, phase) -> None:
+        for func in self._shutdown_hooks[phase]:
+            try:
+                if inspect.iscoroutinefunction(func):
+                    await func()
+                else:
+                    func()
+            except Exception:
+                logger.exception("shutdown hook error, phase:", phase, "hook:", func, caller=self)
+
+        if phase == "market":
+            if self.event_center:
+                self.event_center.stop_consuming()
+        elif phase == "orders":
+            if config.shutdown.get("cancel_orders"):
+                from aioquant.trade import TRADES
+                results = await asyncio.gather(*[t.revoke_order() for t in TRADES], return_exceptions=True)
+                for trade, result in zip(TRADES, results):
+                    if isinstance(result, Exception) or result[1]:
+                        logger.error("cancel open orders failed! platform:", trade.platform, "account:",
+                                     trade.account, "symbol:", trade.symbol, "error:", result, caller=self)
+        elif phase == "publish":
+            from aioquant.tasks import supervisor
+            pending = await supervisor.join(group="publish")
+            if pending:
+                logger.warn("event publishes not done:", pending, caller=self)
+        elif phase == "connections":
+            from aioquant.utils.web import Websocket, AsyncHttpRequests
+            await Websocket.close_all()
+            if self.event_center:
+                await self.event_center.close()
+            await AsyncHttpRequests.close()
+        elif phase == "tasks":
+            from aioquant.heartbeat import heartbeat
+            from aioquant.tasks import supervisor
+            from aioquant.utils.monitor import monitor
+            from aioquant.utils.decorator import shutdown_executors
+            heartbeat.stop()
+            monitor.stop()
+            await supervisor.cancel_all(timeout=1)
+            shutdown_executors()
+        elif phase == "flush":
+            # Both block until records written, which may take seconds if the disk is slow.
+            timeout = config.shutdown.get("flush_timeout", 2)
+            await asyncio.gather(self._flush_in_thread(logger.flush, timeout),
+                                 self._flush_in_thread(journal.flush, timeout))
+
     def _get_event_loop(self) -> asyncio.events.get_event_loop():
-        """Get a main io loop."""
+        """Get a main io loop, the loop implementation is specified by `LOOP` in config file, `asyncio` or `uvloop`,
+        if `uvloop` is not installed, fall back to `asyncio`.
+        """
         if not self.loop:
+            if config.loop == "uvloop":
+                try:
+                    import uvloop
+                    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+                except ImportError:
+                    logger.warn("uvloop is not installed, fall back to asyncio loop.", caller=self)
+            elif config.loop != "asyncio":
+                logger.warn("loop error:", config.loop, "fall back to asyncio loop.", caller=self)
             self.loop = asyncio.get_event_loop()
+            logger.info("io loop:", type(self.loop).__module__, caller=self)
         return self.loop
 
+    def _init_signal(self) -> None:
+        """Shutdown gracefully on SIGINT(Ctrl+C) or SIGTERM. The handler is run by the event loop, if the loop
+        doesn't support signal handlers(e.g. on Windows), fall back to `signal.signal` and hand over to the loop
+        thread safely."""
+        def on_signal(s):
+            logger.info("signal has been caught, cleaning up... ID:", int(s), caller=self)
+            self.stop()
+
+        for s in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(s, on_signal, s)
+            except (NotImplementedError, RuntimeError):
+                signal.signal(s, lambda sig, frame: self.loop.call_soon_threadsafe(on_signal, sig))
+
     def _load_settings(self, config_module) -> None:
         """Load config settings.
 
         Args:
-            config_module: config file path, normally it's a json file.
+            config_module: config file path, normally it's a json file, or a dict of configures.
         """
         config.loads(config_module)
 
@@ -74,6 +247,20 @@ class AIOQuant:
         """Initialize logger."""
         logger.initLogger(**config.log)
 
+    def _init_journal(self) -> None:
+        """Initialize binary event journal."""
+        if not config.journal:
+            return
+        journal.initialize(**config.journal)
+
+    def _init_tasks(self) -> None:
+        """Initialize concurrency limits of task groups."""
+        from aioquant.tasks import supervisor
+        limits = dict(DEFAULT_GROUP_LIMITS)
+        limits.update(config.tasks.get("group_limits", {}))
+        for group, limit in limits.items():
+            supervisor.set_group_limit(group, limit)
+
     def _init_event_center(self) -> None:
         """Initialize event center."""
         if not config.rabbitmq:
@@ -81,6 +268,13 @@ class AIOQuant:
         from aioquant.event import EventCenter
         self.event_center = EventCenter()
 
+    def _init_monitor(self) -> None:
+        """Initialize event loop lag and slow callback monitor."""
+        if not config.monitor:
+            return
+        from aioquant.utils.monitor import monitor
+        monitor.initialize(**config.monitor)
+
     def _do_heartbeat(self) -> None:
         """Start server heartbeat."""
         from aioquant.heartbeat import heartbeat
@@ -0,0 +1,252 @@
+# -*- coding:utf-8 -*-
+
+"""
+Multi-process sharded runner.
+
+Fork N worker processes, each runs its own `AIOQuant` event loop with a shard of the symbols in `MARKETS` config,
+the symbols are partitioned by consistent hashing, so only a few symbols move to another worker if the number of
+workers changes. Workers could be pinned to CPUs, and the crashed workers will be restarted with backoff.
+
+Usage:
+    from aioquant import runner
+    runner.start(config_file, entrance_func)
+
+Config:
+    "RUNNER": {
+        "processes": 4,  # Number of worker processes, default is 1 to run in current process without forking.
+        "cpu_affinity": true,  # If pin worker `i` to the i-th available CPU, only on Linux, default is false.
+        "restart_delay": 1,  # Base delay(seconds) before restarting a crashed worker, doubled on every crash.
+        "max_restart_delay": 60  # Max delay(seconds) before restarting a crashed worker.
+    }
+"""
+
+import os
+import copy
+import json
+import time
+import shutil
+import signal
+import bisect
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+
+from aioquant.utils import logger
+
+__all__ = ("HashRing", "ShardedRunner", "start", "in_shard", )
+
+
+class HashRing:
+    """Consistent hash ring.
+
+    Attributes:
+        nodes: Node list.
+        replicas: Virtual nodes per node, more replicas make keys distributed more evenly.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self._nodes = list(nodes)
+        self._ring = []  # Virtual nodes. `[(hash, node), ...]`, sorted by hash.
+        for node in self._nodes:
+            for i in range(replicas):
+                self._ring.append((self._hash("{}#{}".format(node, i)), node))
+        self._ring.sort()
+        self._hashes = [h for h, _ in self._ring]
+
+    @property
+    def nodes(self):
+        return self._nodes
+
+    def get(self, key):
+        """Get the node which the key belongs to."""
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(str(key).encode()).hexdigest()[:16], 16)
+
+
+def shard_markets(markets, ring, node):
+    """Select symbols of `MARKETS` config belong to a node.
+
+    Args:
+        markets: `MARKETS` config. e.g. `{"binance": {"symbols": ["BTC/USDT", ...], ...}, ... }`
+        ring: HashRing object.
+        node: Node name.
+
+    Returns:
+        markets: `MARKETS` config with selected symbols, the platforms without any symbol selected are removed.
+    """
+    result = {}
+    for platform, cc in markets.items():
+        symbols = [s for s in cc.get("symbols", []) if ring.get("{}:{}".format(platform, s)) == node]
+        if symbols:
+            result[platform] = dict(cc, symbols=symbols)
+    return result
+
+
+# Shard of current worker process, set before `AIOQuant` started. e.g. `{"index": 0, "count": 4}`
+_shard = None
+_ring = None
+
+
+def in_shard(key):
+    """If a key(e.g. `binance:BTC/USDT`) belongs to current worker process, always True if not sharded."""
+    if not _shard:
+        return True
+    return _ring.get(key) == _shard["index"]
+
+
+class ShardedRunner:
+    """Multi-process sharded runner.
+
+    Attributes:
+        config_file: Config file path.
+        entrance_func: Entrance function of worker process, same as `quant.start`, it must be a module level
+            function to be passed to worker process.
+        processes: Number of worker processes, default is `RUNNER.processes` in config file.
+    """
+
+    def __init__(self, config_file, entrance_func=None, processes=None):
+        self._config_file = config_file
+        self._entrance_func = entrance_func
+        self._settings = {}
+        if config_file:
+            with open(config_file) as f:
+                self._settings = json.loads(f.read())
+        cc = self._settings.get("RUNNER", {})
+        self._processes = processes or cc.get("processes", 1)
+        self._cpu_affinity = cc.get("cpu_affinity", False)
+        self._restart_delay = cc.get("restart_delay", 1)
+        self._max_restart_delay = cc.get("max_restart_delay", 60)
+        self._stop_timeout = self._settings.get("SHUTDOWN", {}).get("timeout", 10) + 5
+        self._ring = HashRing(range(self._processes))
+        self._cpus = None
+        if self._cpu_affinity:
+            if hasattr(os, "sched_getaffinity"):
+                self._cpus = sorted(os.sched_getaffinity(0))
+            else:
+                logger.warn("cpu affinity is not supported on this platform.", caller=self)
+        if "fork" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("fork")
+        else:
+            self._ctx = multiprocessing.get_context()
+        self._workers = {}  # Running workers. `{index: {"process": Process, "ctime": ...}}`
+        self._restarts = {}  # Pending restarts. `{index: restart timestamp}`
+        self._crashes = {}  # Continuous crash count. `{index: count}`
+        self._stopping = False
+
+    def start(self):
+        """Start worker processes and supervise them until all of them exited."""
+        if self._processes <= 1:
+            from aioquant import quant
+            quant.start(self._config_file, self._entrance_func)
+            return
+
+        log = copy.copy(self._settings.get("LOG", {}))
+        if log.get("clear") and not log.get("console", True) and log.get("path") and os.path.isdir(log["path"]):
+            shutil.rmtree(log["path"])
+        # Supervisor writes its own log file, without background thread which is not inherited by forked workers.
+        name, ext = os.path.splitext(log.get("name", "quant.log"))
+        log.update(name="{}.supervisor{}".format(name, ext), clear=False, async_write=False)
+        logger.initLogger(**log)
+
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        for index in range(self._processes):
+            self._spawn(index)
+
+        stop_deadline = None
+        while self._workers or (self._restarts and not self._stopping):
+            sentinels = [w["process"].sentinel for w in self._workers.values()]
+            multiprocessing.connection.wait(sentinels, timeout=1)
+            for index, worker in list(self._workers.items()):
+                process = worker["process"]
+                if process.is_alive():
+                    continue
+                self._workers.pop(index)
+                if self._stopping or process.exitcode == 0:
+                    logger.info("worker exited. index:", index, "exitcode:", process.exitcode, caller=self)
+                    continue
+                # Reset backoff if the worker has been running for a long time.
+                if time.time() - worker["ctime"] > self._max_restart_delay * 2:
+                    self._crashes[index] = 0
+                self._crashes[index] = self._crashes.get(index, 0) + 1
+                delay = min(self._max_restart_delay, self._restart_delay * 2 ** (self._crashes[index] - 1))
+                self._restarts[index] = time.time() + delay
+                logger.error("worker crashed! index:", index, "exitcode:", process.exitcode,
+                             "restart after:", "%.1fs" % delay, caller=self)
+            if not self._stopping:
+                for index, ts in list(self._restarts.items()):
+                    if time.time() >= ts:
+                        self._restarts.pop(index)
+                        self._spawn(index)
+            else:
+                if stop_deadline is None:
+                    stop_deadline = time.time() + self._stop_timeout
+                elif time.time() > stop_deadline:
+                    for worker in self._workers.values():
+                        logger.warn("worker not exited in time, kill it! pid:", worker["process"].pid, caller=self)
+                        os.kill(worker["process"].pid, signal.SIGKILL)
+                    stop_deadline = float("inf")
+
+    def _spawn(self, index):
+        settings = copy.deepcopy(self._settings)
+        settings["SHARD"] = {"index": index, "count": self._processes}
+        log = settings.get("LOG")
+        if log:
+            name, ext = os.path.splitext(log.get("name", "quant.log"))
+            log["name"] = "{}.{}{}".format(name, index, ext)
+            log["clear"] = False
+        cpu = self._cpus[index % len(self._cpus)] if self._cpus else None
+        process = self._ctx.Process(target=_run_worker, args=(settings, self._entrance_func, cpu),
+                                    name="aioquant-worker-{}".format(index))
+        process.start()
+        self._workers[index] = {"process": process, "ctime": time.time()}
+        markets = shard_markets(settings.get("MARKETS", {}), self._ring, index)
+        logger.info("worker started. index:", index, "pid:", process.pid, "cpu:", cpu, "markets:",
+                    {p: cc["symbols"] for p, cc in markets.items()}, caller=self)
+
+    def _on_signal(self, s, f):
+        """Stop all workers. SIGINT from terminal has been received by workers in the same process group, only
+        SIGTERM needs to be forwarded."""
+        if self._stopping:
+            return
+        logger.info("signal has been caught, stopping workers... ID:", int(s), caller=self)
+        self._stopping = True
+        if s == signal.SIGTERM:
+            for worker in self._workers.values():
+                worker["process"].terminate()
+
+
+def _run_worker(settings, entrance_func, cpu):
+    """Entrance of worker process, all arguments are picklable, so it works with `spawn` start method too.
+
+    Args:
+        settings: Config settings of this worker, with `SHARD`, the symbols in `MARKETS` not belong to this worker
+            are removed by `in_shard`.
+        entrance_func: Entrance function, a module level function.
+        cpu: CPU to pin this worker to, None not to pin.
+    """
+    global _shard, _ring
+    _shard = settings["SHARD"]
+    _ring = HashRing(range(_shard["count"]))
+    markets = {}
+    for platform, cc in settings.get("MARKETS", {}).items():
+        symbols = [s for s in cc.get("symbols", []) if in_shard("{}:{}".format(platform, s))]
+        if symbols:
+            markets[platform] = dict(cc, symbols=symbols)
+    settings["MARKETS"] = markets
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+    # Handlers inherited from supervisor are dropped, worker writes its own log file.
+    logger.reset()
+    from aioquant import quant
+    quant.start(settings, entrance_func)
+
+
+def start(config_file=None, entrance_func=None, processes=None):
+    """Start sharded worker processes, see `ShardedRunner`."""
+    ShardedRunner(config_file, entrance_func, processes).start()
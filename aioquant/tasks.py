@@ -9,6 +9,11 @@ Tasks module.
 2. Register a single task to run:
     a) Create a coroutine and execute immediately.
     b) Create a coroutine and delay execute, delay time is seconds, default delay time is 0s.
+3. All the tasks are supervised by `supervisor`:
+    a) keep strong references of running tasks, so they will not be garbage collected mid-flight;
+    b) record runtime and failures per callsite, and log exceptions;
+    c) limit concurrency per task group;
+    d) live view of running tasks, and cancel them on shutdown.
 
 Author: HuangTao
 Date:   2018/04/26
@@ -18,9 +23,157 @@ Email:  huangtao@ifclover.com
 import asyncio
 import inspect
 
+from aioquant.utils import logger
 from aioquant.heartbeat import heartbeat
+from aioquant.utils.stats import RollingWindow
 
-__all__ = ("LoopRunTask", "SingleTask", )
+__all__ = ("LoopRunTask", "SingleTask", "TaskSupervisor", "supervisor", )
+
+
+class TaskSupervisor:
+    """Task supervisor, all asynchronous tasks should be created by it.
+    """
+
+    def __init__(self):
+        self._tasks = {}  # Running tasks. `{asyncio.Task: {"name": ..., "group": ..., "ctime": ..., "stime": ...}}`
+        self._stats = {}  # Stats per callsite. `{name: {"runs": 0, "failures": 0, "cancels": 0, "runtime": ...}}`
+        self._limits = {}  # Concurrency limit per group. `{group: limit}`
+        self._semaphores = {}  # Semaphore per group. `{group: asyncio.Semaphore}`
+
+    def set_group_limit(self, group, limit):
+        """Set max concurrent running tasks of a group, the others will wait until some running tasks done.
+
+        Args:
+            group: Group name.
+            limit: Max concurrent running tasks.
+        """
+        self._limits[group] = limit
+        self._semaphores.pop(group, None)
+
+    def spawn(self, func, args=(), kwargs=None, name=None, group=None):
+        """Create a task and execute immediately.
+
+        Args:
+            func: Asynchronous callback function.
+            args: Positional arguments of `func`.
+            kwargs: Keyword arguments of `func`.
+            name: Task name(callsite), default is `func.__qualname__`.
+            group: Group name, tasks in the same group are limited by `set_group_limit`.
+
+        Returns:
+            task: asyncio.Task object.
+        """
+        if not name:
+            name = getattr(func, "__qualname__", None) or str(func)
+        info = {"name": name, "group": group, "ctime": asyncio.get_event_loop().time(), "stime": None}
+        task = asyncio.get_event_loop().create_task(self._run(info, func, args, kwargs or {}))
+        if hasattr(task, "set_name"):
+            task.set_name(name)
+        self._tasks[task] = info
+        task.add_done_callback(self._tasks.pop)
+        return task
+
+    def running(self):
+        """Live view of running tasks, the oldest first.
+
+        Returns:
+            tasks: e.g. `[{"name": "BinanceTrade.connected_callback", "group": None, "age_ms": 10.1,
+                "waiting": False}, ...]`, `waiting` means waiting for the group concurrency limit.
+        """
+        now = asyncio.get_event_loop().time()
+        tasks = []
+        for info in sorted(self._tasks.values(), key=lambda i: i["ctime"]):
+            tasks.append({
+                "name": info["name"],
+                "group": info["group"],
+                "age_ms": round((now - info["ctime"]) * 1000, 3),
+                "waiting": info["stime"] is None
+            })
+        return tasks
+
+    def stats(self):
+        """Stats per callsite.
+
+        Returns:
+            stats: e.g. `{"BinanceTrade.connected_callback": {"running": 0, "runs": 1, "failures": 0, "cancels": 0,
+                "runtime": {"count": 1, "avg": 100.1, ...}}, ... }`, `runtime` is in milliseconds.
+        """
+        running = {}
+        for info in self._tasks.values():
+            running[info["name"]] = running.get(info["name"], 0) + 1
+        result = {}
+        for name, s in self._stats.items():
+            result[name] = {
+                "running": running.get(name, 0),
+                "runs": s["runs"],
+                "failures": s["failures"],
+                "cancels": s["cancels"],
+                "runtime": s["runtime"].summary(scale=1000)
+            }
+        return result
+
+    async def join(self, group=None, timeout=None):
+        """Wait for running tasks done.
+
+        Args:
+            group: Only wait for tasks of this group, default is None to wait for all tasks, except the current task.
+            timeout: Max waiting time(seconds), default is None to wait forever.
+
+        Returns:
+            pending: How many tasks not done yet.
+        """
+        current = asyncio.Task.current_task() if hasattr(asyncio.Task, "current_task") else asyncio.current_task()
+        tasks = [task for task, info in self._tasks.items()
+                 if task is not current and (group is None or info["group"] == group)]
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return len(pending)
+
+    async def cancel_all(self, timeout=5):
+        """Cancel all running tasks, except the current task, and wait for them done.
+
+        Args:
+            timeout: Max waiting time(seconds).
+        """
+        current = asyncio.Task.current_task() if hasattr(asyncio.Task, "current_task") else asyncio.current_task()
+        tasks = [task for task in self._tasks if task is not current]
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks, timeout=timeout)
+
+    async def _run(self, info, func, args, kwargs):
+        s = self._stats.get(info["name"])
+        if not s:
+            s = {"runs": 0, "failures": 0, "cancels": 0, "runtime": RollingWindow(100)}
+            self._stats[info["name"]] = s
+        semaphore = None
+        if info["group"] in self._limits:
+            semaphore = self._semaphores.get(info["group"])
+            if not semaphore:
+                semaphore = asyncio.Semaphore(self._limits[info["group"]])
+                self._semaphores[info["group"]] = semaphore
+            await semaphore.acquire()
+        loop = asyncio.get_event_loop()
+        info["stime"] = loop.time()
+        s["runs"] += 1
+        try:
+            return await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            s["cancels"] += 1
+            raise
+        except Exception:
+            s["failures"] += 1
+            logger.exception("task error, name:", info["name"], caller=self)
+        finally:
+            s["runtime"].add(loop.time() - info["stime"])
+            if semaphore:
+                semaphore.release()
+
+
+supervisor = TaskSupervisor()
 
 
 class LoopRunTask(object):
@@ -33,10 +186,13 @@ class LoopRunTask(object):
 
         Args:
             func: Asynchronous callback function.
-            interval: execute interval time(seconds), default is 1s.
+            interval: execute interval time(seconds), default is 1s, float is supported, e.g. 0.05.
 
         Returns:
             task_id: Task id.
+
+        NOTE:
+            If the last run is not finished when the next run time comes, the next run will be skipped.
         """
         task_id = heartbeat.register(func, interval, *args, **kwargs)
         return task_id
@@ -50,6 +206,11 @@ class LoopRunTask(object):
         """
         heartbeat.unregister(task_id)
 
+    @classmethod
+    def stats(cls):
+        """Stats of all loop run tasks, e.g. run count, overrun count, runtime. See `HeartBeat.stats`."""
+        return heartbeat.stats()
+
 
 class SingleTask:
     """Single run task.
@@ -61,8 +222,24 @@ class SingleTask:
 
         Args:
             func: Asynchronous callback function.
+
+        Returns:
+            task: asyncio.Task object.
+        """
+        return supervisor.spawn(func, args, kwargs)
+
+    @classmethod
+    def run_in_group(cls, group, func, *args, **kwargs):
+        """Create a coroutine and execute it when the group's concurrency limit allows.
+
+        Args:
+            group: Group name, see `TaskSupervisor.set_group_limit`.
+            func: Asynchronous callback function.
+
+        Returns:
+            task: asyncio.Task object.
         """
-        asyncio.get_event_loop().create_task(func(*args, **kwargs))
+        return supervisor.spawn(func, args, kwargs, group=group)
 
     @classmethod
     def call_later(cls, func, delay=0, *args, **kwargs):
@@ -76,5 +253,5 @@ class SingleTask:
             asyncio.get_event_loop().call_later(delay, func, *args)
         else:
             def foo(f, *args, **kwargs):
-                asyncio.get_event_loop().create_task(f(*args, **kwargs))
+                supervisor.spawn(f, args, kwargs)
             asyncio.get_event_loop().call_later(delay, foo, func, *args)
@@ -9,14 +9,136 @@ Email:  huangtao@ifclover.com
 """
 
 import copy
+import time
+from collections import OrderedDict
 
 from aioquant import const
 from aioquant.utils import tools
 from aioquant.error import Error
 from aioquant.utils import logger
-from aioquant.tasks import SingleTask
+from aioquant.tasks import SingleTask, LoopRunTask
+from aioquant.utils.journal import journal
+from aioquant.utils.stats import RollingWindow
 from aioquant.order import Order
+from aioquant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED, \
+    ORDER_STATUS_CANCELED, ORDER_STATUS_TERMINAL
 from aioquant.position import Position
+from aioquant.asset import Asset
+
+
+# Order lifecycle latency trackers. e.g. {"binance:test@gmail.com": OrderLatency, ... }
+ORDER_LATENCIES = {}
+
+# All Trade objects created, to cancel open orders while shutting down.
+TRADES = []
+
+
+class OrderLatency:
+    """Order lifecycle latency tracker for an exchange account, keep rolling latency samples per operation:
+        create_rest: From calling `create_order` to REST API response returned.
+        create_batch_rest: From calling `create_orders` to all REST API responses returned, one sample per call.
+        create_new: From calling `create_order` to the order acknowledged(first order update with order id).
+        create_fill: From calling `create_order` to the first fill.
+        cancel_rest: From calling `revoke_order` to REST API response returned.
+        cancel_done: From calling `revoke_order` to the order canceled.
+
+    Attributes:
+        name: Tracker name, e.g. `binance:test@gmail.com`.
+        window: Max samples in rolling window per operation.
+        capacity: Max orders to be tracked, the oldest one will be dropped if exceeded.
+    """
+
+    OPERATIONS = ("create_rest", "create_batch_rest", "create_new", "create_fill", "cancel_rest", "cancel_done")
+
+    def __init__(self, name, window=1000, capacity=10000):
+        """Initialize."""
+        self._name = name
+        self._capacity = capacity
+        self._windows = {operation: RollingWindow(window) for operation in self.OPERATIONS}
+        self._creating = OrderedDict()  # Orders waiting for acknowledged. e.g. {client_order_id: start_ts, ... }
+        self._filling = OrderedDict()  # Orders waiting for the first fill. e.g. {client_order_id: start_ts, ... }
+        self._canceling = OrderedDict()  # Orders waiting for canceled. e.g. {order_id: start_ts, ... }
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def stats(self):
+        """Latency summary(milliseconds) per operation."""
+        return {operation: window.summary(scale=1000) for operation, window in self._windows.items()}
+
+    def add(self, operation, start_ts):
+        """Add a latency sample, `start_ts` is from `time.monotonic()`."""
+        self._windows[operation].add(time.monotonic() - start_ts)
+
+    def on_create(self, client_order_id, start_ts):
+        self._track(self._creating, client_order_id, start_ts)
+        self._track(self._filling, client_order_id, start_ts)
+
+    def on_cancel(self, order_id, start_ts):
+        self._track(self._canceling, order_id, start_ts)
+
+    def discard_create(self, client_order_id):
+        """Stop tracking an order failed to create."""
+        self._creating.pop(client_order_id, None)
+        self._filling.pop(client_order_id, None)
+
+    def discard_cancel(self, order_id):
+        """Stop tracking an order failed to cancel."""
+        self._canceling.pop(order_id, None)
+
+    def on_order_update(self, order):
+        """Order updated, record the lifecycle transitions."""
+        if self._creating and order.order_id is not None and order.status in (ORDER_STATUS_SUBMITTED,
+                                                                              ORDER_STATUS_PARTIAL_FILLED,
+                                                                              ORDER_STATUS_FILLED):
+            start_ts = self._creating.pop(order.client_order_id, None)
+            if start_ts is not None:
+                self.add("create_new", start_ts)
+        if self._filling and order.status in (ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED):
+            start_ts = self._filling.pop(order.client_order_id, None)
+            if start_ts is not None:
+                self.add("create_fill", start_ts)
+        if self._canceling and order.status == ORDER_STATUS_CANCELED:
+            start_ts = self._canceling.pop(order.order_id, None)
+            if start_ts is not None:
+                self.add("cancel_done", start_ts)
+        if order.status in ORDER_STATUS_TERMINAL:
+            self._creating.pop(order.client_order_id, None)
+            self._filling.pop(order.client_order_id, None)
+            self._canceling.pop(order.order_id, None)
+
+    def _track(self, orders, key, start_ts):
+        orders[key] = start_ts
+        if len(orders) > self._capacity:
+            orders.popitem(last=False)
+
+
+def get_order_latency(platform, account):
+    """Get order lifecycle latency tracker for an exchange account, if not exist, create a new.
+
+    Args:
+        platform: Exchange platform name, e.g. `binance`.
+        account: Trading account name, e.g. `test@gmail.com`.
+
+    Returns:
+        latency: OrderLatency object.
+    """
+    key = "{}:{}".format(platform, account)
+    latency = ORDER_LATENCIES.get(key)
+    if not latency:
+        latency = OrderLatency(key)
+        if not ORDER_LATENCIES:
+            LoopRunTask.register(_print_order_latency_stats, 60)
+        ORDER_LATENCIES[key] = latency
+    return latency
+
+
+async def _print_order_latency_stats(*args, **kwargs):
+    """Print order lifecycle latency stats(milliseconds) of all exchange accounts."""
+    for key, latency in ORDER_LATENCIES.items():
+        logger.info("order latency stats(ms):", key, latency.stats)
 
 
 class Trade:
@@ -44,11 +166,24 @@ class Trade:
         error_callback: You can use this param to specify a async callback function when you initializing Trade
             module. `error_callback` is like `async def on_error_callback(error: Error, **kwargs): pass`
             and this callback function will be executed asynchronous when some error occur while trade module is running.
+        asset_update_callback: You can use this param to specify a async callback function when you initializing
+            Trade module. `asset_update_callback` is like `async def on_asset_update_callback(asset: Asset): pass`
+            and this callback function will be executed asynchronous when the account's asset updated.
+        order_retention: How many terminal orders(filled, canceled or failed) to be retained in order store, default
+            is 100, set 0 to remove terminal orders immediately.
+        create_retry_deadline: If creating an order gets an ambiguous result(e.g. request timeout, HTTP 5xx), the order
+            will be queried by client order id(and resent with the same client order id after confirmed not exist, if
+            the exchange rejects a duplicate client order id), until it's resolved or this deadline(seconds) after the
+            ambiguous result exceeded, default is 10, set 0 to disable.
+
+    NOTE:
+        Order objects passed to `order_update_callback` or returned by `orders` / `order_store`, and Asset objects
+        passed to `asset_update_callback` or returned by `asset` / `assets` are shared snapshots, DO NOT modify them.
     """
 
     def __init__(self, strategy=None, platform=None, symbol=None, host=None, wss=None, account=None, access_key=None,
                  secret_key=None, passphrase=None, order_update_callback=None, position_update_callback=None,
-                 init_callback=None, error_callback=None, **kwargs):
+                 init_callback=None, error_callback=None, asset_update_callback=None, **kwargs):
         """Initialize trade object."""
         kwargs["strategy"] = strategy
         kwargs["platform"] = platform
@@ -63,12 +198,15 @@ class Trade:
         kwargs["position_update_callback"] = self._on_position_update_callback
         kwargs["init_callback"] = self._on_init_callback
         kwargs["error_callback"] = self._on_error_callback
+        kwargs["asset_update_callback"] = self._on_asset_update_callback
 
         self._raw_params = copy.copy(kwargs)
         self._order_update_callback = order_update_callback
         self._position_update_callback = position_update_callback
+        self._asset_update_callback = asset_update_callback
         self._init_callback = init_callback
         self._error_callback = error_callback
+        self._latency = get_order_latency(platform, account)
 
         if platform == const.BINANCE:
             from aioquant.platform.binance import BinanceTrade as T
@@ -81,15 +219,45 @@ class Trade:
             SingleTask.run(self._init_callback, False)
             return
         self._t = T(**kwargs)
+        TRADES.append(self)
+
+    @property
+    def platform(self):
+        return self._raw_params["platform"]
+
+    @property
+    def account(self):
+        return self._raw_params["account"]
+
+    @property
+    def symbol(self):
+        return self._raw_params["symbol"]
 
     @property
     def orders(self):
         return self._t.orders
 
+    @property
+    def order_store(self):
+        return self._t.order_store
+
     @property
     def position(self):
         return self._t.position  # only for contract trading.
 
+    @property
+    def asset(self):
+        return self._t.asset
+
+    @property
+    def latency_stats(self):
+        """Order lifecycle latency summary(milliseconds) of this exchange account, see `OrderLatency`."""
+        return self._latency.stats
+
+    @property
+    def assets(self):
+        return self._t.assets
+
     @property
     def rest_api(self):
         return self._t.rest_api
@@ -104,18 +272,64 @@ class Trade:
             kwargs：
                 order_type: Specific type of order, `LIMIT` or `MARKET`. (default is `LIMIT`)
                 client_order_id: Client order id, default `None` will be replaced by a random uuid string.
+                wait_ack: If wait for the order acknowledged by exchange, default is `True`. If `False`, a pending
+                    order(`order_id` is None, `status` is `NONE`) will be saved into `order_store` and sent in
+                    background, the order id and status will be updated by whichever of REST API response and
+                    Websocket order update arrives first, and `order_update_callback` will be called as usual.
 
         Returns:
-            order_id: Order id if created successfully, otherwise it's None.
+            order_id: Order id if created successfully, otherwise it's None. If `wait_ack` is `False`, it's the
+                client order id.
             error: Error information, otherwise it's None.
         """
         price = tools.float_to_str(price)
         quantity = tools.float_to_str(quantity)
         if not kwargs.get("client_order_id"):
             kwargs["client_order_id"] = tools.get_uuid1().replace("-", "")
+        start_ts = time.monotonic()
+        self._latency.on_create(kwargs["client_order_id"], start_ts)
         order_id, error = await self._t.create_order(action, price, quantity, *args, **kwargs)
+        if kwargs.get("wait_ack", True):
+            self._latency.add("create_rest", start_ts)
+        if error:
+            self._latency.discard_create(kwargs["client_order_id"])
         return order_id, error
 
+    async def create_orders(self, orders, *args, **kwargs) -> list:
+        """Create multiple orders concurrently, using batch orders API if the exchange supports.
+
+        Args:
+            orders: Order list, e.g. `[{"action": "BUY", "price": 1.1, "quantity": 2}, ...]`, every order is a dict:
+                action: Trade direction, `BUY` or `SELL`.
+                price: Price of each order/contract.
+                quantity: The buying or selling quantity.
+                order_type: Specific type of order, `LIMIT` or `MARKET`. (default is `LIMIT`)
+                client_order_id: Client order id, default `None` will be replaced by a random uuid string.
+
+        Returns:
+            results: Result list in the same order of `orders`, e.g. `[(order_id, error), ...]`, `order_id` is
+                None if the order created failed, and `error` is the error information.
+        """
+        items = []
+        for o in orders:
+            item = copy.copy(o)
+            item["price"] = tools.float_to_str(o["price"])
+            item["quantity"] = tools.float_to_str(o["quantity"])
+            if not item.get("client_order_id"):
+                item["client_order_id"] = tools.get_uuid1().replace("-", "")
+            items.append(item)
+        if not items:
+            return []
+        start_ts = time.monotonic()
+        for item in items:
+            self._latency.on_create(item["client_order_id"], start_ts)
+        results = await self._t.create_orders(items, *args, **kwargs)
+        self._latency.add("create_batch_rest", start_ts)
+        for item, (_, error) in zip(items, results):
+            if error:
+                self._latency.discard_create(item["client_order_id"])
+        return results
+
     async def revoke_order(self, *order_ids):
         """Revoke (an) order(s).
 
@@ -125,10 +339,25 @@ class Trade:
                 If you set multiple param, you can cancel multiple orders. Do not set param length more than 100.
 
         Returns:
-            success: If execute successfully, return success information, otherwise it's None.
-            error: If execute failed, return error information, otherwise it's None.
+            success: If execute successfully, return success information, otherwise it's None. If cancel all orders or
+                multiple orders, it's the order id list revoked successfully.
+            error: If execute failed, return error information, otherwise it's None. If cancel all orders or
+                multiple orders, it's the error list of orders failed to revoke, e.g. `[(order_id, error), ...]`.
         """
+        start_ts = time.monotonic()
+        tracking = order_ids or list(self._t.orders.keys())
+        for order_id in tracking:
+            self._latency.on_cancel(order_id, start_ts)
         success, error = await self._t.revoke_order(*order_ids)
+        self._latency.add("cancel_rest", start_ts)
+        if error:
+            # Multiple orders: `success` is the list revoked successfully, and `error` is the list failed.
+            revoked = set(success) if isinstance(success, list) else set()
+            failed = [order_id for order_id in tracking if order_id not in revoked]
+            if isinstance(error, list):
+                failed += [order_id for order_id, _ in error]
+            for order_id in failed:
+                self._latency.discard_cancel(order_id)
         return success, error
 
     async def get_open_order_ids(self) -> (list, Error):
@@ -150,6 +379,8 @@ class Trade:
         Args:
             order: Order object.
         """
+        journal.order(order)
+        self._latency.on_order_update(order)
         if not self._order_update_callback:
             return
         await self._order_update_callback(order)
@@ -164,6 +395,16 @@ class Trade:
             return
         await self._position_update_callback(position)
 
+    async def _on_asset_update_callback(self, asset: Asset) -> None:
+        """Asset information update callback.
+
+        Args:
+            asset: Asset object.
+        """
+        if not self._asset_update_callback:
+            return
+        await self._asset_update_callback(asset)
+
     async def _on_init_callback(self, success: bool) -> None:
         """Callback function when initialize Trade module finished.
 
@@ -186,6 +427,7 @@ class Trade:
         Args:
             error: Error information.
         """
+        journal.error(self._raw_params["platform"], self._raw_params["symbol"], error)
         if not self._error_callback:
             return
         params = {
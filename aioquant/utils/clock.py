@@ -0,0 +1,119 @@
+# -*- coding:utf-8 -*-
+
+"""
+Exchange server clock synchronization.
+
+Measure the offset between local clock and exchange server clock periodically, the offset is estimated by the sample
+with minimum round trip time in a sliding window, since the sample with less network delay is more accurate.
+"""
+
+import time
+import statistics
+from collections import deque
+
+from aioquant.utils import logger
+from aioquant.tasks import LoopRunTask, SingleTask
+
+__all__ = ("ServerClock", "get_server_clock", )
+
+
+# Server clocks. e.g. {"binance:https://api.binance.com": ServerClock, ... }
+SERVER_CLOCKS = {}
+
+
+class ServerClock:
+    """Exchange server clock.
+
+    Attributes:
+        name: Clock name.
+        fetch_func: Asynchronous function to fetch server time, returns server timestamp(seconds, float) or None if
+            failed.
+        interval: Synchronization interval(seconds), default is 30.
+        window: How many samples to be saved in sliding window, default is 10.
+    """
+
+    def __init__(self, name, fetch_func, interval=30, window=10):
+        """Initialize."""
+        self._name = name
+        self._fetch_func = fetch_func
+        self._samples = deque(maxlen=window)  # Samples. e.g. `[(rtt, offset), ...]`
+        self._offset = 0  # Estimated offset(seconds), server time = local time + offset.
+        self._rtt = None  # Round trip time(seconds) of the sample used to estimate offset.
+        self._synced = False
+        self._task_id = LoopRunTask.register(self.sync, interval)
+        SingleTask.run(self.sync)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def synced(self):
+        return self._synced
+
+    @property
+    def offset(self):
+        """Estimated offset(seconds), server time = local time + offset."""
+        return self._offset
+
+    @property
+    def rtt(self):
+        return self._rtt
+
+    @property
+    def jitter(self):
+        """Standard deviation of offsets(seconds) in sliding window."""
+        if len(self._samples) < 2:
+            return 0
+        return statistics.pstdev([offset for _, offset in self._samples])
+
+    @property
+    def stats(self):
+        return {
+            "offset_ms": round(self._offset * 1000, 3),
+            "rtt_ms": round(self._rtt * 1000, 3) if self._rtt is not None else None,
+            "jitter_ms": round(self.jitter * 1000, 3),
+            "samples": len(self._samples)
+        }
+
+    def time(self) -> float:
+        """Current server timestamp(seconds), estimated by local clock and offset."""
+        return time.time() + self._offset
+
+    async def sync(self, *args, **kwargs):
+        """Fetch server time and update the offset estimate."""
+        t0 = time.time()
+        server_ts = await self._fetch_func()
+        t1 = time.time()
+        if server_ts is None:
+            logger.warn("fetch server time failed, clock:", self._name, caller=self)
+            return
+        # Assume the server time is sampled at the middle of the round trip.
+        self._samples.append((t1 - t0, server_ts - (t0 + t1) / 2))
+        self._rtt, self._offset = min(self._samples)
+        self._synced = True
+        logger.debug("clock:", self._name, "stats:", self.stats, caller=self)
+
+    def close(self):
+        """Stop synchronizing."""
+        LoopRunTask.unregister(self._task_id)
+
+
+def get_server_clock(platform, host, fetch_func, interval=30):
+    """Get a server clock shared by all REST API clients for the same exchange host, if not exist, create a new.
+
+    Args:
+        platform: Exchange platform name, e.g. `binance`.
+        host: Exchange REST API host.
+        fetch_func: Asynchronous function to fetch server time, only used when creating a new clock.
+        interval: Synchronization interval(seconds), only used when creating a new clock.
+
+    Returns:
+        clock: Server clock.
+    """
+    key = "{}:{}".format(platform, host)
+    clock = SERVER_CLOCKS.get(key)
+    if not clock:
+        clock = ServerClock(key, fetch_func, interval)
+        SERVER_CLOCKS[key] = clock
+    return clock
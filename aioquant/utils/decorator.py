@@ -8,13 +8,23 @@ Date:   2018/08/03
 Email:  Huangtao@ifclover.com
 """
 
+import time
 import asyncio
+import inspect
 import functools
+import collections
+import concurrent.futures
 
 
 # Coroutine lockers. e.g. {"locker_name": locker}
 METHOD_LOCKERS = {}
 
+# In-flight requests and cached responses. e.g. {key: (expire time, task), ... }
+SINGLE_FLIGHTS = {}
+
+# Executors for offloaded functions. e.g. {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+EXECUTORS = {}
+
 
 def async_method_locker(name, wait=True):
     """ In order to share memory between any asynchronous coroutine methods, we should use locker to lock our method,
@@ -48,3 +58,145 @@ def async_method_locker(name, wait=True):
                 locker.release()
         return wrapper
     return decorating_function
+
+
+def async_single_flight(ttl=0):
+    """ Concurrent invokes of the same method with the same arguments share one in-flight coroutine, and the result
+        can be cached for a short time.
+
+    Args:
+        ttl: Cache time(seconds) of the result, default is `0` not to cache.
+
+    NOTE:
+        This decorator must to be used on `async method` which returns `(success, error)`, only success results will
+        be cached. Invokes are identified by the instance attribute `single_flight_id` (default is `id(self)`),
+        method name and arguments(normalized by method signature, so `f(1)`, `f(a=1)` and `f(1, b=default)` are the
+        same), so instances with the same `single_flight_id` share in-flight coroutines too.
+        All the callers will get the same result object, DO NOT modify it.
+        Pass `single_flight=False` to start a new request instead of sharing the in-flight or cached one, e.g. reading
+        after writing, the new request will be shared by the following invokes.
+    """
+
+    def decorating_function(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(self, *args, single_flight=True, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            flight_id = getattr(self, "single_flight_id", None) or id(self)
+            key = (method.__qualname__, flight_id, bound.args[1:], tuple(sorted(bound.kwargs.items())))
+            item = SINGLE_FLIGHTS.get(key)
+            if item and single_flight:
+                expire_ts, task = item
+                if not task.done() or expire_ts > time.monotonic():
+                    return await asyncio.shield(task)
+            task = asyncio.get_event_loop().create_task(method(self, *args, **kwargs))
+            SINGLE_FLIGHTS[key] = (float("inf"), task)
+
+            def done_callback(t):
+                if SINGLE_FLIGHTS.get(key, (None, None))[1] is not t:
+                    return
+                if ttl > 0 and not t.cancelled() and not t.exception() and not t.result()[1]:
+                    SINGLE_FLIGHTS[key] = (time.monotonic() + ttl, t)
+                else:
+                    SINGLE_FLIGHTS.pop(key)
+            task.add_done_callback(done_callback)
+            return await asyncio.shield(task)
+        return wrapper
+    return decorating_function
+
+
+def get_executor(kind="thread"):
+    """ Get a shared executor, if not exist, create a new.
+
+    Args:
+        kind: Executor kind, `thread` for thread pool, `process` for process pool.
+
+    Returns:
+        executor: concurrent.futures.Executor object.
+    """
+    executor = EXECUTORS.get(kind)
+    if not executor:
+        if kind == "thread":
+            executor = concurrent.futures.ThreadPoolExecutor()
+        elif kind == "process":
+            executor = concurrent.futures.ProcessPoolExecutor()
+        else:
+            raise ValueError("executor kind error: {}".format(kind))
+        EXECUTORS[kind] = executor
+    return executor
+
+
+def shutdown_executors(wait=False):
+    """ Shutdown all the shared executors."""
+    executors = list(EXECUTORS.values())
+    EXECUTORS.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+def async_offload(executor="thread", concurrency=1, latest_only=False, key=None):
+    """ Run a CPU-heavy synchronous function in a thread pool or process pool, so that the event loop will not be
+        blocked, the decorated function becomes an `async` function which returns the result on the event loop, and
+        can be used as `Market` or `Trade` callbacks.
+
+    Args:
+        executor: `thread` or `process` to use the shared thread pool or process pool, or a
+            `concurrent.futures.Executor` object, default is `thread`.
+        concurrency: Max concurrent running invokes, the others will wait, default is 1.
+        latest_only: If True, only the latest waiting invoke will be kept, the older waiting invoke is dropped and
+            returns None immediately, so that stale data will not be queued, default is False.
+        key: A function with the same arguments as the decorated function, invokes with different keys have
+            separate concurrency limits and waiting slots, e.g. `lambda self, orderbook: orderbook.symbol`,
+            default is None to share them all.
+
+    NOTE:
+        For process pool, the function and arguments must be picklable, so decorate a function by call instead of
+        `@`, e.g. `on_orderbook = async_offload("process")(compute)`, and `compute` must be a module level function.
+        DO NOT use `latest_only` for order updates, which must not be dropped.
+    """
+
+    def decorating_function(func):
+        slots = {}  # e.g. `{key: {"running": 0, "waiters": deque([future, ...])}}`
+
+        def handoff(slot):
+            """Hand the running slot to the next waiter, or release it."""
+            while slot["waiters"]:
+                waiter = slot["waiters"].popleft()
+                if not waiter.done():
+                    waiter.set_result(True)
+                    return
+            slot["running"] -= 1
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else None
+            slot = slots.get(k)
+            if not slot:
+                slot = {"running": 0, "waiters": collections.deque()}
+                slots[k] = slot
+            if slot["running"] < concurrency:
+                slot["running"] += 1
+            else:
+                if latest_only:
+                    while slot["waiters"]:
+                        waiter = slot["waiters"].popleft()
+                        if not waiter.done():
+                            waiter.set_result(False)
+                waiter = asyncio.get_event_loop().create_future()
+                slot["waiters"].append(waiter)
+                try:
+                    if not await waiter:
+                        return None
+                except asyncio.CancelledError:
+                    if waiter.done() and not waiter.cancelled() and waiter.result():
+                        handoff(slot)
+                    raise
+            try:
+                ex = executor if isinstance(executor, concurrent.futures.Executor) else get_executor(executor)
+                return await asyncio.get_event_loop().run_in_executor(ex, functools.partial(func, *args, **kwargs))
+            finally:
+                handoff(slot)
+        return wrapper
+    return decorating_function
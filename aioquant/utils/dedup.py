@@ -0,0 +1,70 @@
+# -*- coding:utf-8 -*-
+
+"""
+First arrival deduplicator for redundant market data feeds.
+"""
+
+import time
+from collections import OrderedDict
+
+__all__ = ("FirstArrival", )
+
+
+class FirstArrival:
+    """Deduplicate messages that received from multiple connections subscribing the same streams, only the first
+    arrived copy of a message will be processed.
+
+    Attributes:
+        connections: How many redundant connections.
+        capacity: How many recent message keys to be remembered, default is 10000.
+
+    NOTE:
+        Message key must be unique in stream, e.g. exchange sequence id or trade id.
+    """
+
+    def __init__(self, connections, capacity=10000):
+        """Initialize."""
+        self._connections = connections
+        self._capacity = capacity
+        self._seen = OrderedDict()  # Recent message keys. e.g. `{key: first arrived time(second), ... }`
+        self._wins = [0] * connections  # How many messages arrived first, per connection.
+        self._duplicates = [0] * connections  # How many messages arrived late, per connection.
+        self._delays = [0.0] * connections  # Total delay time(second) of late arrived messages, per connection.
+
+    def first(self, key, conn_index=0) -> bool:
+        """Check if the message is arrived first.
+
+        Args:
+            key: Message key.
+            conn_index: Index of the connection which received this message.
+
+        Returns:
+            `True` if the message is arrived first and should be processed, otherwise `False`.
+        """
+        now = time.monotonic()
+        ts = self._seen.get(key)
+        if ts is not None:
+            self._duplicates[conn_index] += 1
+            self._delays[conn_index] += now - ts
+            return False
+        self._seen[key] = now
+        if len(self._seen) > self._capacity:
+            self._seen.popitem(last=False)
+        self._wins[conn_index] += 1
+        return True
+
+    @property
+    def stats(self):
+        """Per connection statistics, e.g. `[{"win": 100, "lose": 20, "win_rate": 0.83, "avg_delay_ms": 1.2}, ...]`"""
+        result = []
+        for i in range(self._connections):
+            win = self._wins[i]
+            lose = self._duplicates[i]
+            total = win + lose
+            result.append({
+                "win": win,
+                "lose": lose,
+                "win_rate": round(win / total, 4) if total else 0,
+                "avg_delay_ms": round(self._delays[i] / lose * 1000, 3) if lose else 0
+            })
+        return result
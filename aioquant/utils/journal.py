@@ -0,0 +1,482 @@
+# -*- coding:utf-8 -*-
+
+"""
+Binary event journal.
+
+Journal records order lifecycle, market events and errors as typed, length-prefixed binary records. Records are
+encoded on the caller thread and put into a bounded queue, a background thread appends them to a buffered file per
+day, so the event loop thread is never blocked by file I/O. A sparse time index file is written alongside, so that a
+reader can seek to a time range directly instead of scanning the whole file.
+
+File layout:
+    journal file `journal-YYYYMMDD.bin`:
+        MAGIC, record, record, ...
+        record: SYNC(4 bytes) + length(uint32, body bytes) + crc32(uint32, of body) + body
+        body: type(uint8) + timestamp(int64, millisecond) + symbol(string) + key(string, order id for order record) +
+              payload(by record type)
+        string: length(uint16) + utf8 bytes
+    index file `journal-YYYYMMDD.idx`:
+        entry, entry, ...
+        entry: timestamp(int64, millisecond) + offset(uint64) of the first record in a block, the timestamp is the
+               max timestamp of all records until this one, so that entries are ordered even if the wall clock steps
+               backwards, and all records before the offset are not later than the timestamp.
+
+    A torn record(e.g. the process crashed while writing) fails the length or crc32 check, the reader skips it by
+    searching for the next SYNC.
+
+    Only time range is indexed, filters by symbol, order id or record type are linear scans over the time range.
+
+Usage:
+    python -m aioquant.utils.journal_cli /var/log/aioquant/journal/journal-20190601.bin --symbol BTC/USDT \
+        --start "2019-06-01 10:00:00" --end "2019-06-01 11:00:00"
+"""
+
+import os
+import time
+import zlib
+import queue
+import bisect
+import struct
+import datetime
+import threading
+
+from aioquant.utils import logger
+
+__all__ = ("journal", "Journal", "JournalReader",
+           "RECORD_ORDER", "RECORD_ORDERBOOK", "RECORD_TRADE", "RECORD_KLINE", "RECORD_ERROR", )
+
+
+MAGIC = b"AIOQJNL2"
+SYNC = b"\xa5\x5aJR"  # Start of every record.
+
+# Record types.
+RECORD_ORDER = 1
+RECORD_ORDERBOOK = 2
+RECORD_TRADE = 3
+RECORD_KLINE = 4
+RECORD_ERROR = 5
+
+RECORD_NAMES = {
+    RECORD_ORDER: "order",
+    RECORD_ORDERBOOK: "orderbook",
+    RECORD_TRADE: "trade",
+    RECORD_KLINE: "kline",
+    RECORD_ERROR: "error"
+}
+
+_FRAME = struct.Struct("<4sII")  # SYNC, length, crc32
+_HEADER = struct.Struct("<Bq")
+_STR_LEN = struct.Struct("<H")
+_INDEX = struct.Struct("<qQ")
+_ORDER_NUMBERS = struct.Struct("<dddddqq")  # price, quantity, remain, avg_price, fee, ctime, utime
+_BOOK_SIZE = struct.Struct("<HH")  # asks length, bids length
+_TRADE_NUMBERS = struct.Struct("<ddq")  # price, quantity, timestamp
+_KLINE_NUMBERS = struct.Struct("<dddddq")  # open, high, low, close, volume, timestamp
+
+
+def _pack_str(s):
+    b = str(s if s is not None else "").encode("utf8")
+    if len(b) > 65535:
+        # Truncate at a character boundary.
+        b = b[:65535].decode("utf8", "ignore").encode("utf8")
+    return _STR_LEN.pack(len(b)) + b
+
+
+def _unpack_str(buf, offset):
+    n, = _STR_LEN.unpack_from(buf, offset)
+    offset += _STR_LEN.size
+    return buf[offset: offset + n].decode("utf8"), offset + n
+
+
+def _float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Journal:
+    """Binary event journal writer.
+
+    Attributes:
+        path: Journal file path.
+        market: If record market events(orderbook/trade/kline).
+        buffer_size: File write buffer size(bytes), default is 256KB.
+        index_interval: Write an index entry every `index_interval` bytes, default is 64KB.
+        flush_interval: Flush buffer to file interval(seconds), default is 1s.
+        queue_size: Max records in queue waiting to be written, records will be dropped if the queue is full.
+    """
+
+    _STOP = object()  # Sentinel to stop the writer thread.
+    _FLUSH = object()  # Sentinel to flush buffer to file.
+
+    def __init__(self):
+        """Initialize."""
+        self._enabled = False
+        self._market = False
+        self._path = None
+        self._buffer_size = 256 * 1024
+        self._index_interval = 64 * 1024
+        self._queue = None  # Records waiting to be written. e.g. `(timestamp, record bytes)`
+        self._thread = None  # Writer thread.
+        self._dropped = 0  # How many records dropped since last report, only updated by caller thread.
+        # The following attributes are only used by writer thread.
+        self._next_day_ts = 0  # Timestamp(millisecond) to open the next day's journal file.
+        self._file = None
+        self._index_file = None
+        self._offset = 0  # Current write offset in journal file.
+        self._last_index_offset = None  # Offset of the last index entry.
+        self._max_ts = 0  # Max timestamp of records in current journal file.
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def initialize(self, path="/var/log/aioquant/journal", market=False, buffer_size=256 * 1024,
+                   index_interval=64 * 1024, flush_interval=1, queue_size=100000):
+        """Initialize journal and start to record.
+
+        Args:
+            path: Journal file path.
+            market: If record market events(orderbook/trade/kline), default is `False`.
+            buffer_size: File write buffer size(bytes), default is 256KB.
+            index_interval: Write an index entry every `index_interval` bytes, default is 64KB.
+            flush_interval: Flush buffer to file interval(seconds), default is 1s.
+            queue_size: Max records in queue waiting to be written, default is 100000.
+        """
+        from aioquant.tasks import LoopRunTask
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._path = path
+        self._market = market
+        self._buffer_size = buffer_size
+        self._index_interval = index_interval
+        self._queue = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name="Journal", daemon=True)
+        self._thread.start()
+        self._enabled = True
+        LoopRunTask.register(self._flush_task, flush_interval)
+        logger.info("journal path:", path, "market:", market, caller=self)
+
+    def order(self, order) -> None:
+        """Record an order update.
+
+        Args:
+            order: Order object.
+        """
+        if not self._enabled:
+            return
+        payload = b"".join([
+            _pack_str(order.platform), _pack_str(order.account), _pack_str(order.strategy),
+            _pack_str(order.client_order_id), _pack_str(order.action), _pack_str(order.order_type),
+            _pack_str(order.status),
+            _ORDER_NUMBERS.pack(_float(order.price), _float(order.quantity), _float(order.remain),
+                                _float(order.avg_price), _float(order.fee), _int(order.ctime), _int(order.utime))
+        ])
+        self._write(RECORD_ORDER, order.symbol, order.order_id, payload)
+
+    def market(self, obj) -> None:
+        """Record a market event.
+
+        Args:
+            obj: Orderbook / Trade / Kline object.
+        """
+        if not self._enabled or not self._market:
+            return
+        from aioquant.market import Orderbook, Trade, Kline
+
+        if isinstance(obj, Orderbook):
+            asks = obj.asks or []
+            bids = obj.bids or []
+            numbers = []
+            for price, quantity in list(asks) + list(bids):
+                numbers.append(_float(price))
+                numbers.append(_float(quantity))
+            payload = b"".join([
+                _pack_str(obj.platform), _BOOK_SIZE.pack(len(asks), len(bids)),
+                struct.pack("<%dd" % len(numbers), *numbers), struct.pack("<q", _int(obj.timestamp))
+            ])
+            self._write(RECORD_ORDERBOOK, obj.symbol, "", payload)
+        elif isinstance(obj, Trade):
+            payload = b"".join([
+                _pack_str(obj.platform), _pack_str(obj.action),
+                _TRADE_NUMBERS.pack(_float(obj.price), _float(obj.quantity), _int(obj.timestamp))
+            ])
+            self._write(RECORD_TRADE, obj.symbol, "", payload)
+        elif isinstance(obj, Kline):
+            payload = b"".join([
+                _pack_str(obj.platform), _pack_str(obj.kline_type),
+                _KLINE_NUMBERS.pack(_float(obj.open), _float(obj.high), _float(obj.low), _float(obj.close),
+                                    _float(obj.volume), _int(obj.timestamp))
+            ])
+            self._write(RECORD_KLINE, obj.symbol, "", payload)
+
+    def error(self, platform, symbol, error, order_id=None) -> None:
+        """Record an error.
+
+        Args:
+            platform: Exchange platform name.
+            symbol: Symbol name.
+            error: Error information.
+            order_id: Order id, if this error is about an order.
+        """
+        if not self._enabled:
+            return
+        payload = _pack_str(platform) + _pack_str(error)
+        self._write(RECORD_ERROR, symbol, order_id, payload)
+
+    def flush(self, timeout=5) -> None:
+        """Wait for all the records in queue to be written and flushed to file.
+
+        Args:
+            timeout: Max waiting time(seconds).
+        """
+        if not self._thread or not self._thread.is_alive():
+            return
+        event = threading.Event()
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            return
+        event.wait(timeout)
+
+    def close(self) -> None:
+        """Stop recording, write all the records in queue and close journal file."""
+        self._enabled = False
+        if self._thread and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(5)
+        self._thread = None
+
+    async def _flush_task(self, *args, **kwargs):
+        if self._dropped:
+            dropped, self._dropped = self._dropped, 0
+            logger.warn("journal queue full, dropped", dropped, "records.", caller=self)
+        try:
+            self._queue.put_nowait(self._FLUSH)
+        except queue.Full:
+            pass
+
+    def _write(self, record_type, symbol, key, payload):
+        ts = int(time.time() * 1000)
+        body = b"".join([_HEADER.pack(record_type, ts), _pack_str(symbol), _pack_str(key), payload])
+        record = _FRAME.pack(SYNC, len(body), zlib.crc32(body)) + body
+        try:
+            self._queue.put_nowait((ts, record))
+        except queue.Full:
+            self._dropped += 1
+
+    def _run(self):
+        """Write records in background thread."""
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = []
+            flush = False
+            for item in batch:
+                if item is self._STOP:
+                    running = False
+                elif item is self._FLUSH:
+                    flush = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    try:
+                        self._write_record(*item)
+                    except Exception as e:
+                        logger.error("write journal error:", e, caller=self)
+            if flush or events or not running:
+                self._flush_file()
+            for event in events:
+                event.set()
+        self._close_file()
+
+    def _write_record(self, ts, record):
+        if ts >= self._next_day_ts:
+            self._open_file(ts)
+        self._max_ts = max(self._max_ts, ts)
+        if self._last_index_offset is None or self._offset - self._last_index_offset >= self._index_interval:
+            self._index_file.write(_INDEX.pack(self._max_ts, self._offset))
+            self._last_index_offset = self._offset
+        self._file.write(record)
+        self._offset += len(record)
+
+    def _flush_file(self):
+        if self._file:
+            self._file.flush()
+            self._index_file.flush()
+
+    def _close_file(self):
+        if self._file:
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+
+    def _open_file(self, ts):
+        """Open a new journal file every day."""
+        self._close_file()
+        day = datetime.date.fromtimestamp(ts / 1000)
+        tomorrow = day + datetime.timedelta(days=1)
+        self._next_day_ts = int(time.mktime(tomorrow.timetuple()) * 1000)
+        filename = os.path.join(self._path, "journal-{}.bin".format(day.strftime("%Y%m%d")))
+        exists = os.path.isfile(filename) and os.path.getsize(filename) > 0
+        self._file = open(filename, "ab", buffering=self._buffer_size)
+        self._index_file = open(filename[:-4] + ".idx", "ab")
+        if not exists:
+            self._file.write(MAGIC)
+        self._offset = self._file.tell()
+        self._last_index_offset = None
+        self._max_ts = 0
+
+
+class JournalReader:
+    """Binary event journal reader.
+
+    Attributes:
+        filename: Journal file name, e.g. `journal-20190601.bin`.
+    """
+
+    def __init__(self, filename):
+        """Initialize."""
+        self._filename = filename
+        self._index = []  # Index entries. e.g. `[(timestamp, offset), ...]`
+        index_filename = filename[:-4] + ".idx"
+        if os.path.isfile(index_filename):
+            with open(index_filename, "rb") as f:
+                data = f.read()
+            for i in range(len(data) // _INDEX.size):
+                self._index.append(_INDEX.unpack_from(data, i * _INDEX.size))
+
+    def _seek_offset(self, start):
+        """Find the offset of the last index block which starts before `start`."""
+        if not start or not self._index:
+            return len(MAGIC)
+        i = bisect.bisect_left(self._index, (start, 0))
+        if i == 0:
+            return len(MAGIC)
+        return self._index[i - 1][1]
+
+    def read(self, start=None, end=None, symbol=None, order_id=None, record_types=None):
+        """Read records.
+
+        Args:
+            start: Start timestamp(millisecond), include.
+            end: End timestamp(millisecond), exclude.
+            symbol: Only read records for this symbol.
+            order_id: Only read records for this order id.
+            record_types: Only read records with these types, e.g. `[RECORD_ORDER, RECORD_ERROR]`.
+
+        Yields:
+            record: Record dict.
+
+        NOTE:
+            Records are stamped by wall clock, which may step backwards, so the reader seeks by index and scans to the
+            end of file rather than stopping at the first record after `end`.
+        """
+        with open(self._filename, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a journal file: {}".format(self._filename))
+            f.seek(self._seek_offset(start))
+            while True:
+                pos = f.tell()
+                head = f.read(_FRAME.size)
+                if len(head) < _FRAME.size:
+                    break
+                sync, length, crc = _FRAME.unpack(head)
+                buf = f.read(length) if sync == SYNC else b""
+                if sync != SYNC or len(buf) < length or zlib.crc32(buf) != crc:
+                    # Torn or corrupted record, skip to the next record.
+                    logger.warn("bad record at offset:", pos, "file:", self._filename, caller=self)
+                    if not self._resync(f, pos + 1):
+                        break
+                    continue
+                record_type, ts = _HEADER.unpack_from(buf, 0)
+                if start and ts < start:
+                    continue
+                if end and ts >= end:
+                    continue
+                if record_types and record_type not in record_types:
+                    continue
+                _symbol, offset = _unpack_str(buf, _HEADER.size)
+                if symbol and _symbol != symbol:
+                    continue
+                key, offset = _unpack_str(buf, offset)
+                if order_id and key != order_id:
+                    continue
+                record = {"type": RECORD_NAMES.get(record_type, record_type), "timestamp": ts, "symbol": _symbol}
+                record.update(self._decode(record_type, key, buf, offset))
+                yield record
+
+    @staticmethod
+    def _resync(f, offset):
+        """Seek to the next SYNC after `offset`, return False if not found."""
+        f.seek(offset)
+        tail = b""
+        while True:
+            chunk = f.read(64 * 1024)
+            if not chunk:
+                return False
+            data = tail + chunk
+            i = data.find(SYNC)
+            if i >= 0:
+                f.seek(offset - len(tail) + i)
+                return True
+            tail = data[-(len(SYNC) - 1):]
+            offset += len(chunk)
+
+    def _decode(self, record_type, key, buf, offset):
+        d = {}
+        if record_type == RECORD_ORDER:
+            d["order_id"] = key
+            for name in ("platform", "account", "strategy", "client_order_id", "action", "order_type", "status"):
+                d[name], offset = _unpack_str(buf, offset)
+            values = _ORDER_NUMBERS.unpack_from(buf, offset)
+            for name, v in zip(("price", "quantity", "remain", "avg_price", "fee", "ctime", "utime"), values):
+                d[name] = v
+        elif record_type == RECORD_ORDERBOOK:
+            d["platform"], offset = _unpack_str(buf, offset)
+            n_asks, n_bids = _BOOK_SIZE.unpack_from(buf, offset)
+            offset += _BOOK_SIZE.size
+            numbers = struct.unpack_from("<%dd" % ((n_asks + n_bids) * 2), buf, offset)
+            offset += struct.calcsize("<%dd" % ((n_asks + n_bids) * 2))
+            pairs = [list(numbers[i:i + 2]) for i in range(0, len(numbers), 2)]
+            d["asks"] = pairs[:n_asks]
+            d["bids"] = pairs[n_asks:]
+            d["market_timestamp"], = struct.unpack_from("<q", buf, offset)
+        elif record_type == RECORD_TRADE:
+            d["platform"], offset = _unpack_str(buf, offset)
+            d["action"], offset = _unpack_str(buf, offset)
+            d["price"], d["quantity"], d["market_timestamp"] = _TRADE_NUMBERS.unpack_from(buf, offset)
+        elif record_type == RECORD_KLINE:
+            d["platform"], offset = _unpack_str(buf, offset)
+            d["kline_type"], offset = _unpack_str(buf, offset)
+            values = _KLINE_NUMBERS.unpack_from(buf, offset)
+            for name, v in zip(("open", "high", "low", "close", "volume", "market_timestamp"), values):
+                d[name] = v
+        elif record_type == RECORD_ERROR:
+            if key:
+                d["order_id"] = key
+            d["platform"], offset = _unpack_str(buf, offset)
+            d["error"], offset = _unpack_str(buf, offset)
+        return d
+
+
+journal = Journal()
@@ -0,0 +1,51 @@
+# -*- coding:utf-8 -*-
+
+"""
+Command line reader of binary event journal, print records as json lines.
+
+Only time range is indexed, filters by symbol, order id or record type scan all the records in the time range.
+
+Usage:
+    python -m aioquant.utils.journal_cli /var/log/aioquant/journal/journal-20190601.bin --symbol BTC/USDT \
+        --start "2019-06-01 10:00:00" --end "2019-06-01 11:00:00" --order-id 12345 --type order
+"""
+
+import sys
+import json
+import time
+import argparse
+import datetime
+
+from aioquant.utils.journal import JournalReader, RECORD_NAMES
+
+
+def _parse_time(s):
+    """Parse time argument, millisecond timestamp or `%Y-%m-%d %H:%M:%S` local time."""
+    if not s:
+        return None
+    if s.isdigit():
+        return int(s)
+    dt = datetime.datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
+    return int(time.mktime(dt.timetuple()) * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read aioquant binary event journal.")
+    parser.add_argument("filename", help="journal file, e.g. journal-20190601.bin")
+    parser.add_argument("--start", help="start time, millisecond timestamp or `%%Y-%%m-%%d %%H:%%M:%%S`")
+    parser.add_argument("--end", help="end time, millisecond timestamp or `%%Y-%%m-%%d %%H:%%M:%%S`")
+    parser.add_argument("--symbol", help="symbol name, e.g. BTC/USDT")
+    parser.add_argument("--order-id", help="order id")
+    parser.add_argument("--type", action="append", choices=list(RECORD_NAMES.values()), help="record type")
+    args = parser.parse_args(argv)
+
+    names = {v: k for k, v in RECORD_NAMES.items()}
+    record_types = [names[t] for t in args.type] if args.type else None
+    reader = JournalReader(args.filename)
+    for record in reader.read(_parse_time(args.start), _parse_time(args.end), args.symbol, args.order_id,
+                              record_types):
+        sys.stdout.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
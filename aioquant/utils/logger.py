@@ -10,15 +10,20 @@ Email:  huangtao@ifclover.com
 
 import os
 import sys
+import queue
 import shutil
 import logging
+import threading
 import traceback
 from logging.handlers import TimedRotatingFileHandler
 
 initialized = False
 
+_logger = logging.getLogger()
 
-def initLogger(level="DEBUG", path=None, name=None, clear=False, backup_count=0, console=True):
+
+def initLogger(level="DEBUG", path=None, name=None, clear=False, backup_count=0, console=True, async_write=False,
+               queue_size=10000, overflow="drop", batch_size=100):
     """Initialize logger.
 
     Args:
@@ -29,60 +34,240 @@ def initLogger(level="DEBUG", path=None, name=None, clear=False, backup_count=0,
         backup_count: How many log file to be saved. We will save log file per day at middle nigh,
             default is `0` to save file permanently.
         console: If print log to console, otherwise print to log file.
+        async_write: If write log in a background thread, so that the event loop thread will never be blocked by
+            file I/O, default is `False`.
+        queue_size: Max log records in queue waiting to be written, only for `async_write`, default is 10000.
+        overflow: What to do if the queue is full, `drop` to drop the log record, `block` to wait until the queue is
+            not full, only for `async_write`, default is `drop`.
+        batch_size: Max log records to be written per flush, only for `async_write`, default is 100.
     """
     global initialized
     if initialized:
         return
     path = path or "/var/log/aioquant"
     name = name or "quant.log"
-    logger = logging.getLogger()
+    logger = _logger
     logger.setLevel(level)
     if console:
         print("init logger ...")
-        handler = logging.StreamHandler()
+        handler = _StreamHandler()
     else:
         if clear and os.path.isdir(path):
             shutil.rmtree(path)
         if not os.path.isdir(path):
             os.makedirs(path)
         logfile = os.path.join(path, name)
-        handler = TimedRotatingFileHandler(logfile, "midnight", backupCount=backup_count)
+        handler = _TimedRotatingFileHandler(logfile, "midnight", backupCount=backup_count)
         print("init logger ...", logfile)
     fmt_str = "%(levelname)1.1s [%(asctime)s] %(message)s"
     fmt = logging.Formatter(fmt=fmt_str, datefmt=None)
     handler.setFormatter(fmt)
+    if async_write:
+        handler = AsyncLogHandler(handler, queue_size, overflow, batch_size)
     logger.addHandler(handler)
     initialized = True
 
 
+def reset():
+    """Remove all handlers, so that logger could be initialized again, e.g. in a forked worker process."""
+    global initialized
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+        handler.close()
+    initialized = False
+
+
+def flush(timeout=5):
+    """Flush all log records, waiting for the records in queue to be written if `async_write` is enabled.
+
+    Args:
+        timeout: Max waiting time(seconds).
+    """
+    for handler in _logger.handlers:
+        if isinstance(handler, AsyncLogHandler):
+            handler.flush(timeout)
+        else:
+            handler.flush()
+
+
+class _BatchFlushMixin:
+    """Do not flush per log record while writing a batch of records, flush once after the batch written."""
+
+    batching = False
+
+    def flush(self):
+        if not self.batching:
+            super(_BatchFlushMixin, self).flush()
+
+
+class _StreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _TimedRotatingFileHandler(_BatchFlushMixin, TimedRotatingFileHandler):
+    pass
+
+
+class AsyncLogHandler(logging.Handler):
+    """Log handler that puts log records into a bounded queue, and a background thread writes them in batches.
+
+    Attributes:
+        handler: The real log handler to write log records.
+        queue_size: Max log records in queue.
+        overflow: What to do if the queue is full, `drop` or `block`.
+        batch_size: Max log records to be written per flush.
+    """
+
+    _STOP = object()  # Sentinel to stop the writer thread.
+
+    def __init__(self, handler, queue_size=10000, overflow="drop", batch_size=100):
+        """Initialize."""
+        super(AsyncLogHandler, self).__init__()
+        self._handler = handler
+        self._queue = queue.Queue(queue_size)
+        self._block = overflow == "block"
+        self._batch_size = batch_size
+        self._dropped = 0  # How many log records dropped since last report.
+        self._dropped_lock = threading.Lock()  # `_dropped` is updated by caller threads and writer thread.
+        self._thread = threading.Thread(target=self._run, name="AsyncLogHandler", daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def emit(self, record):
+        try:
+            # Render message on caller thread, arguments may be changed after this call.
+            record.msg = record.getMessage()
+            record.args = None
+            if self._block:
+                self._queue.put(record)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def flush(self, timeout=5):
+        """Wait for all the log records in queue to be written.
+
+        Args:
+            timeout: Max waiting time(seconds).
+        """
+        if not self._thread.is_alive():
+            return
+        event = threading.Event()
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            return
+        event.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join(5)
+        self._handler.close()
+        super(AsyncLogHandler, self).close()
+
+    def _run(self):
+        """Write log records in background thread."""
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            events = []
+            self._handler.batching = True
+            try:
+                for item in batch:
+                    if item is self._STOP:
+                        running = False
+                    elif isinstance(item, threading.Event):
+                        events.append(item)
+                    else:
+                        self._handler.handle(item)
+                with self._dropped_lock:
+                    dropped, self._dropped = self._dropped, 0
+                if dropped:
+                    msg = "[-] [AsyncLogHandler._run] log queue full, dropped {} log records.".format(dropped)
+                    self._handler.handle(logging.LogRecord(_logger.name, logging.WARNING, "(unknown file)", 0, msg,
+                                                           None, None))
+            finally:
+                self._handler.batching = False
+                self._handler.flush()
+            for event in events:
+                event.set()
+
+
 def info(*args, **kwargs):
-    func_name, kwargs = _log_msg_header(*args, **kwargs)
-    logging.info(_log(func_name, *args, **kwargs))
+    if not _logger.isEnabledFor(logging.INFO):
+        return
+    _emit(logging.INFO, _LogMessage(sys._getframe(1).f_code.co_name, args, kwargs))
 
 
 def warn(*args, **kwargs):
-    msg_header, kwargs = _log_msg_header(*args, **kwargs)
-    logging.warning(_log(msg_header, *args, **kwargs))
+    if not _logger.isEnabledFor(logging.WARNING):
+        return
+    _emit(logging.WARNING, _LogMessage(sys._getframe(1).f_code.co_name, args, kwargs))
 
 
 def debug(*args, **kwargs):
-    msg_header, kwargs = _log_msg_header(*args, **kwargs)
-    logging.debug(_log(msg_header, *args, **kwargs))
+    if not _logger.isEnabledFor(logging.DEBUG):
+        return
+    _emit(logging.DEBUG, _LogMessage(sys._getframe(1).f_code.co_name, args, kwargs))
 
 
 def error(*args, **kwargs):
-    logging.error("*" * 60)
-    msg_header, kwargs = _log_msg_header(*args, **kwargs)
-    logging.error(_log(msg_header, *args, **kwargs))
-    logging.error("*" * 60)
+    if not _logger.isEnabledFor(logging.ERROR):
+        return
+    _emit(logging.ERROR, "*" * 60)
+    _emit(logging.ERROR, _LogMessage(sys._getframe(1).f_code.co_name, args, kwargs))
+    _emit(logging.ERROR, "*" * 60)
 
 
 def exception(*args, **kwargs):
-    logging.error("*" * 60)
-    msg_header, kwargs = _log_msg_header(*args, **kwargs)
-    logging.error(_log(msg_header, *args, **kwargs))
-    logging.error(traceback.format_exc())
-    logging.error("*" * 60)
+    if not _logger.isEnabledFor(logging.ERROR):
+        return
+    _emit(logging.ERROR, "*" * 60)
+    _emit(logging.ERROR, _LogMessage(sys._getframe(1).f_code.co_name, args, kwargs))
+    _emit(logging.ERROR, traceback.format_exc())
+    _emit(logging.ERROR, "*" * 60)
+
+
+def _emit(level, msg):
+    """Emit a log record to handlers, skip finding caller's source file and line number(it's slow and not printed)."""
+    _logger.handle(_logger.makeRecord(_logger.name, level, "(unknown file)", 0, msg, None, None))
+
+
+class _LogMessage:
+    """Log message, it will be formatted only when a log handler really emits it.
+
+    Attributes:
+        func_name: Caller function name.
+        args: Log message arguments.
+        kwargs: Log message keyword arguments.
+    """
+
+    __slots__ = ("func_name", "args", "kwargs", "_msg")
+
+    def __init__(self, func_name, args, kwargs):
+        self.func_name = func_name
+        self.args = args
+        self.kwargs = kwargs
+        self._msg = None
+
+    def __str__(self):
+        if self._msg is None:
+            msg_header, kwargs = _log_msg_header(self.func_name, **self.kwargs)
+            self._msg = _log(msg_header, *self.args, **kwargs)
+        return self._msg
 
 
 def _log(msg_header, *args, **kwargs):
@@ -104,7 +289,7 @@ def _log(msg_header, *args, **kwargs):
     return _log_msg
 
 
-def _log_msg_header(*args, **kwargs):
+def _log_msg_header(func_name, **kwargs):
     """Fetch log message header.
 
     NOTE:
@@ -112,7 +297,6 @@ def _log_msg_header(*args, **kwargs):
         logger.xxx(... , caller=cls) for class method.
     """
     cls_name = ""
-    func_name = sys._getframe().f_back.f_back.f_code.co_name
     session_id = "-"
     try:
         _caller = kwargs.get("caller", None)
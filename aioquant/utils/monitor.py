@@ -0,0 +1,151 @@
+# -*- coding:utf-8 -*-
+
+"""
+Event loop lag and slow callback monitor.
+
+A probe callback is scheduled every `probe_interval` seconds, the delay between its deadline and the time it really
+runs is the loop lag. Every callback run by the loop is timed, the callbacks(or task steps) run longer than
+`slow_callback_duration` are logged with their qualified names. Lag percentiles and slow callbacks are reported
+periodically by a loop run task.
+
+NOTE:
+    Slow callbacks are timed by patching `asyncio.Handle._run`, it doesn't work with `uvloop`, while the lag probe
+    works with any loop.
+"""
+
+import time
+import asyncio
+import functools
+
+from aioquant.utils import logger
+from aioquant.utils.stats import RollingWindow
+
+__all__ = ("monitor", )
+
+
+def _callback_name(callback):
+    """Qualified name of a callback, the task name(set by task supervisor) or coroutine name for a task step."""
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Future):
+        name = owner.get_name() if hasattr(owner, "get_name") else None
+        if name and not name.startswith("Task-"):
+            return name
+        coro = owner.get_coro() if hasattr(owner, "get_coro") else getattr(owner, "_coro", None)
+        if coro is not None:
+            return getattr(coro, "__qualname__", None) or repr(coro)
+    while isinstance(callback, functools.partial):
+        callback = callback.func
+    return getattr(callback, "__qualname__", None) or repr(callback)
+
+
+class LoopMonitor:
+    """Event loop lag and slow callback monitor.
+    """
+
+    def __init__(self):
+        """Initialize."""
+        self._enabled = False
+        self._probe_interval = 0.01
+        self._slow_callback_duration = 0.05
+        self._lag = RollingWindow(1000)  # Loop lag(seconds) of recent probes.
+        self._slow = {}  # Slow callbacks. `{name: {"count": 1, "max": 0.1}}`, duration is in seconds.
+        self._deadline = None  # Deadline of the next probe.
+        self._handle = None  # Timer handle of the next probe.
+        self._report_task_id = None
+        self._origin_run = None  # Origin `asyncio.Handle._run`.
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def initialize(self, probe_interval=0.01, slow_callback_duration=0.05, report_interval=60):
+        """Initialize monitor and start to measure.
+
+        Args:
+            probe_interval: Loop lag probe interval(seconds), default is 0.01s.
+            slow_callback_duration: The callbacks run longer than this duration(seconds) will be logged, default is
+                0.05s, 0 to disable.
+            report_interval: Report lag percentiles and slow callbacks interval(seconds), default is 60s.
+        """
+        from aioquant.tasks import LoopRunTask
+
+        if self._enabled:
+            return
+        self._enabled = True
+        self._probe_interval = probe_interval
+        self._slow_callback_duration = slow_callback_duration
+        if slow_callback_duration > 0:
+            self._patch()
+        loop = asyncio.get_event_loop()
+        self._deadline = loop.time() + probe_interval
+        self._handle = loop.call_at(self._deadline, self._probe)
+        self._report_task_id = LoopRunTask.register(self._report, report_interval)
+        logger.info("probe interval:", probe_interval, "slow callback duration:", slow_callback_duration,
+                    caller=self)
+
+    def stop(self):
+        """Stop measuring."""
+        from aioquant.tasks import LoopRunTask
+
+        if not self._enabled:
+            return
+        self._enabled = False
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if self._origin_run:
+            asyncio.Handle._run = self._origin_run
+            self._origin_run = None
+        LoopRunTask.unregister(self._report_task_id)
+
+    def stats(self):
+        """Loop lag and slow callbacks stats.
+
+        Returns:
+            stats: e.g. `{"lag": {"count": 100, "avg": 0.1, ...}, "slow_callbacks": {"Binance.process":
+                {"count": 1, "max": 120.1}, ...}}`, lag and duration are in milliseconds.
+        """
+        slow = {}
+        for name, s in self._slow.items():
+            slow[name] = {"count": s["count"], "max": round(s["max"] * 1000, 3)}
+        return {"lag": self._lag.summary(scale=1000), "slow_callbacks": slow}
+
+    def _probe(self):
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        self._lag.add(now - self._deadline)
+        self._deadline = now + self._probe_interval
+        self._handle = loop.call_at(self._deadline, self._probe)
+
+    def _patch(self):
+        origin_run = asyncio.Handle._run
+        threshold = self._slow_callback_duration
+        on_slow = self._on_slow_callback
+
+        def _run(handle):
+            start = time.perf_counter()
+            origin_run(handle)
+            duration = time.perf_counter() - start
+            if duration >= threshold:
+                on_slow(handle, duration)
+
+        self._origin_run = origin_run
+        asyncio.Handle._run = _run
+
+    def _on_slow_callback(self, handle, duration):
+        name = _callback_name(handle._callback)
+        s = self._slow.get(name)
+        if not s:
+            s = {"count": 0, "max": 0}
+            self._slow[name] = s
+        s["count"] += 1
+        s["max"] = max(s["max"], duration)
+        logger.warn("slow callback:", name, "duration:", "%.3fms" % (duration * 1000), caller=self)
+
+    async def _report(self, *args, **kwargs):
+        stats = self.stats()
+        slow = sorted(stats["slow_callbacks"].items(), key=lambda item: item[1]["count"], reverse=True)[:10]
+        logger.info("loop lag(ms):", stats["lag"], "slow callbacks:", slow, caller=self)
+
+
+monitor = LoopMonitor()
@@ -0,0 +1,241 @@
+# -*- coding:utf-8 -*-
+
+"""
+Asynchronous token bucket rate limiter for REST API clients.
+
+Requests will be queued instead of failed when the rate limit is exceeded, and requests with higher priority(e.g.
+cancel order) will jump ahead of requests with lower priority(e.g. create order) in queue.
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+
+from aioquant.utils import logger
+
+__all__ = ("TokenBucket", "RateLimiter", "get_rate_limiter",
+           "PRIORITY_CANCEL", "PRIORITY_ORDER", "PRIORITY_QUERY", )
+
+
+# Request priority, the smaller the higher.
+PRIORITY_CANCEL = 0  # Cancel order.
+PRIORITY_ORDER = 1  # Create order.
+PRIORITY_QUERY = 2  # Query information.
+
+# Rate limiters. e.g. {"binance:access_key": RateLimiter, ... }
+RATE_LIMITERS = {}
+
+
+class TokenBucket:
+    """Token bucket, only holding the token state, requests are queued by `RateLimiter`.
+
+    Attributes:
+        name: Bucket name.
+        capacity: Max tokens in bucket.
+        interval: How many seconds to refill `capacity` tokens.
+    """
+
+    def __init__(self, name, capacity, interval):
+        """Initialize."""
+        self._name = name
+        self._capacity = capacity
+        self._rate = capacity / interval  # Tokens refilled per second.
+        self._tokens = capacity
+        self._last_ts = time.monotonic()
+        self._paused_until = 0  # Do not release any token before this time(monotonic seconds).
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def tokens(self):
+        self._refill()
+        return self._tokens
+
+    def can_take(self, cost) -> bool:
+        """If `cost` tokens could be taken now."""
+        self._refill()
+        if self._paused_until > time.monotonic():
+            return False
+        # A request costs more than capacity is allowed when the bucket is full, otherwise it will never be sent.
+        return self._tokens >= min(cost, self._capacity)
+
+    def delay(self, cost) -> float:
+        """Seconds to wait until `cost` tokens could be taken."""
+        self._refill()
+        return max(self._paused_until - time.monotonic(), (min(cost, self._capacity) - self._tokens) / self._rate, 0)
+
+    def take(self, cost) -> None:
+        """Take `cost` tokens, check by `can_take` first."""
+        self._refill()
+        self._tokens -= cost
+
+    def refund(self, cost) -> None:
+        """Give back `cost` tokens taken by a request not sent."""
+        self._refill()
+        self._tokens = min(self._capacity, self._tokens + cost)
+
+    def update(self, used) -> None:
+        """Correct tokens with the used count reported by exchange server.
+
+        Args:
+            used: Used tokens in current window, reported by exchange server.
+        """
+        self._refill()
+        self._tokens = min(self._tokens, self._capacity - used)
+
+    def pause(self, seconds) -> None:
+        """Do not release any token in the next `seconds`, e.g. the exchange server returns a HTTP 429 response.
+
+        Args:
+            seconds: Pause time(seconds).
+        """
+        self._refill()
+        self._tokens = min(self._tokens, 0)
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._last_ts) * self._rate)
+        self._last_ts = now
+
+
+class RateLimiter:
+    """Rate limiter, holding multiple token buckets, e.g. request weight per minute and order count per second.
+
+    Attributes:
+        name: Rate limiter name.
+        limits: Bucket settings. e.g. `{"weight": (1200, 60), "orders": (10, 1)}`, means 1200 weight per 60 seconds
+            and 10 orders per 1 second.
+
+    NOTE:
+        A request waits in one queue of the rate limiter until all buckets it costs have enough tokens, then tokens
+        are taken from these buckets together, so no token is held by a request still waiting for other buckets.
+    """
+
+    def __init__(self, name, limits):
+        """Initialize."""
+        self._name = name
+        self._buckets = {}
+        for bucket_name, (capacity, interval) in limits.items():
+            self._buckets[bucket_name] = TokenBucket(bucket_name, capacity, interval)
+        self._waiters = []  # Heap of waiters. e.g. `[(priority, seq, costs, future), ...]`
+        self._seq = itertools.count()
+        self._timer = None  # Timer handle to wake up waiters.
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def buckets(self):
+        return self._buckets
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+    async def acquire(self, costs, priority=PRIORITY_QUERY) -> None:
+        """Acquire tokens from buckets, wait in queue until all buckets have enough tokens, then take them together.
+        If cancelled(e.g. timeout) after tokens taken but before resumed, the tokens will be refunded.
+
+        Args:
+            costs: Tokens to acquire from every bucket. e.g. `{"weight": 1, "orders": 1}`
+            priority: Request priority, the smaller the higher.
+        """
+        costs = {name: cost for name, cost in costs.items() if name in self._buckets and cost > 0}
+        if not costs:
+            return
+        if not self._waiters and self._can_take(costs):
+            self._take(costs)
+            return
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), costs, future))
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():  # Tokens taken, but cancelled before resumed.
+                for name, cost in costs.items():
+                    self._buckets[name].refund(cost)
+            self._schedule(reset=True)
+            raise
+
+    def _can_take(self, costs):
+        for name, cost in costs.items():
+            if not self._buckets[name].can_take(cost):
+                return False
+        return True
+
+    def _take(self, costs):
+        for name, cost in costs.items():
+            self._buckets[name].take(cost)
+
+    def _schedule(self, reset=False):
+        if reset and self._timer:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters and self._waiters[0][3].done():  # Cancelled by caller.
+            heapq.heappop(self._waiters)
+        if self._timer or not self._waiters:
+            return
+        _, _, costs, _ = self._waiters[0]
+        delay = max(self._buckets[name].delay(cost) for name, cost in costs.items())
+        self._timer = asyncio.get_event_loop().call_later(delay, self._wakeup)
+
+    def _wakeup(self):
+        self._timer = None
+        while self._waiters:
+            _, _, costs, future = self._waiters[0]
+            if future.done():  # Cancelled by caller.
+                heapq.heappop(self._waiters)
+                continue
+            if not self._can_take(costs):
+                break
+            heapq.heappop(self._waiters)
+            self._take(costs)
+            future.set_result(None)
+        self._schedule()
+
+    def update(self, bucket_name, used) -> None:
+        """Correct tokens with the used count reported by exchange server.
+
+        Args:
+            bucket_name: Bucket name.
+            used: Used tokens in current window.
+        """
+        bucket = self._buckets.get(bucket_name)
+        if bucket:
+            bucket.update(used)
+
+    def pause(self, seconds) -> None:
+        """Pause all buckets.
+
+        Args:
+            seconds: Pause time(seconds).
+        """
+        logger.warn("rate limit exceeded, pause requests for", seconds, "seconds.", caller=self)
+        for bucket in self._buckets.values():
+            bucket.pause(seconds)
+        self._schedule(reset=True)
+
+
+def get_rate_limiter(platform, account, limits):
+    """Get a rate limiter shared by all REST API clients for the same exchange and account, if not exist, create a new.
+
+    Args:
+        platform: Exchange platform name, e.g. `binance`.
+        account: Account identity, e.g. access key.
+        limits: Bucket settings, only used when creating a new rate limiter. e.g. `{"weight": (1200, 60)}`
+
+    Returns:
+        rate_limiter: Rate limiter.
+    """
+    key = "{}:{}".format(platform, account)
+    rate_limiter = RATE_LIMITERS.get(key)
+    if not rate_limiter:
+        rate_limiter = RateLimiter(key, limits)
+        RATE_LIMITERS[key] = rate_limiter
+    return rate_limiter
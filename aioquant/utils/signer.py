@@ -0,0 +1,79 @@
+# -*- coding:utf-8 -*-
+
+"""
+Request signer for exchange REST API and Websocket authentication.
+
+The secret key is hashed into a HMAC state only once, and every message is signed with a copy of the state, so that
+the key padding and hashing will not be paid per request.
+"""
+
+import hmac
+import time
+import base64
+import hashlib
+
+__all__ = ("HmacSigner", "make_query", )
+
+
+class HmacSigner:
+    """HMAC signer.
+
+    Attributes:
+        secret_key: Secret key.
+        digestmod: Digest algorithm, default is `hashlib.sha256`.
+        output: Signature output format, `hex` or `base64`, default is `hex`.
+        time_func: Function returning current time in seconds(float), default is `time.time`. Set it to a clock that
+            synchronized with exchange server, so that the timestamps will not be rejected.
+    """
+
+    def __init__(self, secret_key, digestmod=hashlib.sha256, output="hex", time_func=None):
+        """Initialize."""
+        self._hmac = hmac.new(secret_key.encode(), digestmod=digestmod)
+        self._base64 = output == "base64"
+        self._time_func = time_func or time.time
+
+    @property
+    def time_func(self):
+        return self._time_func
+
+    @time_func.setter
+    def time_func(self, func):
+        self._time_func = func or time.time
+
+    def sign(self, message) -> str:
+        """Sign a message.
+
+        Args:
+            message: Message to be signed, `str` or `bytes`.
+
+        Returns:
+            signature: Hex string or base64 string.
+        """
+        mac = self._hmac.copy()
+        mac.update(message.encode() if isinstance(message, str) else message)
+        if self._base64:
+            return base64.b64encode(mac.digest()).decode()
+        return mac.hexdigest()
+
+    def timestamp_ms(self) -> int:
+        """Current timestamp in milliseconds. e.g. `1538054050975`"""
+        return int(self._time_func() * 1000)
+
+    def timestamp_str(self) -> str:
+        """Current timestamp in seconds with milliseconds. e.g. `1538054050.975`"""
+        return "%d.%03d" % divmod(int(self._time_func() * 1000), 1000)
+
+
+def make_query(params, sort=False) -> str:
+    """Make a query string without url encoding. e.g. `a=1&b=2`
+
+    Args:
+        params: Query params, dict.
+        sort: If sort params by key.
+
+    Returns:
+        query: Query string.
+    """
+    if sort:
+        return "&".join(["%s=%s" % (k, params[k]) for k in sorted(params)])
+    return "&".join(["%s=%s" % (k, v) for k, v in params.items()])
@@ -0,0 +1,67 @@
+# -*- coding:utf-8 -*-
+
+"""
+Rolling statistics.
+"""
+
+import collections
+
+__all__ = ("RollingWindow", )
+
+
+class RollingWindow:
+    """Keep the latest N samples, and calculate percentiles on demand.
+
+    Attributes:
+        size: Max sample count in window, default is 1000.
+    """
+
+    def __init__(self, size=1000):
+        """Initialize."""
+        self._samples = collections.deque(maxlen=size)
+        self._count = 0  # Total sample count, including the samples dropped out of window.
+
+    def add(self, value) -> None:
+        """Add a sample."""
+        self._samples.append(value)
+        self._count += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    def percentile(self, p):
+        """Get percentile of samples in window.
+
+        Args:
+            p: Percentile, from 0 to 100.
+
+        Returns:
+            value: Percentile value, if no samples, return None.
+        """
+        if not self._samples:
+            return None
+        values = sorted(self._samples)
+        index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+        return values[index]
+
+    def summary(self, scale=1, digits=3):
+        """Summary of samples in window.
+
+        Args:
+            scale: Multiply every value, e.g. `1000` to convert seconds to milliseconds.
+            digits: Round digits.
+
+        Returns:
+            d: e.g. `{"count": 100, "avg": 1.2, "p50": 1.1, "p90": 2.0, "p99": 3.1, "max": 3.5}`
+        """
+        d = {"count": self._count}
+        if not self._samples:
+            return d
+        values = sorted(self._samples)
+        n = len(values)
+        d["avg"] = round(sum(values) / n * scale, digits)
+        for p in (50, 90, 99):
+            d["p%d" % p] = round(values[min(n - 1, int(round(p / 100.0 * (n - 1))))] * scale, digits)
+        d["max"] = round(values[-1] * scale, digits)
+        return d
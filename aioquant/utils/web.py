@@ -9,6 +9,10 @@ Email:  huangtao@ifclover.com
 """
 
 import json
+import copy
+import time
+import random
+import asyncio
 
 import aiohttp
 from urllib.parse import urlparse
@@ -16,10 +20,10 @@ from urllib.parse import urlparse
 from aioquant.utils import logger
 from aioquant.configure import config
 from aioquant.tasks import LoopRunTask, SingleTask
-from aioquant.utils.decorator import async_method_locker
+from aioquant.utils.stats import RollingWindow
 
 
-__all__ = ("Websocket", "AsyncHttpRequests", )
+__all__ = ("Websocket", "AsyncHttpRequests", "HttpServerError", )
 
 
 class Websocket:
@@ -27,7 +31,8 @@ class Websocket:
 
     Attributes:
         url: Websocket connection url.
-        connected_callback: Asynchronous callback function will be called after connected to Websocket server successfully.
+        connected_callback: Asynchronous callback function will be called after connected to Websocket server successfully
+            and all subscriptions replayed.
         process_callback: Asynchronous callback function will be called if any stream data receive from Websocket
             connection, this function only callback `text/json` message. e.g.
                 async def process_callback(json_message): pass
@@ -35,27 +40,72 @@ class Websocket:
             connection, this function only callback `binary` message. e.g.
                 async def process_binary_callback(binary_message): pass
         check_conn_interval: Check Websocket connection interval time(seconds), default is 10s.
+        reconnected_callback: Asynchronous callback function will be called after re-connected to Websocket server
+            successfully, so that the caller can resync it's local state(e.g. orderbook). e.g.
+                async def reconnected_callback(): pass
+        subscriptions: Subscription message list, every message will be sent(replayed) automatically after connected
+            (or re-connected) to Websocket server, you can also use `subscribe` to add message later.
+        heartbeat_timeout: Send a ping frame every `heartbeat_timeout` seconds, if no pong frame received within
+            `heartbeat_timeout / 2` seconds, the connection is considered dead and will be re-connected immediately,
+            default is 10s, `None` to disable.
+        backoff_base: Base delay time(seconds) of the jittered exponential backoff between connect retries, default
+            is 0.1s.
+        backoff_max: Max delay time(seconds) between connect retries, default is 30s.
+        proxy: HTTP proxy for this connection, default `None` will use `PROXY` in config file.
     """
 
+    _CONNECTIONS = set()  # Websocket objects not closed yet.
+
     def __init__(self, url, connected_callback=None, process_callback=None, process_binary_callback=None,
-                 check_conn_interval=10):
+                 check_conn_interval=10, reconnected_callback=None, subscriptions=None, heartbeat_timeout=10,
+                 backoff_base=0.1, backoff_max=30, proxy=None):
         """Initialize."""
         self._url = url
         self._connected_callback = connected_callback
         self._process_callback = process_callback
         self._process_binary_callback = process_binary_callback
         self._check_conn_interval = check_conn_interval
+        self._reconnected_callback = reconnected_callback
+        self._subscriptions = list(subscriptions or [])
+        self._heartbeat_timeout = heartbeat_timeout
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._proxy = proxy
+        self._session = None  # Client session, reused by every (re-)connection.
         self._ws = None  # Websocket connection object.
+        self._connect_lock = asyncio.Lock()  # Locked while connecting or re-connecting.
+        self._closed = False  # If closed by caller, do not re-connect any more.
+        self._connect_count = 0  # How many times connected successfully.
+        self._disconnect_ts = None  # Timestamp(second, monotonic) of the last disconnection.
 
-        LoopRunTask.register(self._check_connection, self._check_conn_interval)
+        self._check_task_id = LoopRunTask.register(self._check_connection, self._check_conn_interval)
         SingleTask.run(self._connect)
+        Websocket._CONNECTIONS.add(self)
 
     @property
     def ws(self):
         return self._ws
 
+    @property
+    def connected(self):
+        return self._ws is not None and not self._ws.closed
+
     async def close(self):
-        await self._ws.close()
+        """Close the Websocket connection and the client session, the connection will not be re-connected."""
+        self._closed = True
+        Websocket._CONNECTIONS.discard(self)
+        LoopRunTask.unregister(self._check_task_id)
+        if self._ws:
+            await self._ws.close()
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    @classmethod
+    async def close_all(cls):
+        """Close all the Websocket connections."""
+        connections = list(cls._CONNECTIONS)
+        await asyncio.gather(*[ws.close() for ws in connections], return_exceptions=True)
 
     async def ping(self, message: bytes = b"") -> None:
         await self._ws.ping(message)
@@ -63,29 +113,90 @@ class Websocket:
     async def pong(self, message: bytes = b"") -> None:
         await self._ws.pong(message)
 
+    async def subscribe(self, data) -> bool:
+        """Add a subscription message, it will be sent right now if connected, and be replayed automatically after
+        every re-connection.
+
+        Args:
+            data: Subscription message, must be dict or string.
+
+        Returns:
+            If send successfully, return True, otherwise return False.
+        """
+        if data not in self._subscriptions:
+            self._subscriptions.append(data)
+        if not self.connected:
+            return False
+        return await self.send(data)
+
+    def _get_backoff_delay(self, attempt):
+        """Full jitter exponential backoff delay, the first retry is immediately."""
+        if attempt <= 1:
+            return 0
+        return random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** (attempt - 1)))
+
     async def _connect(self) -> None:
+        if self._connect_lock.locked() or self._closed:
+            return
+        async with self._connect_lock:
+            await self._do_connect()
+
+    async def _do_connect(self) -> None:
         logger.info("url:", self._url, caller=self)
-        proxy = config.proxy
-        session = aiohttp.ClientSession()
-        try:
-            self._ws = await session.ws_connect(self._url, proxy=proxy)
-        except aiohttp.ClientConnectorError:
-            logger.error("connect to Websocket server error! url:", self._url, caller=self)
+        proxy = self._proxy or config.proxy
+        if not self._session or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        attempt = 0
+        while not self._closed:
+            attempt += 1
+            delay = self._get_backoff_delay(attempt)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                self._ws = await self._session.ws_connect(self._url, proxy=proxy, heartbeat=self._heartbeat_timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logger.error("connect to Websocket server error! url:", self._url, "attempt:", attempt, "error:", e,
+                             caller=self)
+                continue
+            # If any subscription failed to replay, the connection is useless, close it and re-connect with backoff.
+            try:
+                for data in self._subscriptions:
+                    if not await self.send(data):
+                        raise ConnectionError("send subscription failed: {}".format(data))
+            except Exception as e:
+                logger.error("replay subscriptions error! url:", self._url, "attempt:", attempt, "error:", e,
+                             caller=self)
+                await self._ws.close()
+                continue
+            break
+        else:
             return
+
+        self._connect_count += 1
         if self._connected_callback:
             SingleTask.run(self._connected_callback)
-        SingleTask.run(self._receive)
+        if self._disconnect_ts is not None:
+            logger.info("re-connect to Websocket server success! cost:",
+                        "%.3fs" % (time.monotonic() - self._disconnect_ts), caller=self)
+            self._disconnect_ts = None
+        if self._connect_count > 1 and self._reconnected_callback:
+            SingleTask.run(self._reconnected_callback)
+        SingleTask.run(self._receive, self._ws)
 
-    @async_method_locker("Websocket.reconnect.locker", False)
     async def reconnect(self) -> None:
         """Re-connect to Websocket server."""
+        if self._connect_lock.locked() or self._closed:
+            return
         logger.warn("reconnecting to Websocket server right now!", caller=self)
-        await self.close()
+        if self._disconnect_ts is None:
+            self._disconnect_ts = time.monotonic()
+        if self._ws and not self._ws.closed:
+            await self._ws.close()
         await self._connect()
 
-    async def _receive(self):
+    async def _receive(self, ws):
         """Receive stream message from Websocket connection."""
-        async for msg in self.ws:
+        async for msg in ws:
             if msg.type == aiohttp.WSMsgType.TEXT:
                 if self._process_callback:
                     try:
@@ -96,14 +207,19 @@ class Websocket:
             elif msg.type == aiohttp.WSMsgType.BINARY:
                 if self._process_binary_callback:
                     SingleTask.run(self._process_binary_callback, msg.data)
-            elif msg.type == aiohttp.WSMsgType.CLOSED:
-                logger.warn("receive event CLOSED:", msg, caller=self)
-                SingleTask.run(self.reconnect)
             elif msg.type == aiohttp.WSMsgType.ERROR:
                 logger.error("receive event ERROR:", msg, caller=self)
+                break
             else:
                 logger.warn("unhandled msg:", msg, caller=self)
 
+        # The connection is closed by server, or no pong frame received in time, re-connect immediately.
+        if self._closed or ws is not self._ws:
+            return
+        logger.warn("Websocket connection closed! close code:", ws.close_code, caller=self)
+        self._disconnect_ts = time.monotonic()
+        SingleTask.run(self.reconnect)
+
     async def _check_connection(self, *args, **kwargs) -> None:
         """Check Websocket connection, if connection closed, re-connect immediately."""
         if not self.ws:
@@ -121,7 +237,7 @@ class Websocket:
         Returns:
             If send successfully, return True, otherwise return False.
         """
-        if not self.ws:
+        if not self.connected:
             logger.warn("Websocket connection not connected yet!", caller=self)
             return False
         if isinstance(data, dict):
@@ -135,15 +251,60 @@ class Websocket:
         return True
 
 
+class HttpServerError(Exception):
+    """HTTP 5xx response, the request may be executed by server or not.
+
+    Attributes:
+        code: HTTP response code.
+        text: Response data.
+    """
+
+    def __init__(self, code, text):
+        super(HttpServerError, self).__init__(code, text)
+        self.code = code
+        self.text = text
+
+    def __str__(self):
+        return "HTTP {}: {}".format(self.code, self.text)
+
+
 class AsyncHttpRequests(object):
     """ Asynchronous HTTP Request Client.
+
+    NOTE:
+        Connection pool can be tuned per host by `HTTP` in config file, e.g.
+            "HTTP": {
+                "default": {"limit": 100, "keepalive_timeout": 30},
+                "api.binance.com": {"limit_per_host": 20, "keep_warm_interval": 10}
+            }
+        All the fields can be found in `DEFAULT_SESSION_SETTINGS`.
     """
 
     # Every domain name holds a connection session, for less system resource utilization and faster request speed.
     _SESSIONS = {}  # {"domain-name": session, ... }
 
+    # Default connection pool settings for every domain name.
+    DEFAULT_SESSION_SETTINGS = {
+        "limit": 100,  # Max connection count in pool.
+        "limit_per_host": 0,  # Max connection count to the same endpoint, 0 is no limit.
+        "keepalive_timeout": 30,  # Idle connection keepalive time(seconds).
+        "use_dns_cache": True,  # If cache DNS resolve results.
+        "ttl_dns_cache": 300,  # DNS cache ttl(seconds), `None` to cache forever.
+        "connect_timeout": 5,  # Timeout(seconds) for connecting, include TLS handshake.
+        "read_timeout": None,  # Timeout(seconds) for reading a portion of response data.
+        "prewarm_connections": 2,  # How many connections to be created while pre-warming.
+        "keep_warm_interval": 10  # Send a keep-warm request per interval(seconds) after pre-warmed, 0 to disable.
+    }
+
+    # Latency stats per domain name. `{"domain-name": {"connect": RollingWindow, "request": RollingWindow}, ... }`
+    _STATS = {}
+
+    # Pre-warmed urls. `{"url": keep_warm_task_id, ... }`
+    _WARM_URLS = {}
+
     @classmethod
-    async def fetch(cls, method, url, params=None, body=None, data=None, headers=None, timeout=30, **kwargs):
+    async def fetch(cls, method, url, params=None, body=None, data=None, headers=None, timeout=30, response_hook=None,
+                    **kwargs):
         """ Create a HTTP request.
 
         Args:
@@ -154,6 +315,8 @@ class AsyncHttpRequests(object):
             data: HTTP request body, dict format.
             headers: HTTP request header.
             timeout: HTTP request timeout(seconds), default is 30s.
+            response_hook: A function will be called with the response object before reading response data, e.g.
+                reading rate limit information in response headers, `def response_hook(response): pass`.
 
             kwargs:
                 proxy: HTTP proxy.
@@ -170,6 +333,9 @@ class AsyncHttpRequests(object):
         session = cls._get_session(url)
         if not kwargs.get("proxy"):
             kwargs["proxy"] = config.proxy  # If there is a `HTTP PROXY` Configuration in config file?
+        if not isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=session.timeout.sock_connect,
+                                            sock_read=session.timeout.sock_read)
         try:
             if method == "GET":
                 response = await session.get(url, params=params, headers=headers, timeout=timeout, **kwargs)
@@ -182,6 +348,8 @@ class AsyncHttpRequests(object):
             elif method == "DELETE":
                 response = await session.delete(url, params=params, data=body, json=data, headers=headers,
                                                 timeout=timeout, **kwargs)
+            elif method == "HEAD":
+                response = await session.head(url, params=params, headers=headers, timeout=timeout, **kwargs)
             else:
                 error = "http method error!"
                 return None, None, error
@@ -190,6 +358,12 @@ class AsyncHttpRequests(object):
                          "data:", data, "Error:", e, caller=cls)
             return None, None, e
         code = response.status
+        if response_hook:
+            try:
+                response_hook(response)
+            except Exception as e:
+                logger.error("response hook error! method:", method, "url:", url, "code:", code, "Error:", e,
+                             caller=cls)
         if code not in (200, 201, 202, 203, 204, 205, 206):
             text = await response.text()
             logger.error("method:", method, "url:", url, "headers:", headers, "params:", params, "body:", body,
@@ -202,7 +376,7 @@ class AsyncHttpRequests(object):
             logger.warn("response data is not json format!", "method:", method, "url:", url, "headers:", headers,
                         "params:", params, "body:", body, "data:", data, "code:", code, "result:", result, caller=cls)
         logger.debug("method:", method, "url:", url, "headers:", headers, "params:", params, "body:", body,
-                     "data:", data, "code:", code, "result:", json.dumps(result), caller=cls)
+                     "data:", data, "code:", code, "result:", result, caller=cls)
         return code, result, None
 
     @classmethod
@@ -233,6 +407,78 @@ class AsyncHttpRequests(object):
         result = await cls.fetch("PUT", url, params, body, data, headers, timeout, **kwargs)
         return result
 
+    @classmethod
+    async def prewarm(cls, url, keep_warm=True, **kwargs):
+        """ Pre-warm connections to url's domain, so that the first real request will not pay for TCP + TLS setup.
+
+        Args:
+            url: A cheap url to request, e.g. `https://api.binance.com/api/v3/ping`.
+            keep_warm: If send a request to this url periodically, so that idle connections will not be closed.
+
+            kwargs:
+                proxy: HTTP proxy.
+        """
+        settings = cls._get_settings(url)
+        if keep_warm and settings["keep_warm_interval"] > 0 and url not in cls._WARM_URLS:
+            cls._WARM_URLS[url] = LoopRunTask.register(cls._keep_warm, settings["keep_warm_interval"], url, **kwargs)
+        count = max(settings["prewarm_connections"], 1)
+        results = await asyncio.gather(*[cls.fetch("GET", url, timeout=10, **kwargs) for _ in range(count)])
+        errors = [error for _, _, error in results if error]
+        if errors:
+            logger.warn("pre-warm connections failed! url:", url, "errors:", errors, caller=cls)
+        else:
+            logger.info("pre-warm connections success! url:", url, "count:", count, caller=cls)
+
+    @classmethod
+    async def _keep_warm(cls, url, *args, **kwargs):
+        kwargs.pop("task_id", None)
+        kwargs.pop("heart_beat_count", None)
+        await cls.fetch("GET", url, timeout=10, **kwargs)
+
+    @classmethod
+    def stats(cls):
+        """ Latency stats(millisecond) per domain name.
+
+        Returns:
+            stats: e.g. `{"api.binance.com": {"connect": {"count": 2, "avg": 35.1, ...}, "request": {...}}, ... }`
+        """
+        result = {}
+        for key, s in cls._STATS.items():
+            result[key] = {
+                "connect": s["connect"].summary(scale=1000),
+                "request": s["request"].summary(scale=1000)
+            }
+        return result
+
+    @classmethod
+    async def close(cls):
+        """ Close all the connection sessions."""
+        for task_id in cls._WARM_URLS.values():
+            LoopRunTask.unregister(task_id)
+        cls._WARM_URLS = {}
+        sessions = list(cls._SESSIONS.values())
+        cls._SESSIONS = {}
+        for session in sessions:
+            await session.close()
+
+    @classmethod
+    def _get_settings(cls, url):
+        """ Get connection pool settings for url's domain.
+
+        Args:
+            url: HTTP request url.
+
+        Returns:
+            settings: Connection pool settings.
+        """
+        parsed_url = urlparse(url)
+        settings = copy.copy(cls.DEFAULT_SESSION_SETTINGS)
+        http_settings = getattr(config, "http", None) or {}
+        settings.update(http_settings.get("default", {}))
+        settings.update(http_settings.get(parsed_url.hostname, {}))
+        settings.update(http_settings.get(parsed_url.netloc, {}))
+        return settings
+
     @classmethod
     def _get_session(cls, url):
         """ Get the connection session for url's domain, if no session, create a new.
@@ -246,6 +492,39 @@ class AsyncHttpRequests(object):
         parsed_url = urlparse(url)
         key = parsed_url.netloc or parsed_url.hostname
         if key not in cls._SESSIONS:
-            session = aiohttp.ClientSession()
+            settings = cls._get_settings(url)
+            connector = aiohttp.TCPConnector(limit=settings["limit"], limit_per_host=settings["limit_per_host"],
+                                             keepalive_timeout=settings["keepalive_timeout"],
+                                             use_dns_cache=settings["use_dns_cache"],
+                                             ttl_dns_cache=settings["ttl_dns_cache"])
+            timeout = aiohttp.ClientTimeout(sock_connect=settings["connect_timeout"],
+                                            sock_read=settings["read_timeout"])
+            session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                            trace_configs=[cls._make_trace_config(key)])
             cls._SESSIONS[key] = session
         return cls._SESSIONS[key]
+
+    @classmethod
+    def _make_trace_config(cls, key):
+        """ Create a trace config to collect connect and request latency for a domain name."""
+        stats = {"connect": RollingWindow(), "request": RollingWindow()}
+        cls._STATS[key] = stats
+
+        async def on_request_start(session, ctx, params):
+            ctx.start = time.perf_counter()
+
+        async def on_connection_create_start(session, ctx, params):
+            ctx.connect_start = time.perf_counter()
+
+        async def on_connection_create_end(session, ctx, params):
+            stats["connect"].add(time.perf_counter() - ctx.connect_start)
+
+        async def on_request_end(session, ctx, params):
+            stats["request"].add(time.perf_counter() - ctx.start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
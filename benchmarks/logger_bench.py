@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+
+"""
+Logger microbenchmark.
+
+Measure the cost of a log call when the log level is disabled, and when it is enabled but the message is dropped by
+a handler that never formats it.
+
+Usage:
+    python benchmarks/logger_bench.py
+"""
+
+import os
+import sys
+import timeit
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aioquant.utils import logger
+
+
+class DropHandler(logging.Handler):
+    """Accept every record but never format it."""
+
+    def emit(self, record):
+        pass
+
+
+class FormatHandler(logging.Handler):
+    """Format every record but never write it."""
+
+    def emit(self, record):
+        self.format(record)
+
+
+class Caller:
+
+    def __init__(self):
+        self.orderbook = {
+            "asks": [["%.8f" % (100 + i * 0.01), "1.00000000"] for i in range(20)],
+            "bids": [["%.8f" % (100 - i * 0.01), "1.00000000"] for i in range(20)]
+        }
+
+    def log_debug(self):
+        logger.debug("symbol:", "BTC/USDT", "orderbook:", self.orderbook, caller=self)
+
+    def log_info(self):
+        logger.info("symbol:", "BTC/USDT", "orderbook:", self.orderbook, caller=self)
+
+
+def bench(name, func, number=200000):
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("{:<40} {:>10.1f} ns/call".format(name, cost * 1e9))
+
+
+def main():
+    caller = Caller()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+
+    root.handlers = [DropHandler()]
+    bench("debug (level disabled)", caller.log_debug)
+    bench("info (enabled, not formatted)", caller.log_info)
+
+    root.handlers = [FormatHandler()]
+    bench("info (enabled, formatted)", caller.log_info, number=20000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding:utf-8 -*-
+
+"""
+Event loop throughput benchmark.
+
+Run the Binance market server against a local Websocket server which pushes combined stream messages(depth20 and
+trade) as fast as possible, and measure how many messages per second are received, parsed and published, with the
+default `asyncio` loop and with `uvloop`(skipped if not installed). Published events are counted instead of sent to
+RabbitMQ.
+
+Usage:
+    python benchmarks/loop_bench.py [--messages 100000]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aioquant import quant
+from aioquant.configure import config
+from aioquant.utils.web import Websocket
+from aioquant.markets.binance import Binance
+
+SYMBOLS = ["BTC/USDT", "ETH/USDT", "EOS/USDT", "LTC/USDT"]
+
+
+def make_messages():
+    """One depth20 and one trade message per symbol."""
+    messages = []
+    for symbol in SYMBOLS:
+        s = symbol.replace("/", "").lower()
+        levels = [["%.2f" % (10000 + i), "%.6f" % (1 + i / 10)] for i in range(20)]
+        messages.append(json.dumps({
+            "stream": s + "@depth20",
+            "data": {"lastUpdateId": 1, "bids": levels, "asks": levels}
+        }))
+        messages.append(json.dumps({
+            "stream": s + "@trade",
+            "data": {"e": "trade", "E": 1, "s": s.upper(), "t": 1, "p": "10000.00", "q": "0.01", "T": 1, "m": True}
+        }))
+    return messages
+
+
+class CountingEventCenter:
+    """Count published events instead of sending them to RabbitMQ."""
+
+    def __init__(self, total):
+        self.total = total
+        self.count = 0
+        self.done = asyncio.Event()
+
+    async def publish(self, event):
+        self.count += 1
+        if self.count >= self.total:
+            self.done.set()
+
+
+async def run(total):
+    messages = make_messages()
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for i in range(total):
+            await ws.send_str(messages[i % len(messages)])
+        await ws.receive()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/stream", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    quant.event_center = CountingEventCenter(total)
+    start = time.perf_counter()
+    Binance(platform="binance", wss="ws://127.0.0.1:%d" % port, symbols=SYMBOLS, channels=["orderbook", "trade"])
+    await quant.event_center.done.wait()
+    cost = time.perf_counter() - start
+
+    await Websocket.close_all()
+    await runner.cleanup()
+    return cost
+
+
+def bench(name, loop, total):
+    asyncio.set_event_loop(loop)
+    try:
+        cost = loop.run_until_complete(run(total))
+    finally:
+        loop.close()
+    print("{:<10} {:>10} messages {:>8.3f}s {:>12.0f} msg/s".format(name, total, cost, total / cost))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    config.loads(None)
+    bench("asyncio", asyncio.new_event_loop(), args.messages)
+    try:
+        import uvloop
+    except ImportError:
+        print("uvloop is not installed, skipped.")
+        return
+    bench("uvloop", uvloop.new_event_loop(), args.messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding:utf-8 -*-
+
+"""
+Request signing microbenchmark.
+
+Measure the cost of building and signing a create order request, the way the REST API clients did before(new HMAC
+object per request, timestamp built from two `time.time()` calls), and with a pre-keyed `HmacSigner`.
+
+Usage:
+    python benchmarks/signer_bench.py
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import hashlib
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aioquant.utils.signer import HmacSigner, make_query
+
+SECRET_KEY = "NhqPtmdSJYdKjVHjA7PZj4Mge3R5YNiP1e3UZjInClVN65XAbvqqM6A7H5fATj0j"
+
+BINANCE_ORDER = {
+    "symbol": "BTCUSDT",
+    "side": "BUY",
+    "type": "LIMIT",
+    "timeInForce": "GTC",
+    "quantity": "0.01000000",
+    "price": "10000.00000000",
+    "recvWindow": "5000",
+    "newClientOrderId": "6f6b5a2e0d4c11eb8c1e0242ac110002",
+    "timestamp": 0
+}
+
+OKEX_ORDER = {
+    "side": "buy",
+    "instrument_id": "BTC-USDT",
+    "margin_trading": 1,
+    "type": "limit",
+    "price": "10000.0",
+    "size": "0.01",
+    "client_oid": "6f6b5a2e0d4c11eb8c1e0242ac110002"
+}
+
+
+def binance_old():
+    data = dict(BINANCE_ORDER, timestamp=int(round(time.time() * 1000)))
+    query = "&".join(["=".join([str(k), str(v)]) for k, v in data.items()])
+    signature = hmac.new(SECRET_KEY.encode(), query.encode(), hashlib.sha256).hexdigest()
+    query += "&signature={s}".format(s=signature)
+    return query
+
+
+binance_signer = HmacSigner(SECRET_KEY)
+
+
+def binance_new():
+    data = dict(BINANCE_ORDER, timestamp=binance_signer.timestamp_ms())
+    query = make_query(data)
+    query += "&signature=" + binance_signer.sign(query)
+    return query
+
+
+def okex_old():
+    timestamp = str(time.time()).split(".")[0] + "." + str(time.time()).split(".")[1][:3]
+    body = json.dumps(OKEX_ORDER)
+    message = str(timestamp) + str.upper("POST") + "/api/spot/v3/orders" + str(body)
+    mac = hmac.new(bytes(SECRET_KEY, encoding="utf8"), bytes(message, encoding="utf-8"), digestmod="sha256")
+    sign = base64.b64encode(mac.digest()).decode()
+    return timestamp, sign
+
+
+okex_signer = HmacSigner(SECRET_KEY, output="base64")
+
+
+def okex_new():
+    timestamp = okex_signer.timestamp_str()
+    body = json.dumps(OKEX_ORDER)
+    sign = okex_signer.sign(timestamp + "POST" + "/api/spot/v3/orders" + body)
+    return timestamp, sign
+
+
+def bench(name, func, number=100000):
+    cost = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("{:<40} {:>10.2f} us/order".format(name, cost * 1e6))
+
+
+def main():
+    bench("binance (hmac.new per request)", binance_old)
+    bench("binance (HmacSigner)", binance_new)
+    bench("okex (hmac.new per request)", okex_old)
+    bench("okex (HmacSigner)", okex_new)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ import sys
 
 from aioquant import const
 from aioquant.configure import config
-from aioquant import quant
+from aioquant import runner
 
 def initialize():
     """Initialize Server."""
@@ -32,7 +32,7 @@ def initialize():
 
 def main():
     config_file = sys.argv[1]  # config file, e.g. market.json.
-    quant.start(config_file, initialize)
+    runner.start(config_file, initialize)  # Symbols are sharded across worker processes if `RUNNER` configured.
 
 
 if __name__ == "__main__":
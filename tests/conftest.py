@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+
+"""
+Shared test fixtures.
+"""
+
+import asyncio
+
+import pytest
+
+from aioquant import trade as trade_module
+from aioquant.platform import binance, okex
+from aioquant.utils.web import AsyncHttpRequests
+
+
+@pytest.fixture
+def run():
+    """Run coroutines in a new event loop, the pending tasks are cancelled and the loop is closed after the test."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop.run_until_complete
+    all_tasks = asyncio.all_tasks if hasattr(asyncio, "all_tasks") else asyncio.Task.all_tasks
+    pending = [task for task in all_tasks(loop) if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.fixture
+def new_trade(run, monkeypatch):
+    """Create a Trade object by its constructor, the REST API client is replaced by the given fake one, and no HTTP
+    or Websocket connection will be created.
+
+    Usage: `trade = new_trade("binance", rest_api, create_retry_deadline=1)`
+    """
+    async def prewarm(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(AsyncHttpRequests, "prewarm", prewarm)
+    monkeypatch.setattr(binance.BinanceUserStream, "register", classmethod(lambda cls, trade: None))
+    monkeypatch.setattr(okex.OKExUserStream, "register", classmethod(lambda cls, trade: None))
+    monkeypatch.setattr(trade_module, "TRADES", [])
+    monkeypatch.setattr(trade_module, "ORDER_LATENCIES", {})
+
+    def new(platform, rest_api, **kwargs):
+        monkeypatch.setattr(binance, "BinanceRestAPI", lambda *args, **kw: rest_api)
+        monkeypatch.setattr(okex, "OKExRestAPI", lambda *args, **kw: rest_api)
+        params = {
+            "platform": platform,
+            "strategy": "test",
+            "symbol": "BTC/USDT",
+            "account": "test@gmail.com",
+            "access_key": "ak",
+            "secret_key": "sk",
+            "passphrase": "pp"
+        }
+        params.update(kwargs)
+        return trade_module.Trade(**params)
+    return new
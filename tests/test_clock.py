@@ -0,0 +1,99 @@
+# -*- coding:utf-8 -*-
+
+"""
+Exchange server clock synchronization.
+"""
+
+import time
+import asyncio
+
+from aioquant.utils import ratelimit
+from aioquant.utils import clock as clock_module
+from aioquant.utils.clock import ServerClock
+from aioquant.utils.web import AsyncHttpRequests
+from aioquant.platform import binance, okex
+
+
+class FakeServer:
+    """Server clock is 2 seconds ahead, the response is delayed by `delays` in turn, so that the middle of the round
+    trip is later than the server sampling time.
+    """
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+
+    async def fetch(self):
+        if not self.delays:
+            return None
+        ts = time.time() + 2
+        await asyncio.sleep(self.delays.pop(0))
+        return ts
+
+
+def test_offset_estimated_by_minimum_rtt(run):
+    async def main():
+        server = FakeServer([0.1, 0, 0.06])
+        clock = ServerClock("fake", server.fetch, interval=100, window=3)
+        while not clock.synced:  # The first sync is started on creation.
+            await asyncio.sleep(0.01)
+        for _ in range(2):
+            await clock.sync()
+        clock.close()
+
+        assert clock.synced
+        assert clock.stats["samples"] == 3
+        assert clock.rtt < 0.03
+        assert abs(clock.offset - 2) < 0.015
+        assert abs(clock.time() - time.time() - 2) < 0.015
+        assert clock.jitter > 0.01
+
+        # Failed fetch keeps the estimate.
+        offset = clock.offset
+        await clock.sync()
+        assert clock.offset == offset
+        assert clock.stats["samples"] == 3
+    run(main())
+
+
+def test_sliding_window(run):
+    async def main():
+        server = FakeServer([0, 0.04, 0.04, 0.04])
+        clock = ServerClock("fake", server.fetch, interval=100, window=2)
+        while not clock.synced:  # The first sync is started on creation.
+            await asyncio.sleep(0.01)
+        for _ in range(3):
+            await clock.sync()
+        clock.close()
+        # The best sample has been slid out of window.
+        assert clock.stats["samples"] == 2
+        assert clock.rtt >= 0.04
+        assert abs(clock.offset - 1.98) < 0.015
+    run(main())
+
+
+def test_fetch_server_time_not_queued_in_rate_limiter(run, monkeypatch):
+    requests = []
+
+    async def fetch(method, url, *args, **kwargs):
+        requests.append(url)
+        if url.endswith("/api/v1/time"):
+            return 200, {"serverTime": time.time() * 1000 + 2000}, None
+        return 200, {"epoch": str(time.time() + 2)}, None
+
+    monkeypatch.setattr(clock_module, "SERVER_CLOCKS", {})
+    monkeypatch.setattr(ratelimit, "RATE_LIMITERS", {})
+    monkeypatch.setattr(AsyncHttpRequests, "fetch", fetch)
+
+    async def main():
+        clocks = []
+        for rest_api in (binance.BinanceRestAPI("https://binance", "ak", "sk"),
+                         okex.OKExRestAPI("https://okex", "ak", "sk", "pp")):
+            rest_api.rate_limiter.pause(10)  # All requests are waiting in rate limiter queue.
+            clocks.append(rest_api.clock)
+        await asyncio.wait_for(asyncio.gather(*[c.sync() for c in clocks]), 1)
+        for c in clocks:
+            c.close()
+            assert c.rtt < 0.01
+            assert abs(c.offset - 2) < 0.01
+        assert len(requests) == 4
+    run(main())
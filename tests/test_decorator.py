@@ -0,0 +1,115 @@
+# -*- coding:utf-8 -*-
+
+"""
+Decorators.
+"""
+
+import time
+import asyncio
+
+from aioquant.utils.decorator import async_single_flight, async_offload
+
+
+class FakeRestAPI:
+
+    def __init__(self, flight_id=None):
+        self.single_flight_id = flight_id
+        self.calls = 0
+
+    @async_single_flight()
+    async def get_open_orders(self, symbol, limit=100):
+        self.calls += 1
+        calls = self.calls
+        await asyncio.sleep(0.01)
+        return [symbol, limit, calls], None
+
+    @async_single_flight(ttl=0.05)
+    async def get_exchange_info(self):
+        self.calls += 1
+        return {"calls": self.calls}, None
+
+
+def test_single_flight_share_normalized_arguments(run):
+    async def main():
+        api = FakeRestAPI()
+        results = await asyncio.gather(api.get_open_orders("BTCUSDT"), api.get_open_orders(symbol="BTCUSDT"),
+                                       api.get_open_orders("BTCUSDT", 100), api.get_open_orders("BTCUSDT", limit=10))
+        assert api.calls == 2
+        assert results[0] is results[1] is results[2]
+        assert results[3][0] == ["BTCUSDT", 10, 2]
+
+        # Not in flight any more.
+        await api.get_open_orders("BTCUSDT")
+        assert api.calls == 3
+    run(main())
+
+
+def test_single_flight_share_by_flight_id(run):
+    async def main():
+        a, b = FakeRestAPI("host:ak"), FakeRestAPI("host:ak")
+        await asyncio.gather(a.get_open_orders("BTCUSDT"), b.get_open_orders("BTCUSDT"))
+        assert a.calls + b.calls == 1
+    run(main())
+
+
+def test_single_flight_bypass(run):
+    async def main():
+        api = FakeRestAPI()
+        first = asyncio.ensure_future(api.get_open_orders("BTCUSDT"))
+        await asyncio.sleep(0)
+        fresh = asyncio.ensure_future(api.get_open_orders("BTCUSDT", single_flight=False))
+        await asyncio.sleep(0)
+        shared = asyncio.ensure_future(api.get_open_orders("BTCUSDT"))
+        await asyncio.gather(first, fresh, shared)
+        assert api.calls == 2
+        assert first.result()[0][2] == 1
+        assert fresh.result() is shared.result()
+    run(main())
+
+
+def test_single_flight_ttl(run):
+    async def main():
+        api = FakeRestAPI()
+        r1 = await api.get_exchange_info()
+        r2 = await api.get_exchange_info()
+        assert r1 is r2
+        await asyncio.sleep(0.06)
+        r3 = await api.get_exchange_info()
+        assert r3[0]["calls"] == 2
+    run(main())
+
+
+def test_offload_latest_only(run):
+    calls = []
+
+    @async_offload(latest_only=True, key=lambda symbol, n: symbol)
+    def compute(symbol, n):
+        calls.append((symbol, n))
+        time.sleep(0.02)
+        return n
+
+    async def main():
+        futures = [asyncio.ensure_future(compute("BTCUSDT", n)) for n in range(4)]
+        futures.append(asyncio.ensure_future(compute("ETHUSDT", 0)))
+        results = await asyncio.gather(*futures)
+        # The running one and the latest waiting one are computed, the stale waiting ones are dropped.
+        assert results == [0, None, None, 3, 0]
+        assert sorted(calls) == [("BTCUSDT", 0), ("BTCUSDT", 3), ("ETHUSDT", 0)]
+    run(main())
+
+
+def test_offload_cancel_waiter(run):
+    @async_offload()
+    def compute(n):
+        time.sleep(0.02)
+        return n
+
+    async def main():
+        first = asyncio.ensure_future(compute(1))
+        second = asyncio.ensure_future(compute(2))
+        await asyncio.sleep(0)
+        second.cancel()
+        assert await first == 1
+        # Cancelled waiter does not hold the slot.
+        assert await asyncio.wait_for(compute(3), 1) == 3
+    run(main())
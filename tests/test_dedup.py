@@ -0,0 +1,37 @@
+# -*- coding:utf-8 -*-
+
+"""
+First arrival deduplicator.
+"""
+
+from aioquant.utils.dedup import FirstArrival
+
+
+def test_first_arrival():
+    dedup = FirstArrival(2)
+    assert dedup.first(1, 0)
+    assert not dedup.first(1, 1)
+    assert dedup.first(2, 1)
+    assert not dedup.first(2, 0)
+    assert dedup.first(3, 0)
+
+    stats = dedup.stats
+    assert stats[0]["win"] == 2
+    assert stats[0]["lose"] == 1
+    assert stats[0]["win_rate"] == round(2 / 3, 4)
+    assert stats[1]["win"] == 1
+    assert stats[1]["lose"] == 1
+    assert stats[1]["avg_delay_ms"] >= 0
+
+
+def test_capacity():
+    dedup = FirstArrival(1, capacity=2)
+    for key in (1, 2, 3):
+        assert dedup.first(key)
+    # The oldest key is forgotten.
+    assert dedup.first(1)
+    assert not dedup.first(3)
+
+
+def test_no_message():
+    assert FirstArrival(2).stats == [{"win": 0, "lose": 0, "win_rate": 0, "avg_delay_ms": 0}] * 2
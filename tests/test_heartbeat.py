@@ -0,0 +1,75 @@
+# -*- coding:utf-8 -*-
+
+"""
+Server heartbeat, and the scheduler of loop run tasks.
+"""
+
+import asyncio
+
+from aioquant.heartbeat import HeartBeat
+
+
+def test_float_interval_without_drift(run):
+    async def main():
+        hb = HeartBeat()
+        loop = asyncio.get_event_loop()
+        times = []
+
+        async def tick(*args, **kwargs):
+            times.append(loop.time())
+            await asyncio.sleep(0.005)  # Runtime should not delay the next deadline.
+
+        hb.register(tick, 0.02)
+        start = loop.time()
+        hb.ticker()
+        await asyncio.sleep(0.21)
+        hb.stop()
+        assert 9 <= len(times) <= 11
+        # Deadlines are `start + n * interval`.
+        assert abs(times[-1] - start - 0.02 * len(times)) < 0.015
+    run(main())
+
+
+def test_skip_overrun_and_count_failures(run):
+    async def main():
+        hb = HeartBeat()
+
+        async def slow(*args, **kwargs):
+            await asyncio.sleep(0.05)
+
+        async def fail(*args, **kwargs):
+            raise ValueError("error")
+
+        slow_id = hb.register(slow, 0.02)
+        fail_id = hb.register(fail, 0.02)
+        hb.ticker()
+        await asyncio.sleep(0.13)
+        hb.stop()
+        stats = hb.stats()
+        assert 2 <= stats[slow_id]["runs"] <= 3
+        assert stats[slow_id]["overruns"] >= 3
+        assert stats[fail_id]["runs"] == stats[fail_id]["failures"] >= 5
+        await asyncio.sleep(0.06)
+    run(main())
+
+
+def test_register_and_unregister_while_running(run):
+    async def main():
+        hb = HeartBeat()
+        counts = {"a": 0, "b": 0}
+
+        async def count(name, **kwargs):
+            counts[name] += 1
+
+        a = hb.register(count, 0.02, "a")
+        hb.ticker()
+        await asyncio.sleep(0.05)
+        hb.register(count, 0.01, "b")  # Nearer deadline than the scheduled timer.
+        hb.unregister(a)
+        n = counts["a"]
+        await asyncio.sleep(0.055)
+        hb.stop()
+        assert n == 2
+        assert counts["a"] == n
+        assert 4 <= counts["b"] <= 6
+    run(main())
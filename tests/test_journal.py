@@ -0,0 +1,148 @@
+# -*- coding:utf-8 -*-
+
+"""
+Binary event journal.
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import threading
+import subprocess
+
+from aioquant.order import Order
+from aioquant.utils import journal as journal_module
+from aioquant.utils.journal import Journal, JournalReader, RECORD_ORDER, RECORD_ERROR, MAGIC
+
+
+def new_journal(tmp_path, **kwargs):
+    j = Journal()
+    j.initialize(str(tmp_path), **kwargs)
+    return j
+
+
+def journal_file(tmp_path):
+    names = [n for n in os.listdir(str(tmp_path)) if n.endswith(".bin")]
+    assert len(names) == 1
+    return os.path.join(str(tmp_path), names[0])
+
+
+def test_write_read_round_trip(tmp_path):
+    j = new_journal(tmp_path, index_interval=100)
+    for i in range(100):
+        j.order(Order(platform="binance", account="acc", order_id=str(i), client_order_id="c%d" % i,
+                      symbol="BTC/USDT" if i % 2 else "ETH/USDT", action="BUY", price="1.5", quantity="2",
+                      ctime=1000 + i, utime=2000 + i))
+    j.error("binance", "BTC/USDT", "timeout", order_id="7")
+    j.flush()
+    j.close()
+
+    filename = journal_file(tmp_path)
+    assert os.path.getsize(filename[:-4] + ".idx") > 0
+    reader = JournalReader(filename)
+    records = list(reader.read())
+    assert len(records) == 101
+    first = records[0]
+    assert first["type"] == "order"
+    assert first["order_id"] == "0"
+    assert first["symbol"] == "ETH/USDT"
+    assert first["client_order_id"] == "c0"
+    assert first["price"] == 1.5
+    assert first["ctime"] == 1000
+    assert records[-1] == {"type": "error", "timestamp": records[-1]["timestamp"], "symbol": "BTC/USDT",
+                           "order_id": "7", "platform": "binance", "error": "timeout"}
+
+    # Filters.
+    assert [r["order_id"] for r in reader.read(order_id="7")] == ["7", "7"]
+    assert len(list(reader.read(symbol="BTC/USDT", record_types=[RECORD_ORDER]))) == 50
+    assert len(list(reader.read(record_types=[RECORD_ERROR]))) == 1
+
+    # Seek by index.
+    ts = records[60]["timestamp"]
+    assert list(reader.read(start=ts)) == [r for r in records if r["timestamp"] >= ts]
+    assert list(reader.read(end=ts)) == [r for r in records if r["timestamp"] < ts]
+
+
+def test_wall_clock_step_backwards(tmp_path, monkeypatch):
+    base = int(time.mktime((2019, 6, 1, 12, 0, 0, 0, 0, -1))) * 1000
+    stamps = [base, base + 1000, base + 2000, base + 500, base + 600, base + 3000]
+    clock = iter(stamps)
+    monkeypatch.setattr(journal_module, "time", types.SimpleNamespace(time=lambda: next(clock) / 1000,
+                                                                      mktime=time.mktime))
+    j = new_journal(tmp_path, index_interval=1)
+    for i in range(len(stamps)):
+        j.error("binance", "BTC/USDT", str(i))
+    j.flush()
+    j.close()
+
+    reader = JournalReader(journal_file(tmp_path))
+    assert [r["timestamp"] for r in reader.read()] == stamps
+    assert [r["error"] for r in reader.read(end=base + 1500)] == ["0", "1", "3", "4"]
+    assert [r["error"] for r in reader.read(start=base + 550)] == ["1", "2", "4", "5"]
+    assert [r["error"] for r in reader.read(start=base + 2500)] == ["5"]
+
+
+def test_resync_after_torn_record(tmp_path):
+    j = new_journal(tmp_path)
+    for i in range(3):
+        j.error("binance", "BTC/USDT", "error %d" % i)
+    j.flush()
+    j.close()
+
+    filename = journal_file(tmp_path)
+    with open(filename, "rb") as f:
+        data = f.read()
+    records = data[len(MAGIC):]
+    size = len(records) // 3
+
+    # The second record is torn, and the last one is truncated while writing.
+    with open(filename, "wb") as f:
+        f.write(MAGIC + records[:size] + records[size: size + 10] + records[2 * size:] + records[:size - 3])
+    errors = [r["error"] for r in JournalReader(filename).read()]
+    assert errors == ["error 0", "error 2"]
+
+
+def test_truncate_string_at_character_boundary(tmp_path):
+    j = new_journal(tmp_path)
+    j.error("binance", "BTC/USDT", "a" + "中" * 30000)
+    j.flush()
+    j.close()
+    error = list(JournalReader(journal_file(tmp_path)).read())[0]["error"]
+    assert error == "a" + "中" * 21844
+
+
+def test_dropped_when_queue_full(tmp_path, monkeypatch):
+    # Block the writer thread while opening journal file.
+    unblock = threading.Event()
+
+    def blocking_open(*args, **kwargs):
+        unblock.wait(5)
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(journal_module, "open", blocking_open, raising=False)
+    j = new_journal(tmp_path, queue_size=1)
+    j.error("binance", "BTC/USDT", "first")
+    time.sleep(0.05)  # Taken by writer thread, blocked.
+    j.error("binance", "BTC/USDT", "queued")
+    j.error("binance", "BTC/USDT", "dropped")
+    assert j.dropped == 1
+
+    unblock.set()
+    j.flush()
+    j.close()
+    errors = [r["error"] for r in JournalReader(journal_file(tmp_path)).read()]
+    assert errors == ["first", "queued"]
+
+
+def test_cli(tmp_path):
+    j = new_journal(tmp_path)
+    j.error("binance", "BTC/USDT", "timeout")
+    j.flush()
+    j.close()
+    output = subprocess.check_output([sys.executable, "-W", "error", "-m", "aioquant.utils.journal_cli",
+                                      journal_file(tmp_path), "--type", "error"],
+                                     cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    records = [json.loads(line) for line in output.decode().splitlines()]
+    assert [r["error"] for r in records] == ["timeout"]
@@ -0,0 +1,112 @@
+# -*- coding:utf-8 -*-
+
+"""
+Asynchronous log handler.
+"""
+
+import time
+import logging
+import threading
+
+import pytest
+
+from aioquant.utils import logger
+from aioquant.utils.logger import AsyncLogHandler
+
+
+class BlockingHandler(logging.Handler):
+    """Record messages, block writing until released."""
+
+    batching = False
+
+    def __init__(self):
+        super(BlockingHandler, self).__init__()
+        self.unblock = threading.Event()
+        self.messages = []
+
+    def handle(self, record):
+        self.unblock.wait(5)
+        self.messages.append(record.getMessage())
+
+
+def new_record(msg):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, msg, None, None)
+
+
+def test_drop_and_report_when_queue_full():
+    handler = BlockingHandler()
+    async_handler = AsyncLogHandler(handler, queue_size=1)
+    async_handler.emit(new_record("first"))
+    time.sleep(0.05)  # Taken by writer thread, blocked.
+    for i in range(5):
+        async_handler.emit(new_record("msg {}".format(i)))
+    assert async_handler.dropped == 4
+
+    handler.unblock.set()
+    async_handler.flush()
+    # Reported after the batch being written while dropping.
+    assert handler.messages[0] == "first"
+    assert "dropped 4 log records" in handler.messages[1]
+    assert handler.messages[2] == "msg 0"
+    assert async_handler.dropped == 0
+    async_handler.close()
+
+
+class CountRepr:
+    """Count how many times it's formatted."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __repr__(self):
+        self.count += 1
+        return "<CountRepr>"
+
+
+class RecordHandler(logging.Handler):
+    """Keep log records without formatting them."""
+
+    def __init__(self):
+        super(RecordHandler, self).__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records(monkeypatch):
+    """Log records of `aioquant.utils.logger` at INFO level, not propagated to pytest's handlers which format them."""
+    handler = RecordHandler()
+    test_logger = logging.Logger("test", logging.INFO)
+    test_logger.propagate = False
+    test_logger.addHandler(handler)
+    monkeypatch.setattr(logger, "_logger", test_logger)
+    return handler.records
+
+
+def test_disabled_level_not_formatted(records):
+    obj = CountRepr()
+    logger.debug("obj:", obj, caller=obj)
+    assert records == []
+    assert obj.count == 0
+
+
+def test_message_formatted_lazily_once(records):
+    obj = CountRepr()
+
+    class Caller:
+        def method(self):
+            logger.info("obj:", obj, 1, {"a": 1}, caller=self)
+
+    Caller().method()
+    assert len(records) == 1
+    assert obj.count == 0
+    assert records[0].levelno == logging.INFO
+    assert records[0].getMessage() == "[-] [Caller.method] obj: <CountRepr> 1 {'a': 1} "
+    assert records[0].getMessage() == "[-] [Caller.method] obj: <CountRepr> 1 {'a': 1} "
+    assert obj.count == 1
+
+    logger.error("failed!")
+    assert [r.getMessage() for r in records[1:]] == ["*" * 60, "[-] [.test_message_formatted_lazily_once] failed! ",
+                                                     "*" * 60]
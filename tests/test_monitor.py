@@ -0,0 +1,66 @@
+# -*- coding:utf-8 -*-
+
+"""
+Event loop lag and slow callback monitor.
+"""
+
+import time
+import asyncio
+
+from aioquant.utils.monitor import LoopMonitor
+
+
+def blocking_callback():
+    time.sleep(0.05)
+
+
+async def blocking_coroutine():
+    time.sleep(0.05)
+
+
+def test_lag_and_slow_callbacks(run):
+    origin_run = asyncio.Handle._run
+    monitor = LoopMonitor()
+
+    async def main():
+        monitor.initialize(probe_interval=0.005, slow_callback_duration=0.03)
+        assert monitor.enabled
+        await asyncio.sleep(0.05)
+        asyncio.get_event_loop().call_soon(blocking_callback)
+        await asyncio.sleep(0.05)
+        await asyncio.get_event_loop().create_task(blocking_coroutine())
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    try:
+        run(main())
+    finally:
+        monitor.stop()
+    assert not monitor.enabled
+    assert asyncio.Handle._run is origin_run
+
+    stats = monitor.stats()
+    assert stats["lag"]["count"] > 5
+    assert stats["lag"]["max"] >= 40
+    assert stats["lag"]["p50"] < 40
+    slow = stats["slow_callbacks"]
+    assert set(slow) == {"blocking_callback", "blocking_coroutine"}
+    assert slow["blocking_callback"]["count"] == 1
+    assert slow["blocking_callback"]["max"] >= 50
+
+
+def test_lag_probe_only(run):
+    origin_run = asyncio.Handle._run
+    monitor = LoopMonitor()
+
+    async def main():
+        monitor.initialize(probe_interval=0.005, slow_callback_duration=0)
+        assert asyncio.Handle._run is origin_run
+        asyncio.get_event_loop().call_soon(blocking_callback)
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    run(main())
+    stats = monitor.stats()
+    assert stats["lag"]["max"] >= 40
+    assert stats["slow_callbacks"] == {}
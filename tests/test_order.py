@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+
+"""
+Local order store.
+"""
+
+from aioquant.order import Order, OrderStore
+from aioquant.order import ORDER_ACTION_BUY, ORDER_ACTION_SELL
+from aioquant.order import ORDER_STATUS_NONE, ORDER_STATUS_SUBMITTED, ORDER_STATUS_FILLED, ORDER_STATUS_CANCELED
+
+
+def new_order(order_id="1", client_order_id="c1", action=ORDER_ACTION_BUY, status=ORDER_STATUS_SUBMITTED):
+    return Order(order_id=order_id, client_order_id=client_order_id, action=action, price="1", quantity="2",
+                 status=status)
+
+
+def test_update_never_modify_order_passed_in():
+    store = OrderStore()
+    order = new_order()
+    snapshot = store.update(order, remain=1)
+    assert snapshot is not order
+    assert order.remain == "2"
+    assert snapshot.remain == 1
+
+    # Update by a stale or detached object, the new snapshot is copied from the stored one.
+    detached = new_order()
+    new = store.update(detached, status=ORDER_STATUS_FILLED)
+    assert detached.status == ORDER_STATUS_SUBMITTED
+    assert snapshot.status == ORDER_STATUS_SUBMITTED
+    assert new.remain == 1
+    assert new.status == ORDER_STATUS_FILLED
+
+
+def test_indexes():
+    store = OrderStore()
+    buy = store.update(new_order("1", "c1", ORDER_ACTION_BUY))
+    sell = store.update(new_order("2", "c2", ORDER_ACTION_SELL))
+    assert len(store) == 2
+    assert dict(store.open_orders) == {"1": buy, "2": sell}
+    assert dict(store.by_action(ORDER_ACTION_BUY)) == {"1": buy}
+    assert dict(store.by_status(ORDER_STATUS_SUBMITTED)) == {"1": buy, "2": sell}
+    assert store.get_by_client_order_id("c2") is sell
+
+    canceled = store.update(sell, status=ORDER_STATUS_CANCELED)
+    assert dict(store.open_orders) == {"1": buy}
+    assert dict(store.by_action(ORDER_ACTION_SELL)) == {}
+    assert dict(store.by_status(ORDER_STATUS_CANCELED)) == {"2": canceled}
+    assert store.get("2") is canceled
+    assert "2" in store
+
+
+def test_pending_order_keyed_by_client_order_id():
+    store = OrderStore()
+    pending = store.update(new_order(None, "c1", status=ORDER_STATUS_NONE))
+    assert store.get("c1") is pending
+
+    acked = store.update(pending, order_id="1", status=ORDER_STATUS_SUBMITTED)
+    assert store.get("c1") is None
+    assert store.get("1") is acked
+    assert store.get_by_client_order_id("c1") is acked
+    assert dict(store.by_status(ORDER_STATUS_NONE)) == {}
+
+
+def test_retention():
+    store = OrderStore(retention=2)
+    for i in range(3):
+        store.update(new_order(str(i), "c%d" % i), status=ORDER_STATUS_FILLED)
+    assert list(store.by_status(ORDER_STATUS_FILLED)) == ["1", "2"]
+    assert store.get("0") is None
+    assert store.get_by_client_order_id("c0") is None
+    assert len(store) == 0
+
+    store = OrderStore(retention=0)
+    order = store.update(new_order())
+    store.update(order, status=ORDER_STATUS_FILLED)
+    assert store.get("1") is None
+    assert dict(store.by_status(ORDER_STATUS_FILLED)) == {}
+    assert store.get_by_client_order_id("c1") is None
@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+
+"""
+Framework startup and shutdown.
+"""
+
+import sys
+import time
+import asyncio
+import threading
+
+from aioquant.quant import AIOQuant
+from aioquant.configure import config
+from aioquant.utils import logger
+from aioquant.utils.journal import journal
+
+
+def test_shutdown_flush_bounded(run, monkeypatch):
+    flushed = []
+
+    def slow_flush(*args, **kwargs):
+        flushed.append(threading.current_thread().name)
+        time.sleep(2)
+
+    monkeypatch.setattr(config, "shutdown", {"timeout": 0.2, "flush_timeout": 0.2})
+    monkeypatch.setattr(logger, "flush", slow_flush)
+    monkeypatch.setattr(journal, "flush", slow_flush)
+
+    quant = AIOQuant()
+    quant.loop = asyncio.get_event_loop()
+    quant.loop.create_task(quant.shutdown())
+    start = time.time()
+    quant.loop.run_forever()
+    assert time.time() - start < 1
+    assert flushed == ["ShutdownFlush", "ShutdownFlush"]
+
+
+class FakeUvloop:
+
+    class EventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+        pass
+
+
+def get_event_loop(monkeypatch, loop_name, uvloop):
+    """Get event loop with config `LOOP`, returns (loop, policies set, warnings)."""
+    policies = []
+    warnings = []
+    monkeypatch.setattr(config, "loop", loop_name)
+    monkeypatch.setitem(sys.modules, "uvloop", uvloop)
+    monkeypatch.setattr(asyncio, "set_event_loop_policy", policies.append)
+    monkeypatch.setattr(logger, "warn", lambda *args, **kwargs: warnings.append(args))
+    return AIOQuant()._get_event_loop(), policies, warnings
+
+
+def test_event_loop_asyncio(run, monkeypatch):
+    loop, policies, warnings = get_event_loop(monkeypatch, "asyncio", FakeUvloop)
+    assert loop is asyncio.get_event_loop()
+    assert policies == []
+    assert warnings == []
+
+
+def test_event_loop_uvloop(run, monkeypatch):
+    _, policies, warnings = get_event_loop(monkeypatch, "uvloop", FakeUvloop)
+    assert len(policies) == 1 and isinstance(policies[0], FakeUvloop.EventLoopPolicy)
+    assert warnings == []
+
+
+def test_event_loop_fallback(run, monkeypatch):
+    # `import uvloop` raises ImportError if it's None in `sys.modules`.
+    loop, policies, warnings = get_event_loop(monkeypatch, "uvloop", None)
+    assert loop is asyncio.get_event_loop()
+    assert policies == []
+    assert "uvloop is not installed" in warnings[0][0]
+
+    loop, policies, warnings = get_event_loop(monkeypatch, "tokio", FakeUvloop)
+    assert loop is asyncio.get_event_loop()
+    assert policies == []
+    assert warnings[0][:2] == ("loop error:", "tokio")
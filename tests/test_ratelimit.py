@@ -0,0 +1,84 @@
+# -*- coding:utf-8 -*-
+
+"""
+Asynchronous token bucket rate limiter.
+"""
+
+import time
+import asyncio
+
+from aioquant.utils.ratelimit import RateLimiter, PRIORITY_CANCEL, PRIORITY_QUERY
+
+
+def test_rate_limiter_priority(run):
+    async def main():
+        limiter = RateLimiter("test", {"weight": (2, 0.2)})
+        await limiter.acquire({"weight": 2})
+        order = []
+
+        async def request(name, priority):
+            await limiter.acquire({"weight": 1}, priority)
+            order.append(name)
+
+        tasks = [asyncio.ensure_future(request("query", PRIORITY_QUERY)),
+                 asyncio.ensure_future(request("cancel", PRIORITY_CANCEL))]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 2
+        await asyncio.gather(*tasks)
+        assert order == ["cancel", "query"]
+    run(main())
+
+
+def test_rate_limiter_take_all_buckets_together(run):
+    async def main():
+        limiter = RateLimiter("test", {"weight": (10, 10), "orders": (1, 0.2)})
+        await limiter.acquire({"weight": 1, "orders": 1})
+
+        # Waiting for `orders` bucket, no token is taken from `weight` bucket.
+        task = asyncio.ensure_future(limiter.acquire({"weight": 5, "orders": 1}))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        assert limiter.buckets["weight"].tokens > 8
+
+        await asyncio.wait_for(task, 1)
+        assert limiter.buckets["weight"].tokens < 5
+
+        # Unknown bucket and zero cost are ignored.
+        await asyncio.wait_for(limiter.acquire({"unknown": 1, "orders": 0}), 0.01)
+    run(main())
+
+
+def test_rate_limiter_cancel(run):
+    async def main():
+        limiter = RateLimiter("test", {"weight": (10, 10), "orders": (1, 0.2)})
+        await limiter.acquire({"orders": 1})
+        try:
+            await asyncio.wait_for(limiter.acquire({"weight": 5, "orders": 1}), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        assert limiter.buckets["weight"].tokens > 9
+        assert limiter.waiting == 0
+
+        # Woken up with tokens taken, but cancelled before resumed, tokens are refunded.
+        task = asyncio.ensure_future(limiter.acquire({"weight": 5, "orders": 1}))
+        await asyncio.sleep(0)
+        time.sleep(0.25)  # Block the loop until `orders` refilled, the wakeup timer is due.
+        await asyncio.sleep(0)  # Resumed in the same loop iteration as the wakeup timer, just before it.
+        asyncio.get_event_loop().call_soon(task.cancel)  # Cancel after woken up, before resumed.
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert limiter.buckets["weight"].tokens > 9
+        assert limiter.waiting == 0
+    run(main())
+
+
+def test_rate_limiter_pause(run):
+    async def main():
+        limiter = RateLimiter("test", {"weight": (10, 0.01)})
+        limiter.pause(0.1)
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        await limiter.acquire({"weight": 1})
+        assert loop.time() - start >= 0.09
+    run(main())
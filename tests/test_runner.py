@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+
+"""
+Multi-process sharded runner.
+"""
+
+import pickle
+
+from aioquant import runner
+from aioquant.runner import HashRing, shard_markets
+
+
+def test_hash_ring_stable():
+    ring = HashRing(range(4))
+    keys = ["binance:SYM{}/USDT".format(i) for i in range(1000)]
+    nodes = [ring.get(key) for key in keys]
+    assert nodes == [HashRing(range(4)).get(key) for key in keys]
+
+    # Every node gets a fair share.
+    for node in range(4):
+        assert 150 < nodes.count(node) < 350
+
+    # Only keys of the removed node move.
+    smaller = HashRing(range(3))
+    for key, node in zip(keys, nodes):
+        if node != 3:
+            assert smaller.get(key) == node
+
+
+def test_shard_markets():
+    markets = {
+        "binance": {"symbols": ["BTC/USDT", "ETH/USDT", "EOS/USDT"], "channels": ["orderbook"]},
+        "okex": {"symbols": []}
+    }
+    ring = HashRing(range(2))
+    shards = [shard_markets(markets, ring, node) for node in range(2)]
+    symbols = sorted(s for shard in shards for cc in shard.values() for s in cc["symbols"])
+    assert symbols == sorted(markets["binance"]["symbols"])
+    for shard in shards:
+        assert "okex" not in shard
+        for cc in shard.values():
+            assert cc["channels"] == ["orderbook"]
+
+
+def test_in_shard(monkeypatch):
+    assert runner.in_shard("binance:BTC/USDT")
+    monkeypatch.setattr(runner, "_shard", {"index": 1, "count": 2})
+    monkeypatch.setattr(runner, "_ring", HashRing(range(2)))
+    assert runner.in_shard("binance:BTC/USDT") == (HashRing(range(2)).get("binance:BTC/USDT") == 1)
+
+
+def test_worker_arguments_picklable():
+    settings = {"SHARD": {"index": 0, "count": 2}, "MARKETS": {}}
+    pickle.dumps((runner._run_worker, settings, test_shard_markets, 0))
+
+
+def test_worker_markets_in_shard(monkeypatch):
+    from aioquant import quant
+    from aioquant.utils import logger
+
+    started = []
+    monkeypatch.setattr(runner, "_shard", None)
+    monkeypatch.setattr(runner, "_ring", None)
+    monkeypatch.setattr(logger, "reset", lambda: None)
+    monkeypatch.setattr(quant, "start", lambda settings, entrance_func: started.append(settings))
+
+    markets = {"binance": {"symbols": ["SYM{}/USDT".format(i) for i in range(20)], "channels": ["orderbook"]}}
+    runner._run_worker({"SHARD": {"index": 1, "count": 2}, "MARKETS": markets}, None, None)
+    assert started[0]["MARKETS"] == shard_markets(markets, HashRing(range(2)), 1)
+    for symbol in markets["binance"]["symbols"]:
+        assert runner.in_shard("binance:" + symbol) == (symbol in started[0]["MARKETS"]["binance"]["symbols"])
@@ -0,0 +1,96 @@
+# -*- coding:utf-8 -*-
+
+"""
+Creating an order with ambiguous result.
+"""
+
+import time
+import asyncio
+
+from aioquant.utils.web import HttpServerError
+
+
+class FakeRestAPI:
+    """Return the prepared results in turn, the last one is repeated."""
+
+    def __init__(self, creates, queries, query_delay=0):
+        self.creates = list(creates)
+        self.queries = list(queries)
+        self.query_delay = query_delay
+        self.create_timeouts = []
+        self.query_timeouts = []
+
+    async def create_order(self, *args, timeout=10):
+        self.create_timeouts.append(timeout)
+        return self.creates.pop(0) if len(self.creates) > 1 else self.creates[0]
+
+    async def get_order_status(self, *args, timeout=10, **kwargs):
+        self.query_timeouts.append(timeout)
+        await asyncio.sleep(self.query_delay)
+        return self.queries.pop(0) if len(self.queries) > 1 else self.queries[0]
+
+
+NOT_EXIST = (None, '{"code": 33014, "message": "Order does not exist"}')
+
+
+def test_okex_query_before_resend(run, new_trade):
+    rest_api = FakeRestAPI([(None, HttpServerError(504, "Gateway Timeout")),
+                            ({"result": True, "order_id": "1"}, None)], [NOT_EXIST])
+    trade = new_trade("okex", rest_api, create_retry_deadline=1)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == ("1", None)
+    assert len(rest_api.query_timeouts) == 1
+    assert 0 < rest_api.create_timeouts[1] <= 1
+
+    # Found by query, not resent.
+    rest_api = FakeRestAPI([(None, TimeoutError())], [({"order_id": 2}, None)])
+    trade = new_trade("okex", rest_api, create_retry_deadline=1)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == ("2", None)
+    assert len(rest_api.create_timeouts) == 1
+
+
+def test_okex_resend_rejected(run, new_trade):
+    # Rejected not because of duplication, the origin order confirmed not exist again.
+    rejected = {"result": False, "error_code": "33017", "error_message": "Insufficient balance", "order_id": "-1"}
+    rest_api = FakeRestAPI([(None, '{"code": 30030}'), (rejected, None)], [NOT_EXIST])
+    trade = new_trade("okex", rest_api, create_retry_deadline=1)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == (None, rejected)
+    assert len(rest_api.create_timeouts) == 2
+    assert len(rest_api.query_timeouts) == 2
+
+    # Rejected as duplicate, the origin order is not visible yet and found later.
+    duplicate = {"result": False, "error_code": "33000", "error_message": "Duplicated client_oid", "order_id": "-1"}
+    rest_api = FakeRestAPI([(None, TimeoutError()), (duplicate, None)],
+                           [NOT_EXIST, NOT_EXIST, NOT_EXIST, ({"order_id": "1"}, None)])
+    trade = new_trade("okex", rest_api, create_retry_deadline=3)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == ("1", None)
+    assert len(rest_api.create_timeouts) == 2
+    assert len(rest_api.query_timeouts) == 4
+
+    # Rejected as duplicate, never visible until the deadline.
+    rest_api = FakeRestAPI([(None, TimeoutError()), (duplicate, None)], [NOT_EXIST])
+    trade = new_trade("okex", rest_api, create_retry_deadline=0.6)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == (None, duplicate)
+    assert len(rest_api.create_timeouts) == 2
+
+
+def test_okex_not_ambiguous(run, new_trade):
+    rest_api = FakeRestAPI([(None, '{"code": 33017}')], [NOT_EXIST])
+    trade = new_trade("okex", rest_api, create_retry_deadline=1)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == (None, '{"code": 33017}')
+    assert rest_api.query_timeouts == []
+
+
+def test_binance_query_only_within_deadline(run, new_trade):
+    error = HttpServerError(503, "Service Unavailable")
+    rest_api = FakeRestAPI([(None, error)], [(None, '{"code": -2013}')], query_delay=0.2)
+    trade = new_trade("binance", rest_api, create_retry_deadline=0.5)
+    start = time.monotonic()
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == (None, error)
+    assert time.monotonic() - start < 0.7
+    assert len(rest_api.create_timeouts) == 1
+    assert all(t <= 0.5 for t in rest_api.query_timeouts)
+
+    rest_api = FakeRestAPI([(None, '{"code": -1007}')], [(None, '{"code": -2013}'), ({"orderId": 1}, None)])
+    trade = new_trade("binance", rest_api, create_retry_deadline=1)
+    assert run(trade.create_order("BUY", "1", "1", client_order_id="c1")) == ("1", None)
+    assert len(rest_api.create_timeouts) == 1
@@ -0,0 +1,41 @@
+# -*- coding:utf-8 -*-
+
+"""
+Request signer.
+"""
+
+import hmac
+import base64
+import hashlib
+
+from aioquant.utils.signer import HmacSigner, make_query
+
+
+def test_sign_same_as_hmac():
+    signer = HmacSigner("secret")
+    for message in ("symbol=BTCUSDT&timestamp=1", "", "another message"):
+        expected = hmac.new(b"secret", message.encode(), hashlib.sha256).hexdigest()
+        assert signer.sign(message) == expected
+        assert signer.sign(message.encode()) == expected
+
+
+def test_sign_base64():
+    signer = HmacSigner("secret", output="base64")
+    expected = base64.b64encode(hmac.new(b"secret", b"1538054050.975GET/api", hashlib.sha256).digest()).decode()
+    assert signer.sign("1538054050.975GET/api") == expected
+
+
+def test_timestamp():
+    signer = HmacSigner("secret", time_func=lambda: 1538054050.9751)
+    assert signer.timestamp_ms() == 1538054050975
+    assert signer.timestamp_str() == "1538054050.975"
+    signer.time_func = lambda: 1538054050.0
+    assert signer.timestamp_str() == "1538054050.000"
+    signer.time_func = None
+    assert signer.timestamp_ms() > 1538054050975
+
+
+def test_make_query():
+    params = {"b": 2, "a": 1}
+    assert make_query(params) == "b=2&a=1"
+    assert make_query(params, sort=True) == "a=1&b=2"
@@ -0,0 +1,83 @@
+# -*- coding:utf-8 -*-
+
+"""
+Task supervisor.
+"""
+
+import asyncio
+
+from aioquant.quant import AIOQuant
+from aioquant.configure import config
+from aioquant.tasks import TaskSupervisor
+
+
+def test_spawn_and_stats(run):
+    async def main():
+        supervisor = TaskSupervisor()
+
+        async def work(n):
+            await asyncio.sleep(0.01)
+            return n
+
+        async def fail():
+            raise ValueError("error")
+
+        task = supervisor.spawn(work, (1, ))
+        supervisor.spawn(fail)
+        running = supervisor.running()
+        assert [t["name"] for t in running] == [work.__qualname__, fail.__qualname__]
+        assert await task == 1
+        await asyncio.sleep(0)
+        assert supervisor.running() == []
+        stats = supervisor.stats()
+        assert stats[work.__qualname__]["runs"] == 1
+        assert stats[fail.__qualname__]["failures"] == 1
+    run(main())
+
+
+def test_group_limit(run):
+    async def main():
+        supervisor = TaskSupervisor()
+        supervisor.set_group_limit("publish", 2)
+        concurrent = {"now": 0, "max": 0}
+
+        async def publish():
+            concurrent["now"] += 1
+            concurrent["max"] = max(concurrent["max"], concurrent["now"])
+            await asyncio.sleep(0.01)
+            concurrent["now"] -= 1
+
+        for _ in range(5):
+            supervisor.spawn(publish, group="publish")
+        await asyncio.sleep(0)
+        assert [t["waiting"] for t in supervisor.running()] == [False, False, True, True, True]
+        assert await supervisor.join(group="publish", timeout=1) == 0
+        assert concurrent["max"] == 2
+    run(main())
+
+
+def test_join_and_cancel_all(run):
+    async def main():
+        supervisor = TaskSupervisor()
+        supervisor.spawn(asyncio.sleep, (0.01, ), group="fast")
+        slow = supervisor.spawn(asyncio.sleep, (10, ), name="slow")
+        assert await supervisor.join(group="fast") == 0
+        assert await supervisor.join(timeout=0.01) == 1
+
+        await supervisor.cancel_all(timeout=1)
+        assert slow.cancelled()
+        assert supervisor.running() == []
+        assert supervisor.stats()["slow"]["cancels"] == 1
+    run(main())
+
+
+def test_group_limits_from_config(monkeypatch):
+    limits = {}
+    monkeypatch.setattr(TaskSupervisor, "set_group_limit", lambda self, group, limit: limits.update({group: limit}))
+    monkeypatch.setattr(config, "tasks", {})
+    AIOQuant()._init_tasks()
+    assert limits == {"publish": 100}
+
+    monkeypatch.setattr(config, "tasks", {"group_limits": {"publish": 10, "query": 5}})
+    AIOQuant()._init_tasks()
+    assert limits == {"publish": 10, "query": 5}
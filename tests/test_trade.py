@@ -0,0 +1,218 @@
+# -*- coding:utf-8 -*-
+
+"""
+Trade module, batch orders and order lifecycle latency.
+"""
+
+import asyncio
+
+import pytest
+
+from aioquant.platform import binance
+from aioquant.trade import get_order_latency
+from aioquant.order import Order, ORDER_STATUS_NONE, ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, \
+    ORDER_STATUS_FILLED, ORDER_STATUS_CANCELED, ORDER_STATUS_FAILED
+
+
+class FakeCreateRestAPI:
+
+    def __init__(self):
+        self.orders = []
+
+    async def create_order(self, action, symbol, price, quantity, client_order_id, *args, **kwargs):
+        self.orders.append({"action": action, "symbol": symbol, "price": price, "quantity": quantity,
+                            "client_order_id": client_order_id})
+        return {"orderId": len(self.orders)}, None
+
+
+def test_create_orders_one_latency_sample_per_call(run, new_trade):
+    rest_api = FakeCreateRestAPI()
+    trade = new_trade("binance", rest_api)
+    orders = [{"action": "BUY", "price": 1.1, "quantity": 2} for _ in range(5)]
+    results = run(trade.create_orders(orders))
+    assert results == [(str(i + 1), None) for i in range(5)]
+    assert all(o["client_order_id"] and o["price"] == "1.1" and o["symbol"] == "BTCUSDT" for o in rest_api.orders)
+    stats = trade.latency_stats
+    assert stats["create_batch_rest"]["count"] == 1
+    assert stats["create_rest"]["count"] == 0
+
+
+def test_binance_reject_unsupported_order_type(run, new_trade):
+    rest_api = FakeCreateRestAPI()
+    trade = new_trade("binance", rest_api)
+    results = run(trade.create_orders([{"action": "BUY", "price": "1", "quantity": "1", "order_type": "MARKET"}]))
+    assert results[0][0] is None
+    assert "order type error" in results[0][1]
+    assert rest_api.orders == []
+
+
+class FakeFailRestAPI:
+
+    async def create_order(self, *args, **kwargs):
+        return None, '{"code": -2010, "msg": "Account has insufficient balance"}'
+
+    async def revoke_order(self, symbol, order_id, *args, **kwargs):
+        return None, '{"code": -2011, "msg": "Unknown order sent."}'
+
+
+def test_latency_discard_failed_orders(run, new_trade):
+    trade = new_trade("binance", FakeFailRestAPI())
+    latency = get_order_latency("binance", "test@gmail.com")
+    order_id, error = run(trade.create_order("BUY", 1, 1, client_order_id="c1"))
+    assert order_id is None
+    assert run(trade.revoke_order("1"))[1]
+
+    # Updates arrive later, e.g. an order with the same client order id, not counted as the failed ones.
+    latency.on_order_update(Order(client_order_id="c1", order_id="1", status=ORDER_STATUS_SUBMITTED))
+    latency.on_order_update(Order(client_order_id="c1", order_id="1", status=ORDER_STATUS_FILLED))
+    latency.on_order_update(Order(client_order_id="c2", order_id="1", status=ORDER_STATUS_CANCELED))
+    stats = trade.latency_stats
+    assert stats["create_rest"]["count"] == 1
+    assert stats["cancel_rest"]["count"] == 1
+    assert stats["create_new"]["count"] == 0
+    assert stats["create_fill"]["count"] == 0
+    assert stats["cancel_done"]["count"] == 0
+
+
+class FakeBatchRestAPI:
+
+    async def create_orders(self, symbol, orders):
+        items = [{"client_oid": o["client_oid"], "order_id": 100 + i, "result": True} for i, o in enumerate(orders)]
+        items[-1] = {"client_oid": orders[-1]["client_oid"], "order_id": -1, "result": False, "error_code": "33017"}
+        return {symbol.lower(): items}, None
+
+
+def test_okex_create_orders_in_chunks(run, new_trade):
+    trade = new_trade("okex", FakeBatchRestAPI())
+    orders = [{"action": "BUY", "price": 1, "quantity": 1} for _ in range(12)]
+    results = run(trade.create_orders(orders))
+    assert [r[0] for r in results] == [str(100 + i) for i in range(9)] + [None, "100", None]
+    assert results[9][1]["error_code"] == "33017"
+
+
+class FakeRevokeRestAPI:
+
+    def __init__(self, revoke_all=None, open_orders=None, batch=None):
+        self.revoke_all = revoke_all
+        self.open_orders = open_orders
+        self.batch = batch
+
+    async def revoke_open_orders(self, symbol):
+        return self.revoke_all
+
+    async def get_open_orders(self, symbol, *args, **kwargs):
+        return self.open_orders
+
+    async def revoke_orders(self, symbol, order_ids):
+        return self.batch
+
+
+def test_binance_revoke_all_results(run, new_trade):
+    result = [
+        {"orderId": 1, "status": "CANCELED"},
+        {"orderId": 2, "status": "FILLED"},
+        {"orderListId": 9, "orderReports": [{"orderId": 3, "status": "CANCELED"}, {"orderId": 4, "status": "CANCELED"}]}
+    ]
+    trade = new_trade("binance", FakeRevokeRestAPI(revoke_all=(result, None)))
+    success, error = run(trade.revoke_order())
+    assert success == ["1", "3", "4"]
+    assert error == [("2", {"orderId": 2, "status": "FILLED"})]
+
+    trade = new_trade("binance", FakeRevokeRestAPI(revoke_all=(None, '{"code": -2011}')))
+    assert run(trade.revoke_order()) == ([], [])
+
+    trade = new_trade("binance", FakeRevokeRestAPI(revoke_all=(None, '{"code": -1000}')))
+    assert run(trade.revoke_order()) == (None, '{"code": -1000}')
+
+
+def test_okex_revoke_all_results(run, new_trade):
+    batch = {"btc-usdt": [{"order_id": "1", "result": True}, {"order_id": "2", "result": False, "error_code": "33014"}]}
+    rest_api = FakeRevokeRestAPI(open_orders=([{"order_id": "1"}, {"order_id": "2"}], None), batch=(batch, None))
+    trade = new_trade("okex", rest_api)
+    success, error = run(trade.revoke_order())
+    assert success == ["1"]
+    assert error == [("2", {"order_id": "2", "result": False, "error_code": "33014"})]
+
+
+class FakeAckRestAPI:
+    """Hold REST API responses until released."""
+
+    def __init__(self, error=None):
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def create_order(self, *args, **kwargs):
+        await self.release.wait()
+        if self.error:
+            return None, self.error
+        return {"orderId": 1}, None
+
+
+def execution_report(status):
+    return {"e": "executionReport", "s": "BTCUSDT", "i": 1, "c": "c1", "X": status, "S": "BUY", "o": "LIMIT",
+            "p": "1", "q": "2", "z": "0", "O": 1, "T": 2}
+
+
+@pytest.fixture
+def new_ack_trade(new_trade, monkeypatch):
+    """Create a Binance Trade with wait_ack=False, returns (trade, trade registered to user stream, order updates)."""
+    def new(rest_api):
+        registered = []
+        monkeypatch.setattr(binance.BinanceUserStream, "register", classmethod(lambda cls, t: registered.append(t)))
+        updates = []
+
+        async def on_order_update(order):
+            updates.append((order.order_id, order.status))
+        trade = new_trade("binance", rest_api, order_update_callback=on_order_update)
+        return trade, registered[0], updates
+    return new
+
+
+def test_binance_no_wait_ack_rest_first(run, new_ack_trade):
+    rest_api = FakeAckRestAPI()
+    trade, t, updates = new_ack_trade(rest_api)
+
+    async def main():
+        assert await trade.create_order("BUY", 1, 2, client_order_id="c1", wait_ack=False) == ("c1", None)
+        order = trade.order_store.get("c1")
+        assert order.order_id is None
+        assert order.status == ORDER_STATUS_NONE
+
+        rest_api.release.set()
+        await asyncio.sleep(0.01)
+        assert trade.order_store.get("1").status == ORDER_STATUS_SUBMITTED
+        await t.process(execution_report("FILLED"))
+        await asyncio.sleep(0.01)
+    run(main())
+    assert updates == [("1", ORDER_STATUS_SUBMITTED), ("1", ORDER_STATUS_FILLED)]
+
+
+def test_binance_no_wait_ack_websocket_first(run, new_ack_trade):
+    rest_api = FakeAckRestAPI()
+    trade, t, updates = new_ack_trade(rest_api)
+
+    async def main():
+        await trade.create_order("BUY", 1, 2, client_order_id="c1", wait_ack=False)
+        await t.process(execution_report("PARTIALLY_FILLED"))
+        await asyncio.sleep(0.01)
+        assert trade.order_store.get("1").status == ORDER_STATUS_PARTIAL_FILLED
+
+        # The late REST response doesn't roll back the order status.
+        rest_api.release.set()
+        await asyncio.sleep(0.01)
+        assert trade.order_store.get("1").status == ORDER_STATUS_PARTIAL_FILLED
+    run(main())
+    assert updates == [("1", ORDER_STATUS_PARTIAL_FILLED)]
+
+
+def test_binance_no_wait_ack_failed(run, new_ack_trade):
+    rest_api = FakeAckRestAPI(error='{"code": -2010, "msg": "Account has insufficient balance"}')
+    trade, t, updates = new_ack_trade(rest_api)
+
+    async def main():
+        await trade.create_order("BUY", 1, 2, client_order_id="c1", wait_ack=False)
+        rest_api.release.set()
+        await asyncio.sleep(0.01)
+    run(main())
+    assert updates == [(None, ORDER_STATUS_FAILED)]
+    assert trade.order_store.get("c1").status == ORDER_STATUS_FAILED
@@ -0,0 +1,239 @@
+# -*- coding:utf-8 -*-
+
+"""
+Shared user data streams of Binance and OKEx.
+"""
+
+import json
+import zlib
+import asyncio
+
+import pytest
+
+from aioquant.platform import binance, okex
+
+
+class FakeWebsocket:
+    """Record messages instead of connecting to exchange."""
+
+    instances = []
+
+    def __init__(self, url, connected_callback=None, process_callback=None, process_binary_callback=None, **kwargs):
+        self.url = url
+        self.connected = False
+        self.sent = []
+        self.instances.append(self)
+
+    async def send(self, data):
+        self.sent.append(data)
+        return True
+
+    async def ping(self):
+        pass
+
+
+class FakeRestAPI:
+
+    def __init__(self, access_key="ak", listen_key_errors=0):
+        self.access_key = access_key
+        self.passphrase = "pp"
+        self.listen_key_calls = 0
+        self.listen_key_errors = listen_key_errors
+        self.account_event = asyncio.Event()
+
+    async def get_listen_key(self):
+        self.listen_key_calls += 1
+        if self.listen_key_calls <= self.listen_key_errors:
+            return None, "timeout"
+        return {"listenKey": "lk"}, None
+
+    async def get_user_account(self):
+        await self.account_event.wait()
+        return [], None
+
+
+class FakeTrade:
+
+    def __init__(self, rest_api, raw_symbol, wss="wss://fake", account="acc"):
+        self.rest_api = rest_api
+        self.raw_symbol = raw_symbol
+        self.wss = wss
+        self.account = account
+        self.order_channel = "spot/order:{}".format(raw_symbol)
+        self.errors = []
+        self.connected = 0
+        self.authorized = 0
+        self.assets = []
+        self.messages = []
+
+    def stream_error_callback(self, error):
+        self.errors.append(error)
+
+    def stream_asset_callback(self, asset):
+        self.assets.append(asset)
+
+    async def connected_callback(self):
+        self.connected += 1
+
+    async def authorized_callback(self):
+        self.authorized += 1
+
+    async def process(self, msg):
+        self.messages.append(msg)
+
+
+@pytest.fixture(autouse=True)
+def fake_streams(monkeypatch):
+    monkeypatch.setattr(binance, "Websocket", FakeWebsocket)
+    monkeypatch.setattr(okex, "Websocket", FakeWebsocket)
+    monkeypatch.setattr(FakeWebsocket, "instances", [])
+    monkeypatch.setattr(binance.BinanceUserStream, "_STREAMS", {})
+    monkeypatch.setattr(okex.OKExUserStream, "_STREAMS", {})
+
+
+def okex_raw(msg):
+    c = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return c.compress(json.dumps(msg).encode()) + c.flush()
+
+
+def test_binance_share_stream_per_account(run):
+    async def main():
+        rest_api = FakeRestAPI()
+        t1 = FakeTrade(rest_api, "BTCUSDT")
+        t2 = FakeTrade(rest_api, "ETHUSDT")
+        t3 = FakeTrade(FakeRestAPI("another"), "BTCUSDT")
+        s1 = binance.BinanceUserStream.register(t1)
+        s2 = binance.BinanceUserStream.register(t2)
+        s3 = binance.BinanceUserStream.register(t3)
+        await asyncio.sleep(0.01)
+        assert s1 is s2
+        assert s1 is not s3
+        assert rest_api.listen_key_calls == 1
+        assert s1.trades == [t1, t2]
+    run(main())
+
+
+def test_binance_listen_key_failure_retry_and_replay(run):
+    async def main():
+        rest_api = FakeRestAPI(listen_key_errors=1)
+        t1 = FakeTrade(rest_api, "BTCUSDT")
+        stream = binance.BinanceUserStream.register(t1)
+        await asyncio.sleep(0.01)
+        assert len(t1.errors) == 1
+
+        # Registered after the failure, the error is replayed.
+        t2 = FakeTrade(rest_api, "ETHUSDT")
+        assert binance.BinanceUserStream.register(t2) is stream
+        assert len(t2.errors) == 1
+
+        # Retried after 1 second.
+        await asyncio.sleep(1.1)
+        assert rest_api.listen_key_calls == 2
+        assert len(FakeWebsocket.instances) == 1
+        ws = FakeWebsocket.instances[0]
+        assert ws.url.endswith("/ws/lk")
+
+        # Connected, a Trade object registered later gets connected callback, and the error is not replayed.
+        ws.connected = True
+        t3 = FakeTrade(rest_api, "EOSUSDT")
+        binance.BinanceUserStream.register(t3)
+        await asyncio.sleep(0.01)
+        assert t3.connected == 1
+        assert t3.errors == []
+    run(main())
+
+
+def test_binance_process_route_by_symbol(run):
+    async def main():
+        rest_api = FakeRestAPI()
+        t1 = FakeTrade(rest_api, "BTCUSDT")
+        t2 = FakeTrade(rest_api, "ETHUSDT")
+        stream = binance.BinanceUserStream.register(t1)
+        binance.BinanceUserStream.register(t2)
+        await stream.process({"e": "executionReport", "s": "BTCUSDT"})
+        assert len(t1.messages) == 1
+        assert t2.messages == []
+
+        await stream.process({"e": "outboundAccountPosition", "E": 100, "B": [{"a": "BTC", "f": "1", "l": "2"}]})
+        assert stream.asset.get("BTC") == {"free": 1.0, "locked": 2.0, "total": 3.0}
+        assert t1.assets[-1] is stream.asset
+        assert t2.assets[-1] is stream.asset
+    run(main())
+
+
+def test_okex_login_failure_replay(run):
+    async def main():
+        rest_api = FakeRestAPI()
+        t1 = FakeTrade(rest_api, "BTC-USDT")
+        stream = okex.OKExUserStream.register(t1)
+        await stream.process_binary(okex_raw({"event": "login", "success": False}))
+        assert len(t1.errors) == 1
+
+        t2 = FakeTrade(rest_api, "ETH-USDT")
+        assert okex.OKExUserStream.register(t2) is stream
+        assert len(t2.errors) == 1
+    run(main())
+
+
+def test_okex_login_not_blocked_by_asset_request(run):
+    async def main():
+        rest_api = FakeRestAPI()
+        t1 = FakeTrade(rest_api, "BTC-USDT")
+        stream = okex.OKExUserStream.register(t1)
+
+        # The asset request never returns, login must not wait for it.
+        await asyncio.wait_for(stream.process_binary(okex_raw({"event": "login", "success": True})), 1)
+        await asyncio.sleep(0.01)
+        assert t1.authorized == 1
+        assert {"op": "subscribe", "args": ["spot/account:BTC", "spot/account:USDT"]} in FakeWebsocket.instances[0].sent
+
+        # Order updates are still processed, routed by symbol.
+        t2 = FakeTrade(rest_api, "ETH-USDT")
+        okex.OKExUserStream.register(t2)
+        await asyncio.sleep(0.01)
+        assert t2.authorized == 1
+        await asyncio.wait_for(stream.process_binary(okex_raw({
+            "table": "spot/order", "data": [{"instrument_id": "ETH-USDT"}]})), 1)
+        assert t1.messages == []
+        assert t2.messages == [{"table": "spot/order", "data": [{"instrument_id": "ETH-USDT"}]}]
+        rest_api.account_event.set()
+    run(main())
+
+
+def test_binance_drop_stale_asset_snapshot(run):
+    async def main():
+        rest_api = FakeRestAPI()
+        stream = binance.BinanceUserStream.register(FakeTrade(rest_api, "BTCUSDT"))
+        snapshot = {"updateTime": 100, "balances": [{"asset": "BTC", "free": "1", "locked": "0"}]}
+
+        async def get_user_account():
+            return snapshot, None
+        rest_api.get_user_account = get_user_account
+
+        # Pushed while requesting the snapshot.
+        await stream.process({"e": "outboundAccountPosition", "E": 200, "B": [{"a": "BTC", "f": "5", "l": "0"}]})
+        await stream._init_asset()
+        assert stream.asset.get("BTC")["free"] == 5
+
+        snapshot["updateTime"] = 300
+        await stream._init_asset()
+        assert stream.asset.get("BTC")["free"] == 1
+    run(main())
+
+
+def test_binance_balance_update_not_counted_twice(run):
+    async def main():
+        stream = binance.BinanceUserStream.register(FakeTrade(FakeRestAPI(), "BTCUSDT"))
+        await stream.process({"e": "outboundAccountPosition", "E": 100, "B": [{"a": "BTC", "f": "1", "l": "0"}]})
+
+        # Absolute balances arrived first, the delta has been included.
+        await stream.process({"e": "outboundAccountPosition", "E": 201, "B": [{"a": "BTC", "f": "3", "l": "0"}]})
+        await stream.process({"e": "balanceUpdate", "E": 200, "a": "BTC", "d": "2"})
+        assert stream.asset.get("BTC")["free"] == 3
+
+        # Delta arrived first, then the absolute balances.
+        await stream.process({"e": "balanceUpdate", "E": 300, "a": "BTC", "d": "2"})
+        assert stream.asset.get("BTC")["free"] == 5
+        await stream.process({"e": "outboundAccountPosition", "E": 301, "B": [{"a": "BTC", "f": "5", "l": "0"}]})
+        assert stream.asset.get("BTC")["free"] == 5
+    run(main())
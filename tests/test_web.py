@@ -0,0 +1,160 @@
+# -*- coding:utf-8 -*-
+
+"""
+Websocket connection.
+"""
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from aioquant.tasks import LoopRunTask
+from aioquant.utils.web import Websocket, AsyncHttpRequests
+
+
+class FakeWS:
+
+    def __init__(self, fail_send=False):
+        self.closed = False
+        self.fail_send = fail_send
+        self.sent = []
+        self.close_event = asyncio.Event()
+
+    async def send_json(self, data):
+        if self.fail_send:
+            raise ConnectionResetError("Cannot write to closing transport")
+        self.sent.append(data)
+
+    async def close(self):
+        self.closed = True
+        self.close_event.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.close_event.wait()
+        raise StopAsyncIteration
+
+
+class FakeSession:
+
+    def __init__(self, connections):
+        self.closed = False
+        self.connections = list(connections)
+        self.connect_count = 0
+
+    async def ws_connect(self, url, **kwargs):
+        self.connect_count += 1
+        await asyncio.sleep(0.01)
+        return self.connections.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def new_websocket(connections, **kwargs):
+    ws = Websocket("wss://fake", subscriptions=[{"op": "subscribe"}], check_conn_interval=100, backoff_base=0.01,
+                   **kwargs)
+    ws._session = FakeSession(connections)
+    return ws
+
+
+def test_reconnect_if_replay_subscriptions_failed(run):
+    async def main():
+        first, second = FakeWS(fail_send=True), FakeWS()
+        connected = []
+
+        async def connected_callback():
+            connected.append(ws.ws)
+
+        ws = new_websocket([first, second], connected_callback=connected_callback)
+        await asyncio.sleep(0.1)
+        assert connected == [second]  # Only once, after subscriptions replayed.
+        assert first.closed
+        assert ws.ws is second
+        assert second.sent == [{"op": "subscribe"}]
+        assert ws._connect_count == 1
+        assert not ws._connect_lock.locked()
+        await ws.close()
+    run(main())
+
+
+def test_connect_only_once_concurrently(run):
+    async def main():
+        ws = new_websocket([FakeWS(), FakeWS()])
+        await asyncio.sleep(0)
+        await asyncio.gather(ws._connect(), ws.reconnect(), ws._connect())
+        await asyncio.sleep(0.05)
+        assert ws._session.connect_count == 1
+        assert ws.connected
+        await ws.close()
+    run(main())
+
+
+@pytest.fixture
+def http_server(run, monkeypatch):
+    """A local HTTP server, and a fresh connection pool for every test."""
+    monkeypatch.setattr(AsyncHttpRequests, "_SESSIONS", {})
+    monkeypatch.setattr(AsyncHttpRequests, "_STATS", {})
+    monkeypatch.setattr(AsyncHttpRequests, "_WARM_URLS", {})
+
+    async def ping(request):
+        return web.json_response({}, headers={"X-Used-Weight": request.query.get("weight", "1")})
+
+    app = web.Application()
+    app.router.add_get("/ping", ping)
+    runner = web.AppRunner(app)
+    run(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    run(site.start())
+    port = runner.addresses[0][1]
+    yield "http://127.0.0.1:{}".format(port)
+    run(AsyncHttpRequests.close())
+    run(runner.cleanup())
+
+
+def test_http_session_reuse_and_stats(run, http_server):
+    async def main():
+        for _ in range(3):
+            code, result, error = await AsyncHttpRequests.fetch("GET", http_server + "/ping")
+            assert (code, result, error) == (200, {}, None)
+        stats = AsyncHttpRequests.stats()
+        assert list(stats.keys()) == [http_server[len("http://"):]]
+        host_stats = list(stats.values())[0]
+        assert host_stats["request"]["count"] == 3
+        assert host_stats["connect"]["count"] == 1  # Kept alive and reused.
+    run(main())
+
+
+def test_http_prewarm(run, http_server):
+    async def main():
+        url = http_server + "/ping"
+        await AsyncHttpRequests.prewarm(url)
+        await AsyncHttpRequests.fetch("GET", url)
+        host_stats = list(AsyncHttpRequests.stats().values())[0]
+        assert host_stats["connect"]["count"] == 2  # `prewarm_connections`, the request uses a warm connection.
+        assert host_stats["request"]["count"] == 3
+        names = [s["func"] for s in LoopRunTask.stats().values()]
+        assert "AsyncHttpRequests._keep_warm" in names
+
+        await AsyncHttpRequests.close()
+        names = [s["func"] for s in LoopRunTask.stats().values()]
+        assert "AsyncHttpRequests._keep_warm" not in names
+    run(main())
+
+
+def test_http_response_hook_error(run, http_server):
+    used = []
+
+    def response_hook(response):
+        used.append(int(response.headers["X-Used-Weight"]))
+
+    async def main():
+        url = http_server + "/ping"
+        assert await AsyncHttpRequests.fetch("GET", url + "?weight=5", response_hook=response_hook) == (200, {}, None)
+        # Malformed header, the hook raises an error, but the response is still returned.
+        assert await AsyncHttpRequests.fetch("GET", url + "?weight=x", response_hook=response_hook) == (200, {}, None)
+        assert used == [5]
+    run(main())